@@ -0,0 +1,144 @@
+import argparse
+import gc
+import io
+import json
+import multiprocessing as mp
+import os
+import resource
+import statistics
+import time
+
+import torch
+from transformers import pipeline
+
+from nifty_trading_agent.src.sentiment_analysis.sentiment_analyzer import FINBERT_MODEL, quantize_dynamic_int8
+
+# Fixed headline set so fp32/int8 runs are comparable between machines and over time
+HEADLINES = [
+    "Nifty hits record high as FIIs turn net buyers for fifth straight session",
+    "Bank Nifty slumps 2% after RBI hikes repo rate by 25 basis points",
+    "Sensex, Nifty end flat amid mixed global cues",
+    "HDFC Bank shares surge after strong Q3 net interest income growth",
+    "ICICI Bank reports 30% jump in quarterly profit, beats estimates",
+    "Reliance Industries falls as refining margins weaken",
+    "India VIX spikes to six-month high ahead of Union Budget",
+    "RBI keeps policy rate unchanged, maintains withdrawal of accommodation stance",
+    "Rupee weakens past 83 per dollar on crude oil rally",
+    "Infosys cuts revenue guidance, IT stocks drag Nifty lower",
+    "Kotak Mahindra Bank gains after RBI lifts curbs on digital onboarding",
+    "Axis Bank asset quality improves, gross NPA falls to 1.6%",
+    "SBI shares hit 52-week high on robust loan growth",
+    "Nifty options data signals strong support at 21,500",
+    "Market breadth negative as midcaps underperform benchmark indices",
+    "FPIs pull out Rs 15,000 crore from Indian equities in January",
+    "GDP growth beats expectations at 7.6% in second quarter",
+    "CPI inflation eases to 4.9%, raising hopes of rate cuts",
+    "Bank Nifty recovers from day's low as private lenders rebound",
+    "Adani group stocks tumble after fresh short-seller report",
+    "Tata Motors rallies on strong JLR sales numbers",
+    "Crude oil prices surge on Middle East supply concerns",
+    "US Fed signals higher-for-longer rates, Asian markets fall",
+    "IndusInd Bank sinks after accounting discrepancies in derivatives portfolio",
+    "Nifty weekly expiry sees heavy call writing at 22,000 strike",
+    "Government announces higher capex allocation for infrastructure",
+    "Banking stocks under pressure as deposit growth lags credit growth",
+    "Bajaj Finance drops after RBI restricts lending under two products",
+    "Nifty IT index jumps as rupee depreciation boosts export earnings",
+    "Markets open higher tracking positive cues from SGX Nifty",
+    "Profit booking drags Nifty below 22,000 after record run",
+    "Foreign investors remain bullish on Indian financials",
+]
+
+def current_rss_mb():
+    # Resident set size of this process from /proc (Linux)
+    with open("/proc/self/statm") as f:
+        resident_pages = int(f.read().split()[1])
+    return resident_pages * os.sysconf("SC_PAGE_SIZE") / 1024 ** 2
+
+def peak_rss_mb():
+    # High-water mark of this process's resident set (ru_maxrss is in KiB on Linux)
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def serialized_size_mb(model):
+    buffer = io.BytesIO()
+    torch.save(model.state_dict(), buffer)
+    return buffer.tell() / 1024 ** 2
+
+def signed_score(result):
+    if result["label"] == "positive":
+        return result["score"]
+    if result["label"] == "negative":
+        return -result["score"]
+    return 0.0
+
+def benchmark_mode(quantization, texts, batch_size, repeats, num_threads=None):
+    # Runs in a fresh process per mode (see run()), so the RSS figures are this mode's own
+    if num_threads:
+        torch.set_num_threads(num_threads)
+    gc.collect()
+    rss_before = current_rss_mb()
+    finbert = pipeline("sentiment-analysis", model=FINBERT_MODEL)
+    if quantization == "dynamic_int8":
+        finbert.model = quantize_dynamic_int8(finbert.model)
+    gc.collect()
+    rss_after_load = current_rss_mb()
+
+    with torch.inference_mode():
+        finbert(texts[:2], batch_size=2, truncation=True) # Warm-up
+
+        single_latencies = []
+        for text in texts:
+            start = time.perf_counter()
+            finbert(text, truncation=True)
+            single_latencies.append((time.perf_counter() - start) * 1000)
+
+        batch_times = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            results = finbert(texts, batch_size=batch_size, truncation=True)
+            batch_times.append(time.perf_counter() - start)
+
+    report = {
+        "quantization": quantization,
+        "rss_increase_mb": round(rss_after_load - rss_before, 1),
+        "rss_after_run_mb": round(current_rss_mb(), 1),
+        "peak_rss_mb": round(peak_rss_mb(), 1), # int8 includes the fp32 model it is converted from
+        "model_size_mb": round(serialized_size_mb(finbert.model), 1),
+        "single_latency_ms_p50": round(statistics.median(single_latencies), 2),
+        "single_latency_ms_max": round(max(single_latencies), 2),
+        "batch_texts_per_sec": round(len(texts) / min(batch_times), 1),
+        "torch_threads": torch.get_num_threads(),
+    }
+    labels = [r["label"] for r in results]
+    scores = [signed_score(r) for r in results]
+    return report, labels, scores
+
+def run_isolated(quantization, batch_size, repeats, num_threads=None):
+    # A spawned process per mode: loading one model after the other in the same process would
+    # count the first model's pages (and whatever the allocator kept of them) against the second
+    with mp.get_context("spawn").Pool(1) as pool:
+        return pool.apply(benchmark_mode, (quantization, HEADLINES, batch_size, repeats, num_threads))
+
+def run(batch_size=16, repeats=3, num_threads=None):
+    fp32, fp32_labels, fp32_scores = run_isolated("none", batch_size, repeats, num_threads)
+    int8, int8_labels, int8_scores = run_isolated("dynamic_int8", batch_size, repeats, num_threads)
+
+    int8["label_agreement"] = round(sum(a == b for a, b in zip(fp32_labels, int8_labels)) / len(HEADLINES), 4)
+    int8["mean_abs_score_diff"] = round(statistics.mean(abs(a - b) for a, b in zip(fp32_scores, int8_scores)), 4)
+    int8["speedup_single"] = round(fp32["single_latency_ms_p50"] / int8["single_latency_ms_p50"], 2)
+    int8["speedup_batch"] = round(int8["batch_texts_per_sec"] / fp32["batch_texts_per_sec"], 2)
+    return {"n_texts": len(HEADLINES), "torch_threads": fp32["torch_threads"], "fp32": fp32, "dynamic_int8": int8}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare fp32 and dynamic int8 FinBERT on CPU.")
+    parser.add_argument("--batch-size", type=int, default=16)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--threads", type=int, default=None)
+    parser.add_argument("--output", help="Optional path to write the JSON report")
+    args = parser.parse_args()
+
+    report = run(batch_size=args.batch_size, repeats=args.repeats, num_threads=args.threads)
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
@@ -0,0 +1,306 @@
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+# Run from the nifty_trading_agent directory (the config is loaded from config/config.yaml) with the
+# repository root on PYTHONPATH:
+#   PYTHONPATH=.. python -m nifty_trading_agent.benchmarks.run_benchmarks --scales 1d,1y --compare
+# Everything runs offline: the database goes to a temporary SQLite file and FinBERT is only loaded
+# from the local HuggingFace cache.
+os.environ.setdefault("DATABASE_PATH", os.path.join(tempfile.mkdtemp(prefix="nifty_bench_"), "bench.db"))
+os.environ.setdefault("HF_HUB_OFFLINE", "1")
+os.environ.setdefault("LOGGING_LEVEL", "WARNING")
+
+import numpy as np
+import pandas as pd
+
+from nifty_trading_agent.benchmarks.synthetic_data import (
+    SCALES, generate_ohlcv_bars, generate_option_chain, generate_news_texts, generate_sentiment_rows
+)
+from nifty_trading_agent.src.preprocessing.data_cleaner import DataCleaner
+from nifty_trading_agent.src.preprocessing.feature_engineer import FeatureEngineer
+from nifty_trading_agent.src.market_analysis.volatility_analyzer import VolatilityAnalyzer
+from nifty_trading_agent.src.market_analysis.correlation_analyzer import CorrelationAnalyzer
+from nifty_trading_agent.src.market_analysis.volatility_surface import VolatilitySurface, implied_volatility
+from nifty_trading_agent.src.backtesting.backtest_engine import BacktestEngine, sma_crossover_signal
+from nifty_trading_agent.src.sentiment_analysis.sentiment_analyzer import SentimentAnalyzer
+from nifty_trading_agent.src.sentiment_analysis.relevance_filter import RelevanceFilter
+from nifty_trading_agent.src.utils.database import db_manager
+from nifty_trading_agent.src.utils.tracing import Tracer
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines", "default.json")
+OPTION_CHAIN_SIZES = [1, 10, 100, 1000]
+SENTIMENT_BATCH_SIZES = [100, 1000]
+DB_INSERT_ROWS = 1000
+TRACER_SPANS = 100000
+SPAN_BUDGET_S = 1e-6 # live-path tracing budget per span
+
+def time_case(fn, repeats, setup=None):
+    # setup() builds fresh inputs for every repeat (several methods mutate their frame in place)
+    # and is excluded from the timing. One untimed warm-up run comes first.
+    fn(*(setup() if setup else ()))
+    timings = []
+    for _ in range(repeats):
+        args = setup() if setup else ()
+        start = time.perf_counter()
+        fn(*args)
+        timings.append(time.perf_counter() - start)
+    return {"median_s": statistics.median(timings), "min_s": min(timings), "repeats": repeats}
+
+def daily_bars(bars):
+    daily = bars.set_index("timestamp").resample("D").agg({"open": "first", "high": "max", "low": "min", "close": "last", "volume": "sum"})
+    return daily.dropna().reset_index()
+
+def market_cases(scale, repeats):
+    bars = generate_ohlcv_bars(SCALES[scale], seed=1)
+    cleaner = DataCleaner()
+    engineer = FeatureEngineer()
+    # The regime model is fitted and saved once up front and then reused, as in production
+    vol = VolatilityAnalyzer(regime_model_path=os.path.join(tempfile.mkdtemp(prefix="nifty_bench_"), "regimes.npz"))
+    vol.fit_regime_model(bars.copy())
+    backtester = BacktestEngine()
+    fresh = lambda: (bars.copy(),)
+
+    def feature_pipeline(df):
+        df = engineer.add_technical_indicators(df)
+        df = engineer.add_volatility_features(df)
+        df = engineer.add_options_features(df)
+        df = engineer.add_sentiment_features(df)
+        return engineer.create_rl_state_space(df)
+
+    cases = {
+        "clean_market_data": (cleaner.clean_market_data, fresh),
+        "feature_engineer_end_to_end": (feature_pipeline, fresh),
+        "historical_volatility": (vol.calculate_historical_volatility, fresh),
+        "parkinson_volatility": (vol.calculate_parkinson_volatility, fresh),
+        "garman_klass_volatility": (vol.calculate_garman_klass_volatility, fresh),
+        "volatility_cones": (vol.calculate_volatility_cones, fresh),
+        "volatility_cone_bands": (vol.calculate_volatility_cone_bands, fresh),
+        "identify_volatility_regimes": (vol.identify_volatility_regimes, fresh),
+        "backtest_sma_crossover": (lambda: backtester.run(bars, sma_crossover_signal(bars, 20, 100)), None),
+    }
+
+    daily = daily_bars(bars)
+    if len(daily) >= 30:
+        # CorrelationAnalyzer aligns on calendar days, so it gets daily bars and raw intraday sentiment
+        rng = np.random.default_rng(2)
+        sentiment = pd.DataFrame({"timestamp": bars["timestamp"].iloc[::15].to_numpy(),
+                                  "sentiment_score": rng.uniform(-1, 1, len(bars["timestamp"].iloc[::15]))})
+        volatility = vol.calculate_historical_volatility(daily.copy())
+        corr = CorrelationAnalyzer()
+        cases.update({
+            "price_sentiment_correlation": (lambda: corr.calculate_price_sentiment_correlation(daily, sentiment, window=20), None),
+            "volatility_sentiment_correlation": (lambda: corr.calculate_volatility_sentiment_correlation(volatility, sentiment, window=20), None),
+            "scan_price_sentiment_correlation": (lambda: corr.scan_price_sentiment_correlation(daily, sentiment), None),
+            "scan_volatility_sentiment_correlation": (lambda: corr.scan_volatility_sentiment_correlation(volatility, sentiment), None),
+        })
+
+    results = {}
+    for name, (fn, setup) in cases.items():
+        results[f"{name}[{scale}]"] = dict(time_case(fn, repeats, setup), rows=len(bars))
+    return results
+
+def option_chain_cases(repeats):
+    results = {}
+    for n_contracts in OPTION_CHAIN_SIZES:
+        chain = generate_option_chain(n_contracts, seed=3)
+        quotes = chain.drop(columns=["iv"])
+        t = ((chain["expiry"] - pd.Timestamp("2024-01-15 10:00")).dt.total_seconds() / (365.0 * 24 * 3600)).to_numpy()
+        forwards = 22000.0 * np.exp(0.07 * t)
+
+        def solve():
+            implied_volatility(quotes["last_price"].to_numpy(), forwards, quotes["strike"].to_numpy(), t,
+                               (quotes["option_type"] == "CE").to_numpy(), discount=np.exp(-0.07 * t))
+
+        def fit_surface():
+            VolatilitySurface("NIFTY", min_quotes_per_expiry=1).update(quotes, 22000.0, as_of="2024-01-15 10:00")
+
+        results[f"implied_volatility[{n_contracts}]"] = dict(time_case(solve, repeats), rows=n_contracts)
+        results[f"volatility_surface_fit[{n_contracts}]"] = dict(time_case(fit_surface, repeats), rows=n_contracts)
+    return results
+
+def database_cases(repeats):
+    bars = generate_ohlcv_bars(3, seed=4).head(DB_INSERT_ROWS)
+    market_rows = [dict(row, timestamp=row["timestamp"].to_pydatetime()) for row in bars.to_dict("records")]
+    offset = iter(range(10 ** 6))
+
+    def insert_market():
+        for row in market_rows:
+            db_manager.add_market_data(row)
+
+    def insert_sentiment():
+        # A distinct month per repeat so every run appends new index buckets instead of updating old ones
+        start = pd.Timestamp("2024-01-01") + pd.DateOffset(months=next(offset))
+        db_manager.add_sentiment_data_many(generate_sentiment_rows(DB_INSERT_ROWS, seed=5, start=start))
+
+    results = {
+        "db_add_market_data_per_row": dict(time_case(insert_market, repeats), rows=DB_INSERT_ROWS),
+        "db_add_sentiment_data_many": dict(time_case(insert_sentiment, repeats), rows=DB_INSERT_ROWS),
+    }
+    results["db_search_sentiment"] = dict(time_case(lambda: db_manager.search_sentiment("HDFC OR RBI", limit=500), repeats),
+                                          rows=DB_INSERT_ROWS * (repeats + 1))
+    return results
+
+def tracing_cases(repeats):
+    # Cost of a span on the live path (attached to an open market event) over an empty with block.
+    # The overhead per span is checked against SPAN_BUDGET_S by over_budget().
+    tracer = Tracer(export_interval_seconds=0)
+
+    class Empty:
+        __slots__ = ()
+        def __enter__(self):
+            return self
+        def __exit__(self, exc_type, exc_value, traceback):
+            return False
+
+    def spans():
+        for _ in range(TRACER_SPANS):
+            with tracer.span("features"):
+                pass
+
+    def empty():
+        for _ in range(TRACER_SPANS):
+            with Empty():
+                pass
+
+    def event_spans():
+        tracer.begin_event("bench")
+        spans()
+        tracer.end_event("bench")
+
+    timed = time_case(event_spans, repeats)
+    baseline = time_case(empty, repeats)
+    tracer.close()
+    overhead = max(timed["min_s"] - baseline["min_s"], 0.0) / TRACER_SPANS
+    return {f"tracer_span[{TRACER_SPANS}]": dict(timed, rows=TRACER_SPANS, overhead_s_per_row=overhead,
+                                                   budget_s_per_row=SPAN_BUDGET_S)}
+
+def sentiment_cases(repeats):
+    analyzer = SentimentAnalyzer()
+    relevance = RelevanceFilter()
+    results = {}
+    for n in SENTIMENT_BATCH_SIZES:
+        texts = generate_news_texts(n, seed=6)
+        results[f"sentiment_analyze_batch[{n}]"] = dict(time_case(lambda: analyzer.analyze_batch(texts), repeats), rows=n)
+        results[f"relevance_filter[{n}]"] = dict(time_case(lambda: relevance.filter_texts(texts), repeats), rows=n)
+    return results, analyzer.finbert is not None
+
+def finbert_cases():
+    # Wraps the fp32 vs dynamic int8 comparison; needs the FinBERT weights in the local cache
+    from nifty_trading_agent.benchmarks.finbert_quantization import run as run_finbert
+    report = run_finbert()
+    results = {}
+    for mode in ("fp32", "dynamic_int8"):
+        results[f"finbert_single_latency[{mode}]"] = {"median_s": report[mode]["single_latency_ms_p50"] / 1000, "rows": 1}
+        results[f"finbert_batch[{mode}]"] = {"median_s": report["n_texts"] / report[mode]["batch_texts_per_sec"], "rows": report["n_texts"]}
+    return results
+
+def run(scales, repeats, include_db=True, include_sentiment=True, include_finbert=False):
+    results = {}
+    for scale in scales:
+        results.update(market_cases(scale, repeats))
+    results.update(option_chain_cases(repeats))
+    results.update(tracing_cases(repeats))
+    metadata = {}
+    if include_db:
+        results.update(database_cases(repeats))
+    if include_sentiment:
+        sentiment_results, finbert_loaded = sentiment_cases(repeats)
+        results.update(sentiment_results)
+        metadata["finbert_loaded"] = finbert_loaded
+    if include_finbert:
+        results.update(finbert_cases())
+    metadata.update({
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "scales": list(scales),
+        "repeats": repeats,
+    })
+    return {"metadata": metadata, "results": results}
+
+def compare(report, baseline, threshold=0.25, min_delta_s=0.002):
+    # A case regresses when its median is more than `threshold` slower than the baseline and the
+    # slowdown is at least `min_delta_s` (so microsecond-scale cases do not trip on timer noise)
+    regressions = []
+    lines = []
+    for key in ("finbert_loaded", "cpu_count", "python"):
+        if key in baseline["metadata"] and baseline["metadata"][key] != report["metadata"].get(key):
+            lines.append(f"warning: {key} differs from the baseline ({baseline['metadata'][key]} vs {report['metadata'].get(key)})")
+    for name, current in sorted(report["results"].items()):
+        base = baseline["results"].get(name)
+        if base is None:
+            lines.append(f"{name:55s} {current['median_s'] * 1000:10.2f} ms   (no baseline)")
+            continue
+        ratio = current["median_s"] / base["median_s"] if base["median_s"] > 0 else float("inf")
+        regressed = ratio > 1 + threshold and current["median_s"] - base["median_s"] >= min_delta_s
+        if regressed:
+            regressions.append(name)
+        lines.append(f"{name:55s} {current['median_s'] * 1000:10.2f} ms  vs {base['median_s'] * 1000:10.2f} ms  "
+                     f"x{ratio:5.2f}{'  REGRESSION' if regressed else ''}")
+    return regressions, lines
+
+def over_budget(report):
+    # Cases that carry a per-row budget and exceed it, whatever the baseline says
+    lines = []
+    for name, result in sorted(report["results"].items()):
+        if "budget_s_per_row" in result and result["overhead_s_per_row"] > result["budget_s_per_row"]:
+            lines.append(f"{name}: {result['overhead_s_per_row'] * 1e9:.0f} ns per row, budget {result['budget_s_per_row'] * 1e9:.0f} ns")
+    return lines
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the data, analysis, storage and sentiment pipelines on synthetic data.")
+    parser.add_argument("--scales", default="1d,1y", help=f"Comma-separated bar scales from {list(SCALES)}")
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--skip-db", action="store_true")
+    parser.add_argument("--skip-sentiment", action="store_true")
+    parser.add_argument("--include-finbert", action="store_true", help="Also run the FinBERT fp32/int8 benchmark")
+    parser.add_argument("--output", help="Write this run's JSON report here")
+    parser.add_argument("--compare", nargs="?", const=DEFAULT_BASELINE, help="Baseline JSON to check for regressions")
+    parser.add_argument("--save-baseline", nargs="?", const=DEFAULT_BASELINE, help="Store this run as the baseline")
+    parser.add_argument("--threshold", type=float, default=0.25, help="Allowed slowdown before a case counts as a regression")
+    args = parser.parse_args(argv)
+
+    scales = [s.strip() for s in args.scales.split(",") if s.strip()]
+    unknown = [s for s in scales if s not in SCALES]
+    if unknown:
+        parser.error(f"Unknown scales {unknown}; choose from {list(SCALES)}")
+
+    report = run(scales, args.repeats, include_db=not args.skip_db, include_sentiment=not args.skip_sentiment,
+                 include_finbert=args.include_finbert)
+    for path in filter(None, [args.output, args.save_baseline]):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, "w") as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+
+    status = 0
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions, lines = compare(report, baseline, threshold=args.threshold)
+        print("\n".join(lines))
+        if regressions:
+            print(f"{len(regressions)} regression(s) beyond {args.threshold:.0%}: {', '.join(regressions)}")
+            status = 1
+        else:
+            print("No regressions.")
+    else:
+        for name, result in sorted(report["results"].items()):
+            print(f"{name:55s} {result['median_s'] * 1000:10.2f} ms")
+    budget_lines = over_budget(report)
+    if budget_lines:
+        print("Over budget:\n" + "\n".join(budget_lines))
+        status = 1
+    return status
+
+if __name__ == "__main__":
+    sys.exit(main())
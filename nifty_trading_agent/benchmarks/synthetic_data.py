@@ -0,0 +1,111 @@
+import numpy as np
+import pandas as pd
+from scipy.special import ndtr
+
+# Deterministic synthetic inputs for the benchmark suite. Every generator takes a seed, so the
+# same scale always produces byte-identical data and timings stay comparable across runs.
+
+BARS_PER_DAY = 375 # 09:15-15:30 IST minute bars
+SCALES = {"1d": 1, "1y": 252, "5y": 1260} # trading days
+
+HEADLINE_TEMPLATES = [
+    "{index} {move} {pct}% as {sector} stocks {verb}",
+    "{bank} shares {verb} after {event}",
+    "RBI {policy} repo rate at {rate}%, {index} {move}",
+    "FIIs {flow} Rs {crore} crore from Indian equities; {index} {move}",
+    "{index} options data shows heavy {side} writing at {strike} strike",
+    "Rupee {verb} to {fx} per dollar as crude {move}",
+    "{company} {verb} on {event}",
+    "Premier League: {team} {result} in a late thriller",
+]
+VOCABULARY = {
+    "index": ["Nifty", "Bank Nifty", "Sensex", "Nifty IT", "Nifty Financial Services"],
+    "move": ["rises", "falls", "jumps", "slips", "ends flat", "hits record high", "slumps"],
+    "sector": ["banking", "IT", "auto", "pharma", "metal", "FMCG"],
+    "verb": ["rally", "slide", "surge", "tumble", "recover", "weaken", "gain"],
+    "bank": ["HDFC Bank", "ICICI Bank", "SBI", "Kotak Mahindra Bank", "Axis Bank", "IndusInd Bank"],
+    "event": ["strong Q3 earnings", "RBI curbs", "asset quality concerns", "a rating upgrade", "weak loan growth"],
+    "policy": ["holds", "hikes", "cuts"],
+    "flow": ["pull out", "invest", "pump in"],
+    "side": ["call", "put"],
+    "company": ["Reliance Industries", "Infosys", "TCS", "Tata Motors", "Adani Enterprises", "Bajaj Finance"],
+    "team": ["Arsenal", "Chelsea", "Liverpool"],
+    "result": ["win", "draw", "lose"],
+}
+
+def generate_ohlcv_bars(n_days, seed=0, start="2019-01-01", instrument_token=256265, tradingsymbol="NIFTY 50"):
+    # Minute OHLCV+OI bars in DataCollector's column layout
+    rng = np.random.default_rng(seed)
+    days = pd.bdate_range(start, periods=n_days)
+    minutes = pd.to_timedelta(np.arange(BARS_PER_DAY), unit="min") + pd.Timedelta(hours=9, minutes=15)
+    timestamps = (days.values[:, None] + minutes.values[None, :]).ravel()
+    n = len(timestamps)
+
+    sigma = 0.15 / np.sqrt(252 * BARS_PER_DAY) # 15% annualised
+    close = 18000 * np.exp(np.cumsum(rng.normal(0, sigma, n)))
+    open_ = np.empty(n)
+    open_[0] = close[0]
+    open_[1:] = close[:-1] * np.exp(rng.normal(0, sigma / 4, n - 1))
+    spread = np.abs(rng.normal(0, sigma, n))
+    high = np.maximum(open_, close) * (1 + spread)
+    low = np.minimum(open_, close) * (1 - spread)
+    volume = rng.integers(1000, 50000, n)
+    oi = np.maximum(1_000_000 + np.cumsum(rng.integers(-5000, 5000, n)), 0)
+    return pd.DataFrame({
+        "instrument_token": instrument_token,
+        "tradingsymbol": tradingsymbol,
+        "timestamp": timestamps,
+        "open": open_, "high": high, "low": low, "close": close,
+        "volume": volume, "oi": oi
+    })
+
+def generate_option_chain(n_contracts, seed=0, spot=22000.0, as_of="2024-01-15 10:00", rate=0.07, n_expiries=None):
+    # NIFTY-style chain: weekly expiries, 50-point strikes around spot, calls and puts priced off
+    # a skewed Black-76 smile
+    rng = np.random.default_rng(seed)
+    as_of = pd.Timestamp(as_of)
+    n_expiries = n_expiries or max(1, min(4, n_contracts // 20))
+    expiries = [as_of.normalize() + pd.Timedelta(days=7 * (i + 1), hours=15, minutes=30) for i in range(n_expiries)]
+    per_expiry = int(np.ceil(n_contracts / n_expiries))
+    strikes_per_side = int(np.ceil(per_expiry / 2))
+    strike_grid = np.round(spot / 50) * 50 + 50 * (np.arange(strikes_per_side) - strikes_per_side // 2)
+
+    rows = []
+    for expiry in expiries:
+        t = (expiry - as_of).total_seconds() / (365.0 * 24 * 3600)
+        forward = spot * np.exp(rate * t)
+        k = np.log(strike_grid / forward)
+        iv = 0.13 - 0.25 * k + 1.5 * k * k + rng.normal(0, 0.002, len(k))
+        vol_t = iv * np.sqrt(t)
+        d1 = -k / vol_t + 0.5 * vol_t
+        d2 = d1 - vol_t
+        discount = np.exp(-rate * t)
+        call = discount * (forward * ndtr(d1) - strike_grid * ndtr(d2))
+        put = call - discount * (forward - strike_grid)
+        for option_type, prices in (("CE", call), ("PE", put)):
+            rows.append(pd.DataFrame({
+                "expiry": expiry, "strike": strike_grid, "option_type": option_type,
+                "last_price": np.maximum(prices, 0.05), "iv": iv, "oi": rng.integers(1000, 200000, len(k))
+            }))
+    return pd.concat(rows, ignore_index=True).head(n_contracts)
+
+def generate_news_texts(n, seed=0):
+    rng = np.random.default_rng(seed)
+    texts = []
+    for _ in range(n):
+        template = HEADLINE_TEMPLATES[rng.integers(len(HEADLINE_TEMPLATES))]
+        fields = {key: values[rng.integers(len(values))] for key, values in VOCABULARY.items()}
+        fields.update(pct=round(float(rng.uniform(0.1, 3.0)), 2), rate=round(float(rng.uniform(6.0, 6.75)), 2),
+                      crore=int(rng.integers(500, 20000)), strike=int(rng.integers(400, 480)) * 50,
+                      fx=round(float(rng.uniform(82, 84)), 2))
+        texts.append(template.format(**fields))
+    return texts
+
+def generate_sentiment_rows(n, seed=0, start="2024-01-01"):
+    rng = np.random.default_rng(seed)
+    texts = generate_news_texts(n, seed)
+    timestamps = (pd.Timestamp(start) + pd.to_timedelta(np.sort(rng.uniform(0, 30 * 24 * 3600, n)), unit="s")).floor("us")
+    scores = rng.uniform(-1, 1, n)
+    return [{"source": ["NewsAPI", "Economic Times", "MoneyControl", "Reddit"][i % 4], "timestamp": ts.to_pydatetime(),
+             "text": text, "sentiment_score": float(score), "sentiment_magnitude": float(abs(score))}
+            for i, (ts, text, score) in enumerate(zip(timestamps, texts, scores))]
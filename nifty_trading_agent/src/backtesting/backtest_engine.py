@@ -0,0 +1,253 @@
+import itertools
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from ..utils.config_manager import config
+from ..utils.logger import logger
+
+TRADE_LOG_COLUMNS = ["timestamp", "tradingsymbol", "transaction_type", "quantity", "price", "order_id", "status", "pnl", "is_paper_trade"]
+
+def monthly_expiries(start, end, weekday=3):
+    # Last `weekday` (Thursday by default) of every month covering [start, end]; holidays are handled
+    # by rolling on the last bar at or before the expiry date
+    months = pd.period_range(pd.Timestamp(start).to_period("M"), pd.Timestamp(end).to_period("M") + 1, freq="M")
+    month_ends = months.to_timestamp(how="end").normalize()
+    return month_ends - pd.to_timedelta((month_ends.weekday - weekday) % 7, unit="D")
+
+def walk_forward_splits(n, train_size, test_size, step=None, expanding=False):
+    # (train, test) index ranges over n bars; each test window directly follows its train window
+    step = step or test_size
+    splits = []
+    start = 0
+    while start + train_size + test_size <= n:
+        train_start = 0 if expanding else start
+        splits.append((np.arange(train_start, start + train_size), np.arange(start + train_size, start + train_size + test_size)))
+        start += step
+    return splits
+
+def sma_crossover_signal(bars, fast=20, slow=100, lots=1):
+    # Reference strategy: long `lots` when the fast SMA is above the slow one, short otherwise
+    close = bars["close"].to_numpy(dtype=np.float64)
+    csum = np.concatenate([[0.0], np.cumsum(close)])
+    fast_ma = np.full(len(close), np.nan)
+    slow_ma = np.full(len(close), np.nan)
+    fast_ma[fast - 1:] = (csum[fast:] - csum[:-fast]) / fast
+    slow_ma[slow - 1:] = (csum[slow:] - csum[:-slow]) / slow
+    signal = np.where(fast_ma > slow_ma, lots, -lots).astype(np.float64)
+    signal[np.isnan(slow_ma)] = 0.0
+    return signal
+
+class BacktestEngine:
+    # Vectorised backtest of a target-position signal on an index future. signal[t] is the target
+    # position in lots decided on bar t's close and filled at bar t+1's open with slippage, so
+    # nothing trades on information it could not have had. Positions held into an expiry are
+    # rolled (sold and rebought, or vice versa) on the last bar of the contract, paying costs
+    # twice. Costs follow the Indian F&O schedule: per-order brokerage (flat, capped by a rate),
+    # STT on sell-side turnover, exchange charges, GST on brokerage + exchange charges and stamp
+    # duty on buy-side turnover.
+
+    def __init__(self, lot_size=25, initial_capital=1000000, slippage_bps=1.0, brokerage_per_order=20.0,
+                 brokerage_rate=0.0003, stt_sell_rate=0.0002, exchange_txn_rate=0.0000173, gst_rate=0.18,
+                 stamp_duty_buy_rate=0.00002, tradingsymbol="NIFTY"):
+        self.lot_size = lot_size
+        self.initial_capital = float(initial_capital)
+        self.slippage_bps = slippage_bps
+        self.brokerage_per_order = brokerage_per_order
+        self.brokerage_rate = brokerage_rate
+        self.stt_sell_rate = stt_sell_rate
+        self.exchange_txn_rate = exchange_txn_rate
+        self.gst_rate = gst_rate
+        self.stamp_duty_buy_rate = stamp_duty_buy_rate
+        self.tradingsymbol = tradingsymbol
+        logger.info("BacktestEngine initialized.")
+
+    @classmethod
+    def from_config(cls, tradingsymbol="NIFTY"):
+        return cls(lot_size=config.get(f"trading.lot_sizes.{tradingsymbol}", 25),
+                   initial_capital=config.get("trading.initial_capital", 1000000),
+                   slippage_bps=config.get("backtest.slippage_bps", 1.0),
+                   brokerage_per_order=config.get("backtest.brokerage_per_order", 20.0),
+                   brokerage_rate=config.get("backtest.brokerage_rate", 0.0003),
+                   stt_sell_rate=config.get("backtest.stt_sell_rate", 0.0002),
+                   exchange_txn_rate=config.get("backtest.exchange_txn_rate", 0.0000173),
+                   gst_rate=config.get("backtest.gst_rate", 0.18),
+                   stamp_duty_buy_rate=config.get("backtest.stamp_duty_buy_rate", 0.00002),
+                   tradingsymbol=tradingsymbol)
+
+    def _order_costs(self, buy_notional, sell_notional, orders_notional_list):
+        brokerage = sum(np.where(notional > 0, np.minimum(self.brokerage_per_order, notional * self.brokerage_rate), 0.0)
+                        for notional in orders_notional_list)
+        turnover = buy_notional + sell_notional
+        exchange = turnover * self.exchange_txn_rate
+        return (brokerage + sell_notional * self.stt_sell_rate + exchange + (brokerage + exchange) * self.gst_rate
+                + buy_notional * self.stamp_duty_buy_rate)
+
+    def run(self, bars, signal, expiries=None, with_trades=True):
+        timestamps = pd.to_datetime(bars["timestamp"]).to_numpy()
+        close = bars["close"].to_numpy(dtype=np.float64)
+        open_ = bars["open"].to_numpy(dtype=np.float64) if "open" in bars else close
+        n = len(close)
+        signal = np.nan_to_num(np.rint(np.asarray(signal, dtype=np.float64)))
+        if len(signal) != n:
+            logger.error(f"Signal length {len(signal)} does not match {n} bars.")
+            return None
+        slip = self.slippage_bps / 10000.0
+        units = self.lot_size
+
+        # Position held through bar t and the trade filled at its open
+        position = np.zeros(n)
+        position[1:] = signal[:-1]
+        trade = np.diff(position, prepend=0.0)
+        fill = open_ * (1 + slip * np.sign(trade))
+
+        # Contract cycle of each bar; a roll happens on the last bar before the cycle changes
+        if expiries is None:
+            expiries = monthly_expiries(timestamps[0], timestamps[-1])
+        expiry_days = np.asarray(pd.DatetimeIndex(expiries).normalize().sort_values(), dtype="datetime64[ns]")
+        cycle = np.searchsorted(expiry_days, timestamps.astype("datetime64[D]").astype("datetime64[ns]"), side="left")
+        roll = np.zeros(n, dtype=bool)
+        roll[:-1] = (cycle[1:] != cycle[:-1]) & (position[:-1] != 0)
+
+        trade_notional = np.abs(trade) * units * open_
+        roll_notional = np.where(roll, np.abs(position) * units * close, 0.0)
+        buy_notional = np.where(trade > 0, trade_notional, 0.0) + roll_notional
+        sell_notional = np.where(trade < 0, trade_notional, 0.0) + roll_notional
+        slippage = (trade_notional + 2 * roll_notional) * slip
+        costs = self._order_costs(buy_notional, sell_notional, [trade_notional, roll_notional, roll_notional]) + slippage
+
+        prev_close = np.concatenate([[close[0]], close[:-1]])
+        prev_position = np.concatenate([[0.0], position[:-1]])
+        gross = units * (prev_position * (open_ - prev_close) + position * (close - open_))
+        net = gross - costs
+        equity = self.initial_capital + np.cumsum(net)
+
+        result = {
+            "bars": pd.DataFrame({"timestamp": timestamps, "position": position, "gross_pnl": gross,
+                                  "costs": costs, "net_pnl": net, "equity": equity}),
+            "stats": self._stats(timestamps, net, equity, costs, trade, roll),
+        }
+        if with_trades:
+            result["trades"] = self._trade_records(timestamps, position, trade, fill, roll, close, cycle, expiry_days, net)
+        return result
+
+    def _stats(self, timestamps, net, equity, costs, trade, roll):
+        daily_pnl = pd.Series(net, index=pd.DatetimeIndex(timestamps)).resample("D").sum()
+        daily_pnl = daily_pnl[daily_pnl.index.dayofweek < 5]
+        daily_equity = self.initial_capital + daily_pnl.cumsum()
+        daily_returns = daily_pnl / daily_equity.shift(1, fill_value=self.initial_capital)
+        running_max = np.maximum.accumulate(np.concatenate([[self.initial_capital], equity]))
+        drawdown = 1 - np.concatenate([[self.initial_capital], equity]) / running_max
+        std = daily_returns.std()
+        return {
+            "total_pnl": float(net.sum()),
+            "total_return": float(equity[-1] / self.initial_capital - 1),
+            "sharpe": float(daily_returns.mean() / std * np.sqrt(252)) if std > 0 else 0.0,
+            "max_drawdown": float(drawdown.max()),
+            "total_costs": float(costs.sum()),
+            "n_trades": int(np.count_nonzero(trade) + 2 * np.count_nonzero(roll)),
+            "n_rolls": int(np.count_nonzero(roll)),
+        }
+
+    def _contract_symbol(self, expiry):
+        return f"{self.tradingsymbol}{pd.Timestamp(expiry):%y%b}FUT".upper()
+
+    def _trade_records(self, timestamps, position, trade, fill, roll, close, cycle, expiry_days, net):
+        # TradeLog rows: signal trades at the bar's open, then the roll's closing and opening legs at
+        # its close. pnl on the first record of a bar is the net P&L accrued since the previous one.
+        # A position still open after the last bar gets a BACKTEST_MARK row closing it at that bar's
+        # close (no costs), so the rows' pnl always sums to the run's total_pnl.
+        trade_bars = np.flatnonzero(trade)
+        roll_bars = np.flatnonzero(roll)
+        contract_cycle = np.minimum(cycle, len(expiry_days) - 1)
+        frames = [
+            pd.DataFrame({"bar": trade_bars, "leg": 0, "cycle": contract_cycle[trade_bars],
+                          "signed_lots": trade[trade_bars], "price": fill[trade_bars]}),
+            pd.DataFrame({"bar": roll_bars, "leg": 1, "cycle": contract_cycle[roll_bars],
+                          "signed_lots": -position[roll_bars], "price": close[roll_bars]}),
+            pd.DataFrame({"bar": roll_bars, "leg": 2, "cycle": np.minimum(contract_cycle[roll_bars] + 1, len(expiry_days) - 1),
+                          "signed_lots": position[roll_bars], "price": close[roll_bars]}),
+        ]
+        last = len(position) - 1
+        if position[last] != 0:
+            frames.append(pd.DataFrame({"bar": [last], "leg": 3, "cycle": contract_cycle[last],
+                                        "signed_lots": -position[last], "price": close[last]}))
+        records = pd.concat(frames, ignore_index=True).sort_values(["bar", "leg"], kind="stable").reset_index(drop=True)
+        if records.empty:
+            return pd.DataFrame(columns=TRADE_LOG_COLUMNS)
+
+        cum_net = np.cumsum(net)
+        bars_idx = records["bar"].to_numpy()
+        first_of_bar = np.concatenate([[True], bars_idx[1:] != bars_idx[:-1]])
+        accrued = np.diff(cum_net[bars_idx[first_of_bar]], prepend=0.0)
+        pnl = np.zeros(len(records))
+        pnl[first_of_bar] = accrued
+
+        symbols = {c: self._contract_symbol(expiry_days[c]) for c in np.unique(records["cycle"])}
+        return pd.DataFrame({
+            "timestamp": pd.to_datetime(timestamps[bars_idx]),
+            "tradingsymbol": records["cycle"].map(symbols).to_numpy(),
+            "transaction_type": np.where(records["signed_lots"] > 0, "BUY", "SELL"),
+            "quantity": (np.abs(records["signed_lots"]) * self.lot_size).astype(np.int64).to_numpy(),
+            "price": records["price"].to_numpy(),
+            "order_id": [f"BT-{i}" for i in range(len(records))],
+            "status": np.select([records["leg"] == 0, records["leg"] == 3], ["BACKTEST", "BACKTEST_MARK"], "BACKTEST_ROLL"),
+            "pnl": pnl,
+            "is_paper_trade": True,
+        })
+
+    def walk_forward(self, bars, strategy, param_grid, train_size, test_size, step=None, expanding=False, metric="sharpe",
+                     max_workers=None):
+        # For every split, pick the grid point with the best `metric` on the train window and run it
+        # out of sample on the following test window. The grid is scored in a process pool like
+        # grid_search(), so `strategy` must be a module-level function; workers get the bars once
+        # and slice out each train window themselves.
+        bars = bars.reset_index(drop=True)
+        grid = _expand_grid(param_grid)
+        windows = []
+        with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker, initargs=(self, bars, strategy)) as pool:
+            for train_idx, test_idx in walk_forward_splits(len(bars), train_size, test_size, step, expanding):
+                windows.append(self._walk_forward_window(pool, bars, strategy, grid, train_idx, test_idx, metric))
+        return pd.DataFrame(windows)
+
+    def _walk_forward_window(self, pool, bars, strategy, grid, train_idx, test_idx, metric):
+        train = bars.iloc[train_idx].reset_index(drop=True)
+        start, stop = train_idx[0], train_idx[-1] + 1
+        stats = pool.map(_run_worker, grid, [start] * len(grid), [stop] * len(grid))
+        best_score, best_params = max(((result[metric], params) for params, result in zip(grid, stats)), key=lambda item: item[0])
+        # The signal is computed over train + test so indicators are warmed up when the test starts
+        history = bars.iloc[train_idx[0]:test_idx[-1] + 1].reset_index(drop=True)
+        test = bars.iloc[test_idx].reset_index(drop=True)
+        result = self.run(test, strategy(history, **best_params)[-len(test_idx):], with_trades=False)
+        return {"train_start": train["timestamp"].iloc[0], "test_start": test["timestamp"].iloc[0],
+                "test_end": test["timestamp"].iloc[-1], "params": best_params,
+                f"train_{metric}": best_score, **{f"test_{k}": v for k, v in result["stats"].items()}}
+
+    def grid_search(self, bars, strategy, param_grid, max_workers=None):
+        # Runs every parameter combination in a process pool; `strategy` must be a module-level
+        # function so it can be pickled. Bars are shipped once per worker, not once per task.
+        grid = _expand_grid(param_grid)
+        with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker, initargs=(self, bars, strategy)) as pool:
+            stats = list(pool.map(_run_worker, grid))
+        return pd.DataFrame([{**params, **result} for params, result in zip(grid, stats)])
+
+def _expand_grid(param_grid):
+    keys = list(param_grid)
+    return [dict(zip(keys, values)) for values in itertools.product(*(param_grid[k] for k in keys))]
+
+_worker_state = {}
+
+def _init_worker(engine, bars, strategy):
+    _worker_state.update(engine=engine, bars=bars, strategy=strategy)
+
+def _run_worker(params, start=None, stop=None):
+    # Scores one grid point on the worker's bars, or on bars[start:stop] for a walk-forward window
+    bars = _worker_state["bars"]
+    if start is not None:
+        bars = bars.iloc[start:stop].reset_index(drop=True)
+    return _worker_state["engine"].run(bars, _worker_state["strategy"](bars, **params), with_trades=False)["stats"]
+
+def load_market_data(instrument_token, start=None, end=None, db=None):
+    # Stored MarketData bars for one instrument, oldest first
+    if db is None:
+        from ..utils.database import db_manager as db
+    return db.get_market_data(instrument_token, start, end)
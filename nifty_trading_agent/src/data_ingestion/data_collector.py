@@ -2,7 +2,8 @@ import pandas as pd
 from datetime import datetime, timedelta
 from ..data_ingestion.zerodha_client import ZerodhaClient
 from ..utils.database import db_manager
-from ..utils.logger import logger
+from ..utils.logger import logger, log_every
+from ..utils.tracing import tracer
 
 class DataCollector:
     def __init__(self):
@@ -28,25 +29,28 @@ class DataCollector:
         return pd.DataFrame()
 
     def collect_live_data(self, instrument_token):
-        logger.info(f"Collecting live data for {instrument_token}")
+        logger.debug("Collecting live data for {}", instrument_token)
         quote = self.zerodha_client.get_quote(instrument_token)
         if quote and instrument_token in quote:
-            data = quote[instrument_token]["last_price"]
-            # In a real scenario, you'd get more details like OHLC, volume, OI
-            # For simplicity, let's assume we get a full candle or tick data
-            live_data = {
-                "instrument_token": instrument_token,
-                "tradingsymbol": quote[instrument_token]["tradingsymbol"], # Use actual tradingsymbol
-                "timestamp": datetime.now(),
-                "open": quote[instrument_token].get("ohlc", {}).get("open", data),
-                "high": quote[instrument_token].get("ohlc", {}).get("high", data),
-                "low": quote[instrument_token].get("ohlc", {}).get("low", data),
-                "close": data,
-                "volume": quote[instrument_token].get("volume", 0),
-                "oi": quote[instrument_token].get("oi", 0)
-            }
-            db_manager.add_market_data(live_data)
-            logger.info(f"Collected live data for {instrument_token}: {data}")
+            with tracer.span("normalise_tick"):
+                data = quote[instrument_token]["last_price"]
+                # In a real scenario, you'd get more details like OHLC, volume, OI
+                # For simplicity, let's assume we get a full candle or tick data
+                live_data = {
+                    "instrument_token": instrument_token,
+                    "tradingsymbol": quote[instrument_token]["tradingsymbol"], # Use actual tradingsymbol
+                    "timestamp": datetime.now(),
+                    "open": quote[instrument_token].get("ohlc", {}).get("open", data),
+                    "high": quote[instrument_token].get("ohlc", {}).get("high", data),
+                    "low": quote[instrument_token].get("ohlc", {}).get("low", data),
+                    "close": data,
+                    "volume": quote[instrument_token].get("volume", 0),
+                    "oi": quote[instrument_token].get("oi", 0)
+                }
+            with tracer.span("store_tick"):
+                db_manager.add_market_data(live_data)
+            # Called for every instrument on every tick: surface it at INFO at most once a minute
+            log_every("data_collector.collect_live_data", 60, "INFO", "Collected live data for {}: {}", instrument_token, data)
             return live_data
         logger.warning(f"No live data collected for {instrument_token}.")
         return None
@@ -1,6 +1,7 @@
 from kiteconnect import KiteConnect
 from ..utils.config_manager import config
 from ..utils.logger import logger
+from ..utils.tracing import tracer
 
 class ZerodhaClient:
     def __init__(self):
@@ -33,7 +34,7 @@ class ZerodhaClient:
     def get_historical_data(self, instrument_token, from_date, to_date, interval):
         try:
             data = self.kite.historical_data(instrument_token, from_date, to_date, interval)
-            logger.info(f"Fetched historical data for {instrument_token} from {from_date} to {to_date}")
+            logger.debug("Fetched historical data for {} from {} to {}", instrument_token, from_date, to_date)
             return data
         except Exception as e:
             logger.error(f"Error fetching historical data: {e}")
@@ -41,8 +42,15 @@ class ZerodhaClient:
 
     def get_quote(self, instrument_token):
         try:
-            data = self.kite.quote(instrument_token)
-            logger.info(f"Fetched quote for {instrument_token}")
+            with tracer.span("quote_fetch"):
+                data = self.kite.quote(instrument_token)
+            # The quote has arrived: open a tick-to-order event per instrument, closed by the order
+            # placed for that instrument. With a single instrument, downstream spans in this
+            # thread/task are attached to its event.
+            instruments = instrument_token if isinstance(instrument_token, (list, tuple)) else [instrument_token]
+            for instrument in instruments:
+                tracer.begin_event(instrument, attach=len(instruments) == 1)
+            logger.debug("Fetched quote for {}", instrument_token)
             return data
         except Exception as e:
             logger.error(f"Error fetching quote: {e}")
@@ -51,7 +59,7 @@ class ZerodhaClient:
     def get_ohlc(self, instrument_token):
         try:
             data = self.kite.ohlc(instrument_token)
-            logger.info(f"Fetched OHLC for {instrument_token}")
+            logger.debug("Fetched OHLC for {}", instrument_token)
             return data
         except Exception as e:
             logger.error(f"Error fetching OHLC: {e}")
@@ -70,17 +78,23 @@ class ZerodhaClient:
             logger.error(f"Error fetching instruments: {e}")
             return None
 
-    def place_order(self, variety, exchange, tradingsymbol, transaction_type, quantity, product, order_type, price=None, trigger_price=None):
+    def place_order(self, variety, exchange, tradingsymbol, transaction_type, quantity, product, order_type, price=None, trigger_price=None,
+                    event_key=None):
+        # event_key is the instrument the triggering quote was fetched for; it defaults to
+        # "<exchange>:<tradingsymbol>", the form kite.quote takes
         try:
-            order_id = self.kite.place_order(variety=variety, 
-                                            exchange=exchange,
-                                            tradingsymbol=tradingsymbol,
-                                            transaction_type=transaction_type,
-                                            quantity=quantity,
-                                            product=product,
-                                            order_type=order_type,
-                                            price=price,
-                                            trigger_price=trigger_price)
+            with tracer.span("order_submit"):
+                order_id = self.kite.place_order(variety=variety, 
+                                                exchange=exchange,
+                                                tradingsymbol=tradingsymbol,
+                                                transaction_type=transaction_type,
+                                                quantity=quantity,
+                                                product=product,
+                                                order_type=order_type,
+                                                price=price,
+                                                trigger_price=trigger_price)
+            # Only a submitted order closes the event; after a failure it stays open for a retry
+            tracer.end_event(event_key if event_key is not None else f"{exchange}:{tradingsymbol}")
             logger.info(f"Order placed successfully. Order ID: {order_id}")
             return order_id
         except Exception as e:
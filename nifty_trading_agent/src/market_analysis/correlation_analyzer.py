@@ -1,31 +1,44 @@
+import numpy as np
 import pandas as pd
-from scipy.stats import pearsonr
+from scipy.stats import pearsonr, t as student_t
 from ..utils.logger import logger
 
+VOLATILITY_COLUMNS = ["Historical_Volatility", "Parkinson_Volatility", "Garman_Klass_Volatility"]
+
 class CorrelationAnalyzer:
     def __init__(self):
         logger.info("CorrelationAnalyzer initialized.")
 
+    def _align_with_daily_sentiment(self, df, sentiment_data_df):
+        # Ensure timestamps are datetime objects and set as index
+        df = df.assign(timestamp=pd.to_datetime(df["timestamp"])).set_index("timestamp").sort_index()
+        sentiment = sentiment_data_df.assign(timestamp=pd.to_datetime(sentiment_data_df["timestamp"]))
+        sentiment = sentiment.set_index("timestamp").sort_index()
+
+        # Resample sentiment to daily mean; this assumes the other series is daily or can be aligned to days
+        if {"count", "score_sum"}.issubset(sentiment.columns):
+            # Pre-aggregated sentiment index buckets: weight each bucket by its item count
+            daily = sentiment[["count", "score_sum"]].resample("D").sum()
+            daily_sentiment = (daily["score_sum"] / daily["count"].where(daily["count"] > 0)).rename("sentiment_score").ffill()
+        else:
+            daily_sentiment = sentiment["sentiment_score"].resample("D").mean().ffill()
+
+        # Align dataframes based on common dates
+        return df.join(daily_sentiment, how="inner")
+
+    def _find_volatility_column(self, df):
+        for col in VOLATILITY_COLUMNS:
+            if col in df.columns:
+                return col
+        return None
+
     def calculate_price_sentiment_correlation(self, market_data_df, sentiment_data_df, window=None, lag=0):
-        logger.info(f"Calculating price-sentiment correlation with window {window} and lag {lag}...")
+        logger.debug("Calculating price-sentiment correlation with window {} and lag {}...", window, lag)
         if market_data_df.empty or sentiment_data_df.empty:
             logger.warning("Market data or sentiment data is empty. Cannot calculate correlation.")
             return None
 
-        # Ensure timestamps are datetime objects and set as index
-        market_data_df["timestamp"] = pd.to_datetime(market_data_df["timestamp"])
-        sentiment_data_df["timestamp"] = pd.to_datetime(sentiment_data_df["timestamp"])
-        
-        market_data_df = market_data_df.set_index("timestamp").sort_index()
-        sentiment_data_df = sentiment_data_df.set_index("timestamp").sort_index()
-
-        # Resample sentiment data to match market data frequency (e.g., daily average sentiment)
-        # This assumes market data is daily or can be resampled to match sentiment
-        # For simplicity, let's resample sentiment to daily mean
-        daily_sentiment = sentiment_data_df["sentiment_score"].resample("D").mean().fillna(method=\"ffill\")
-
-        # Align dataframes based on common dates
-        combined_df = market_data_df.join(daily_sentiment, how=\"inner\")
+        combined_df = self._align_with_daily_sentiment(market_data_df, sentiment_data_df)
 
         if combined_df.empty:
             logger.warning("No overlapping dates between market and sentiment data. Cannot calculate correlation.")
@@ -55,27 +68,16 @@ class CorrelationAnalyzer:
             correlation, _ = pearsonr(combined_df[col_to_correlate], combined_df["close"])
             correlations = pd.Series(correlation, index=[combined_df.index[-1]])
 
-        logger.info("Price-sentiment correlation calculated.")
+        logger.debug("Price-sentiment correlation calculated.")
         return correlations
 
     def calculate_volatility_sentiment_correlation(self, volatility_df, sentiment_data_df, window=None, lag=0):
-        logger.info(f"Calculating volatility-sentiment correlation with window {window} and lag {lag}...")
+        logger.debug("Calculating volatility-sentiment correlation with window {} and lag {}...", window, lag)
         if volatility_df.empty or sentiment_data_df.empty:
             logger.warning("Volatility data or sentiment data is empty. Cannot calculate correlation.")
             return None
 
-        # Ensure timestamps are datetime objects and set as index
-        volatility_df["timestamp"] = pd.to_datetime(volatility_df["timestamp"])
-        sentiment_data_df["timestamp"] = pd.to_datetime(sentiment_data_df["timestamp"])
-
-        volatility_df = volatility_df.set_index("timestamp").sort_index()
-        sentiment_data_df = sentiment_data_df.set_index("timestamp").sort_index()
-
-        # Resample sentiment data to match volatility data frequency (e.g., daily average sentiment)
-        daily_sentiment = sentiment_data_df["sentiment_score"].resample("D").mean().fillna(method=\"ffill\")
-
-        # Align dataframes based on common dates
-        combined_df = volatility_df.join(daily_sentiment, how=\"inner\")
+        combined_df = self._align_with_daily_sentiment(volatility_df, sentiment_data_df)
 
         if combined_df.empty:
             logger.warning("No overlapping dates between volatility and sentiment data. Cannot calculate correlation.")
@@ -88,13 +90,7 @@ class CorrelationAnalyzer:
         else:
             col_to_correlate = "sentiment_score"
 
-        # Assuming volatility_df has a column named "Historical_Volatility" or similar
-        vol_col = None
-        for col in ["Historical_Volatility", "Parkinson_Volatility", "Garman_Klass_Volatility"]:
-            if col in combined_df.columns:
-                vol_col = col
-                break
-        
+        vol_col = self._find_volatility_column(combined_df)
         if not vol_col:
             logger.error("No recognized volatility column found in volatility_df.")
             return None
@@ -116,9 +112,118 @@ class CorrelationAnalyzer:
             correlation, _ = pearsonr(combined_df[col_to_correlate], combined_df[vol_col])
             correlations = pd.Series(correlation, index=[combined_df.index[-1]])
 
-        logger.info("Volatility-sentiment correlation calculated.")
+        logger.debug("Volatility-sentiment correlation calculated.")
         return correlations
 
+    def scan_price_sentiment_correlation(self, market_data_df, sentiment_data_df, lags=range(0, 6), windows=[None, 20, 60]):
+        logger.debug("Scanning price-sentiment correlation over lags {} and windows {}...", list(lags), windows)
+        if market_data_df.empty or sentiment_data_df.empty:
+            logger.warning("Market data or sentiment data is empty. Cannot scan correlation.")
+            return None
+
+        combined_df = self._align_with_daily_sentiment(market_data_df, sentiment_data_df)
+        if combined_df.empty:
+            logger.warning("No overlapping dates between market and sentiment data. Cannot scan correlation.")
+            return None
+
+        scan = _lag_window_correlation_scan(combined_df["sentiment_score"].to_numpy(dtype=np.float64),
+                                            combined_df["close"].to_numpy(dtype=np.float64), lags, windows)
+        logger.debug("Price-sentiment correlation scan completed.")
+        return scan
+
+    def scan_volatility_sentiment_correlation(self, volatility_df, sentiment_data_df, lags=range(0, 6), windows=[None, 20, 60]):
+        logger.debug("Scanning volatility-sentiment correlation over lags {} and windows {}...", list(lags), windows)
+        if volatility_df.empty or sentiment_data_df.empty:
+            logger.warning("Volatility data or sentiment data is empty. Cannot scan correlation.")
+            return None
 
+        combined_df = self._align_with_daily_sentiment(volatility_df, sentiment_data_df)
+        if combined_df.empty:
+            logger.warning("No overlapping dates between volatility and sentiment data. Cannot scan correlation.")
+            return None
 
+        vol_col = self._find_volatility_column(combined_df)
+        if not vol_col:
+            logger.error("No recognized volatility column found in volatility_df.")
+            return None
 
+        scan = _lag_window_correlation_scan(combined_df["sentiment_score"].to_numpy(dtype=np.float64),
+                                            combined_df[vol_col].to_numpy(dtype=np.float64), lags, windows)
+        logger.debug("Volatility-sentiment correlation scan completed.")
+        return scan
+
+
+def _lag_window_correlation_scan(x, y, lags, windows):
+    # Correlates y with x shifted by every lag at once: one (lags, n) matrix of shifted x and a
+    # single set of cumulative sums give the full-sample and rolling correlations for all windows.
+    # For a window the reported correlation is the latest full rolling window, i.e. the last value
+    # calculate_*_sentiment_correlation(window=w, lag=l) would return; window None is the full sample.
+    lags = np.asarray(list(lags), dtype=np.int64)
+    n = len(y)
+    shifted = np.full((len(lags), n), np.nan)
+    for i, lag in enumerate(lags):
+        if lag >= 0:
+            shifted[i, lag:] = x[:n - lag]
+        else:
+            shifted[i, :lag] = x[-lag:]
+
+    valid = ~np.isnan(shifted) & ~np.isnan(y)[None, :]
+    # Centre before accumulating to keep the cumulative sums well conditioned
+    xc = np.where(valid, shifted - np.nanmean(x), 0.0)
+    yc = np.where(valid, (y - np.nanmean(y))[None, :], 0.0)
+    zeros = np.zeros((len(lags), 1))
+    c_n = np.concatenate([zeros, np.cumsum(valid, axis=1)], axis=1)
+    c_x = np.concatenate([zeros, np.cumsum(xc, axis=1)], axis=1)
+    c_y = np.concatenate([zeros, np.cumsum(yc, axis=1)], axis=1)
+    c_xx = np.concatenate([zeros, np.cumsum(xc * xc, axis=1)], axis=1)
+    c_yy = np.concatenate([zeros, np.cumsum(yc * yc, axis=1)], axis=1)
+    c_xy = np.concatenate([zeros, np.cumsum(xc * yc, axis=1)], axis=1)
+
+    rows = []
+    for window in windows:
+        if window is None:
+            cnt, sx, sy = c_n[:, -1:], c_x[:, -1:], c_y[:, -1:]
+            sxx, syy, sxy = c_xx[:, -1:], c_yy[:, -1:], c_xy[:, -1:]
+        elif window > n:
+            cnt = np.zeros((len(lags), 1))
+            sx = sy = sxx = syy = sxy = cnt
+        else:
+            cnt = c_n[:, window:] - c_n[:, :-window]
+            sx, sy = c_x[:, window:] - c_x[:, :-window], c_y[:, window:] - c_y[:, :-window]
+            sxx, syy = c_xx[:, window:] - c_xx[:, :-window], c_yy[:, window:] - c_yy[:, :-window]
+            sxy = c_xy[:, window:] - c_xy[:, :-window]
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            cov = cnt * sxy - sx * sy
+            denom = np.sqrt((cnt * sxx - sx * sx) * (cnt * syy - sy * sy))
+            corr = np.clip(cov / denom, -1.0, 1.0)
+        required = 2 if window is None else window
+        corr[(cnt < required) | ~np.isfinite(corr)] = np.nan
+
+        has_value = ~np.isnan(corr)
+        # Latest full window per lag and the mean of the rolling series
+        last_idx = corr.shape[1] - 1 - np.argmax(has_value[:, ::-1], axis=1)
+        latest = corr[np.arange(len(lags)), last_idx]
+        n_obs = cnt[np.arange(len(lags)), last_idx]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            mean_rolling = np.where(has_value, corr, 0.0).sum(axis=1) / has_value.sum(axis=1)
+
+        # Two-sided Pearson p-value from the t distribution with n - 2 degrees of freedom
+        with np.errstate(divide="ignore", invalid="ignore"):
+            t_stat = latest * np.sqrt((n_obs - 2) / (1.0 - latest ** 2))
+            p_value = 2 * student_t.sf(np.abs(t_stat), n_obs - 2)
+        p_value = np.where(np.abs(latest) >= 1.0, 0.0, p_value)
+
+        for i, lag in enumerate(lags):
+            rows.append({
+                "lag": int(lag),
+                "window": window,
+                "n_obs": int(n_obs[i]) if not np.isnan(latest[i]) else 0,
+                "correlation": latest[i],
+                "p_value": p_value[i] if not np.isnan(latest[i]) else np.nan,
+                "mean_rolling_correlation": mean_rolling[i] if window is not None else latest[i]
+            })
+
+    scan = pd.DataFrame(rows, columns=["lag", "window", "n_obs", "correlation", "p_value", "mean_rolling_correlation"])
+    scan["window"] = scan["window"].astype("Int64")
+    return scan
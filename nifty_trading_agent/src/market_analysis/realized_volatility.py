@@ -0,0 +1,157 @@
+import numpy as np
+import pandas as pd
+from ..utils.logger import logger
+
+# NSE cash/F&O session 09:15-15:30
+TRADING_MINUTES_PER_DAY = 375
+TRADING_DAYS_PER_YEAR = 252
+
+# Kite Connect interval names -> bar length in minutes (None for daily bars)
+INTERVAL_MINUTES = {
+    "minute": 1, "3minute": 3, "5minute": 5, "10minute": 10,
+    "15minute": 15, "30minute": 30, "60minute": 60, "day": None
+}
+
+ESTIMATORS = ["close_to_close", "parkinson", "garman_klass", "rogers_satchell", "yang_zhang"]
+
+# Per-bar terms kept in the ring buffer; the window sums of these are enough for every estimator
+_R_CC, _R_CC2, _PARK, _GK, _RS, _R_ON, _R_ON2, _R_OC, _R_OC2 = range(9)
+_N_TERMS = 9
+
+def periods_per_year(interval):
+    if interval not in INTERVAL_MINUTES:
+        raise ValueError(f"Unsupported interval: {interval}")
+    minutes = INTERVAL_MINUTES[interval]
+    if minutes is None:
+        return TRADING_DAYS_PER_YEAR
+    return TRADING_DAYS_PER_YEAR * TRADING_MINUTES_PER_DAY / minutes
+
+class StreamingVolatilityEstimator:
+    # Rolling realised volatility for many instruments, updated in O(1) per bar.
+    # Each instrument owns one row of a (n_instruments, window, terms) ring buffer plus the
+    # running window sums of those terms; a new bar adds its terms and subtracts the evicted bar's.
+
+    def __init__(self, instruments, window=20, interval="minute"):
+        self.instruments = list(instruments)
+        self.index = {inst: i for i, inst in enumerate(self.instruments)}
+        self.window = window
+        self.interval = interval
+        self.annualization = np.sqrt(periods_per_year(interval))
+
+        n = len(self.instruments)
+        self._buffer = np.zeros((n, window, _N_TERMS))
+        self._sums = np.zeros((n, _N_TERMS))
+        self._pos = np.zeros(n, dtype=np.int64)
+        self._count = np.zeros(n, dtype=np.int64)
+        self._prev_close = np.full(n, np.nan)
+
+        # Bar currently being built from ticks
+        self._bar_open = np.full(n, np.nan)
+        self._bar_high = np.full(n, np.nan)
+        self._bar_low = np.full(n, np.nan)
+        self._bar_close = np.full(n, np.nan)
+        logger.info(f"StreamingVolatilityEstimator initialized for {n} instruments, window {window}, interval {interval}.")
+
+    def _rows(self, instruments):
+        return np.array([self.index[inst] for inst in instruments], dtype=np.int64)
+
+    def update(self, instrument, open, high, low, close):
+        self.update_many([instrument], [open], [high], [low], [close])
+
+    def update_many(self, instruments, open, high, low, close):
+        # Instruments must be unique within one call (one completed bar each)
+        rows = self._rows(instruments)
+        log_o = np.log(np.asarray(open, dtype=np.float64))
+        log_h = np.log(np.asarray(high, dtype=np.float64))
+        log_l = np.log(np.asarray(low, dtype=np.float64))
+        log_c = np.log(np.asarray(close, dtype=np.float64))
+        log_prev = np.log(self._prev_close[rows])
+        self._prev_close[rows] = np.exp(log_c)
+
+        # The first bar of an instrument only seeds the previous close
+        started = ~np.isnan(log_prev)
+        if not started.all():
+            rows, log_o, log_h, log_l, log_c, log_prev = (
+                a[started] for a in (rows, log_o, log_h, log_l, log_c, log_prev))
+        if len(rows) == 0:
+            return
+
+        hl = log_h - log_l
+        co = log_c - log_o
+        terms = np.empty((len(rows), _N_TERMS))
+        terms[:, _R_CC] = log_c - log_prev
+        terms[:, _R_CC2] = terms[:, _R_CC] ** 2
+        terms[:, _PARK] = hl ** 2
+        terms[:, _GK] = 0.5 * hl ** 2 - (2 * np.log(2) - 1) * co ** 2
+        terms[:, _RS] = (log_h - log_c) * (log_h - log_o) + (log_l - log_c) * (log_l - log_o)
+        terms[:, _R_ON] = log_o - log_prev
+        terms[:, _R_ON2] = terms[:, _R_ON] ** 2
+        terms[:, _R_OC] = co
+        terms[:, _R_OC2] = co ** 2
+
+        pos = self._pos[rows]
+        self._sums[rows] += terms - self._buffer[rows, pos]
+        self._buffer[rows, pos] = terms
+        pos = (pos + 1) % self.window
+        self._pos[rows] = pos
+        self._count[rows] = np.minimum(self._count[rows] + 1, self.window)
+
+        # Once per lap, rebuild the running sums from the buffer to stop float drift accumulating
+        wrapped = rows[pos == 0]
+        if len(wrapped):
+            self._sums[wrapped] = self._buffer[wrapped].sum(axis=1)
+
+    def on_tick(self, instrument, price):
+        i = self.index[instrument]
+        if np.isnan(self._bar_open[i]):
+            self._bar_open[i] = self._bar_high[i] = self._bar_low[i] = price
+        elif price > self._bar_high[i]:
+            self._bar_high[i] = price
+        elif price < self._bar_low[i]:
+            self._bar_low[i] = price
+        self._bar_close[i] = price
+
+    def close_bar(self, instruments=None):
+        # Push the tick-built bars into the window, e.g. on every interval boundary
+        rows = np.arange(len(self.instruments)) if instruments is None else self._rows(instruments)
+        rows = rows[~np.isnan(self._bar_open[rows])]
+        if len(rows):
+            self.update_many([self.instruments[i] for i in rows], self._bar_open[rows], self._bar_high[rows],
+                             self._bar_low[rows], self._bar_close[rows])
+            self._bar_open[rows] = self._bar_high[rows] = self._bar_low[rows] = self._bar_close[rows] = np.nan
+
+    def variance(self, estimator="yang_zhang"):
+        n = self._count.astype(np.float64)
+        s = self._sums
+        with np.errstate(divide="ignore", invalid="ignore"):
+            if estimator == "close_to_close":
+                var = (s[:, _R_CC2] - s[:, _R_CC] ** 2 / n) / (n - 1)
+            elif estimator == "parkinson":
+                var = s[:, _PARK] / (4 * np.log(2) * n)
+            elif estimator == "garman_klass":
+                var = s[:, _GK] / n
+            elif estimator == "rogers_satchell":
+                var = s[:, _RS] / n
+            elif estimator == "yang_zhang":
+                var_on = (s[:, _R_ON2] - s[:, _R_ON] ** 2 / n) / (n - 1)
+                var_oc = (s[:, _R_OC2] - s[:, _R_OC] ** 2 / n) / (n - 1)
+                k = 0.34 / (1.34 + (n + 1) / (n - 1))
+                var = var_on + k * var_oc + (1 - k) * s[:, _RS] / n
+            else:
+                raise ValueError(f"Unknown volatility estimator: {estimator}")
+        var = np.maximum(var, 0.0)
+        var[self._count < 2] = np.nan
+        return var
+
+    def volatility(self, estimator="yang_zhang", annualize=True):
+        vol = np.sqrt(self.variance(estimator))
+        if annualize:
+            vol *= self.annualization
+        return vol
+
+    def get_volatility(self, instrument, estimator="yang_zhang", annualize=True):
+        return float(self.volatility(estimator, annualize)[self.index[instrument]])
+
+    def snapshot(self, annualize=True):
+        return pd.DataFrame({est: self.volatility(est, annualize) for est in ESTIMATORS},
+                            index=pd.Index(self.instruments, name="instrument"))
@@ -0,0 +1,98 @@
+import numpy as np
+import pandas as pd
+from ..utils.logger import logger
+
+class RollingCovarianceMatrix:
+    # Windowed covariance/correlation across N series (indices, constituents, VIX, sentiment),
+    # updated one bar at a time. The engine keeps the last `window` observations in a ring buffer
+    # together with windowed sums of x and of x_i * x_j, so a new bar costs O(N^2) and never
+    # rescans history.
+
+    def __init__(self, names, window=60):
+        self.names = list(names)
+        self.index = {name: i for i, name in enumerate(self.names)}
+        self.window = window
+
+        n = len(self.names)
+        self._buffer = np.zeros((window, n))
+        self._sum = np.zeros(n)
+        self._sum_xy = np.zeros((n, n)) # Diagonal holds the sums of squares
+        self._last = np.full(n, np.nan)
+        self._pos = 0
+        self.count = 0
+        logger.info(f"RollingCovarianceMatrix initialized for {n} series with window {window}.")
+
+    def update(self, values):
+        # values: array in `names` order or a dict keyed by name. A missing/NaN value repeats the
+        # series' previous observation so one stale feed does not invalidate the whole matrix.
+        if isinstance(values, dict):
+            x = self._last.copy()
+            for name, value in values.items():
+                x[self.index[name]] = value
+        else:
+            x = np.asarray(values, dtype=np.float64)
+        x = np.where(np.isnan(x), self._last, x)
+        if np.isnan(x).any():
+            # Not every series has been seen yet
+            self._last = x
+            return False
+        self._last = x
+
+        old = self._buffer[self._pos]
+        if self.count == self.window:
+            self._sum -= old
+            self._sum_xy -= np.outer(old, old)
+        else:
+            self.count += 1
+        self._sum += x
+        self._sum_xy += np.outer(x, x)
+        self._buffer[self._pos] = x
+        self._pos = (self._pos + 1) % self.window
+
+        # Once per lap, rebuild the sums from the buffer so float drift cannot accumulate
+        if self._pos == 0 and self.count == self.window:
+            self._sum = self._buffer.sum(axis=0)
+            self._sum_xy = self._buffer.T @ self._buffer
+        return True
+
+    def update_many(self, rows):
+        for row in rows:
+            self.update(row)
+
+    @property
+    def is_ready(self):
+        return self.count >= 2
+
+    def covariance(self):
+        n = self.count
+        if n < 2:
+            return np.full((len(self.names), len(self.names)), np.nan)
+        return (self._sum_xy - np.outer(self._sum, self._sum) / n) / (n - 1)
+
+    def correlation(self):
+        cov = self.covariance()
+        std = np.sqrt(np.maximum(np.diag(cov), 0.0))
+        with np.errstate(divide="ignore", invalid="ignore"):
+            corr = cov / np.outer(std, std)
+        corr = np.clip(corr, -1.0, 1.0)
+        np.fill_diagonal(corr, np.where(std > 0, 1.0, np.nan))
+        return corr
+
+    def get_pair(self, name_a, name_b):
+        i, j = self.index[name_a], self.index[name_b]
+        n = self.count
+        if n < 2:
+            return np.nan, np.nan
+        mean_i, mean_j = self._sum[i] / n, self._sum[j] / n
+        cov = (self._sum_xy[i, j] - n * mean_i * mean_j) / (n - 1)
+        var_i = (self._sum_xy[i, i] - n * mean_i * mean_i) / (n - 1)
+        var_j = (self._sum_xy[j, j] - n * mean_j * mean_j) / (n - 1)
+        if var_i <= 0 or var_j <= 0:
+            return cov, np.nan
+        return cov, max(-1.0, min(1.0, cov / np.sqrt(var_i * var_j)))
+
+    def correlation_frame(self):
+        return pd.DataFrame(self.correlation(), index=self.names, columns=self.names)
+
+    def covariance_frame(self):
+        return pd.DataFrame(self.covariance(), index=self.names, columns=self.names)
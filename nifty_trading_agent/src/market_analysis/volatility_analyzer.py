@@ -1,14 +1,18 @@
+import os
 import pandas as pd
 import numpy as np
-from sklearn.cluster import KMeans
+from ..utils.config_manager import config
 from ..utils.logger import logger
+from .volatility_regime_model import VolatilityRegimeModel, DEFAULT_REGIME_FEATURES
 
 class VolatilityAnalyzer:
-    def __init__(self):
+    def __init__(self, regime_model_path=None):
+        self.regime_model_path = regime_model_path or config.get("market_analysis.regime_model_path")
+        self.regime_models = {} # instrument -> persisted model, loaded once and reused while its layout matches
         logger.info("VolatilityAnalyzer initialized.")
 
     def calculate_historical_volatility(self, df, window=20, annualize=True):
-        logger.info(f"Calculating historical volatility with window {window}...")
+        logger.debug("Calculating historical volatility with window {}...", window)
         if "close" not in df.columns:
             logger.warning("Close price column not found for volatility calculation.")
             return df
@@ -20,11 +24,11 @@ class VolatilityAnalyzer:
             df["Historical_Volatility"] = daily_vol * np.sqrt(252) # 252 trading days in a year
         else:
             df["Historical_Volatility"] = daily_vol
-        logger.info("Historical volatility calculated.")
+        logger.debug("Historical volatility calculated.")
         return df
 
     def calculate_parkinson_volatility(self, df, window=20, annualize=True):
-        logger.info(f"Calculating Parkinson volatility with window {window}...")
+        logger.debug("Calculating Parkinson volatility with window {}...", window)
         if not all(col in df.columns for col in ["high", "low"]):
             logger.warning("High/Low price columns not found for Parkinson volatility.")
             return df
@@ -36,11 +40,11 @@ class VolatilityAnalyzer:
             df["Parkinson_Volatility"] = parkinson_vol * np.sqrt(252)
         else:
             df["Parkinson_Volatility"] = parkinson_vol
-        logger.info("Parkinson volatility calculated.")
+        logger.debug("Parkinson volatility calculated.")
         return df
 
     def calculate_garman_klass_volatility(self, df, window=20, annualize=True):
-        logger.info(f"Calculating Garman-Klass volatility with window {window}...")
+        logger.debug("Calculating Garman-Klass volatility with window {}...", window)
         if not all(col in df.columns for col in ["open", "high", "low", "close"]):
             logger.warning("OHLC columns not found for Garman-Klass volatility.")
             return df
@@ -54,45 +58,163 @@ class VolatilityAnalyzer:
             df["Garman_Klass_Volatility"] = garman_klass_vol * np.sqrt(252)
         else:
             df["Garman_Klass_Volatility"] = garman_klass_vol
-        logger.info("Garman-Klass volatility calculated.")
+        logger.debug("Garman-Klass volatility calculated.")
         return df
 
-    def calculate_volatility_cones(self, df, periods=[20, 60, 120, 252]):
-        logger.info("Calculating volatility cones...")
+    def calculate_volatility_cones(self, df, periods=[20, 60, 120, 252], annualize=True, periods_per_year=252):
+        logger.debug("Calculating volatility cones for periods {}...", periods)
         volatility_cones = pd.DataFrame(index=df.index)
-        for p in periods:
-            df_temp = self.calculate_historical_volatility(df.copy(), window=p, annualize=True)
-            volatility_cones[f"Vol_{p}"] = df_temp["Historical_Volatility"]
-        logger.info("Volatility cones calculated.")
+        if "close" not in df.columns:
+            logger.warning("Close price column not found for volatility cones.")
+            return volatility_cones
+
+        # Log returns are computed once and every window is derived from the same cumulative sums
+        log_returns = np.log(df["close"].to_numpy(dtype=np.float64))
+        log_returns = np.concatenate(([np.nan], np.diff(log_returns)))
+        vols = _rolling_std_from_cumsums(log_returns, periods)
+        if annualize:
+            vols *= np.sqrt(periods_per_year)
+
+        volatility_cones = pd.DataFrame(vols, index=df.index, columns=[f"Vol_{p}" for p in periods])
+        logger.debug("Volatility cones calculated.")
         return volatility_cones
 
-    def identify_volatility_regimes(self, df, n_clusters=3, feature_cols=None):
-        logger.info(f"Identifying volatility regimes with {n_clusters} clusters...")
+    def calculate_volatility_cone_bands(self, df, periods=[20, 60, 120, 252], percentiles=[10, 25, 50, 75, 90],
+                                        annualize=True, periods_per_year=252):
+        logger.debug("Calculating volatility cone bands for periods {}...", periods)
+        cones = self.calculate_volatility_cones(df, periods=periods, annualize=annualize, periods_per_year=periods_per_year)
+        columns = ["Min"] + [f"P{q}" for q in percentiles] + ["Max", "Current"]
+        if cones.empty or cones.shape[1] == 0:
+            return pd.DataFrame(columns=columns, index=pd.Index(periods, name="window"), dtype=float)
+
+        values = cones.to_numpy()
+        has_data = ~np.isnan(values).all(axis=0)
+        bands = np.full((len(periods), len(columns)), np.nan)
+        if has_data.any():
+            valid = values[:, has_data]
+            bands[has_data, 0] = np.nanmin(valid, axis=0)
+            bands[has_data, 1:len(percentiles) + 1] = np.nanpercentile(valid, percentiles, axis=0).T
+            bands[has_data, len(percentiles) + 1] = np.nanmax(valid, axis=0)
+            # Latest available reading per window, used to place today's volatility inside the cone
+            last_valid = values.shape[0] - 1 - np.argmax(~np.isnan(valid[::-1]), axis=0)
+            bands[has_data, -1] = valid[last_valid, np.arange(valid.shape[1])]
+
+        logger.debug("Volatility cone bands calculated.")
+        return pd.DataFrame(bands, columns=columns, index=pd.Index(periods, name="window"))
+
+    def identify_volatility_regimes(self, df, n_clusters=3, feature_cols=None, regime_model=None, instrument=None):
+        logger.debug("Identifying volatility regimes with {} clusters...", n_clusters)
         if feature_cols is None:
-            feature_cols = ["Historical_Volatility", "Parkinson_Volatility", "Garman_Klass_Volatility"]
-        
-        # Ensure volatility features are calculated
-        df = self.calculate_historical_volatility(df.copy())
-        df = self.calculate_parkinson_volatility(df.copy())
-        df = self.calculate_garman_klass_volatility(df.copy())
+            feature_cols = regime_model.feature_cols if regime_model is not None else DEFAULT_REGIME_FEATURES
 
-        # Drop NaNs created by rolling windows
-        df_clean = df.dropna(subset=feature_cols)
+        # Ensure volatility features are calculated (the estimators add their columns in place)
+        df = df.copy()
+        df = self.calculate_historical_volatility(df)
+        df = self.calculate_parkinson_volatility(df)
+        df = self.calculate_garman_klass_volatility(df)
 
-        if df_clean.empty:
+        # Rows still inside the rolling warm-up stay NaN
+        valid = df[feature_cols].notna().all(axis=1)
+
+        if not valid.any():
             logger.warning("Not enough data to identify volatility regimes after dropping NaNs.")
             df["Volatility_Regime"] = np.nan
             return df
 
-        X = df_clean[feature_cols].values
-        kmeans = KMeans(n_clusters=n_clusters, random_state=42, n_init=10) # n_init added for KMeans
-        df_clean["Volatility_Regime"] = kmeans.fit_predict(X)
-
-        # Map regimes back to original DataFrame
-        df = df.merge(df_clean[["Volatility_Regime"]], left_index=True, right_index=True, how="left")
-        logger.info("Volatility regimes identified.")
+        # A persisted model (see fit_regime_model) keeps labels stable between calls and restarts. It
+        # is only used when it was trained for this instrument, feature set and regime count;
+        # otherwise a model is fitted on this frame for this call only, and nothing is written.
+        if regime_model is None:
+            regime_model = self.load_regime_model(instrument, n_clusters, feature_cols)
+        if regime_model is None:
+            regime_model = VolatilityRegimeModel(n_clusters=n_clusters, feature_cols=feature_cols).fit(df.loc[valid, feature_cols])
+            if not regime_model.is_fitted:
+                df["Volatility_Regime"] = np.nan
+                return df
+
+        df["Volatility_Regime"] = regime_model.predict(df[feature_cols])
+        logger.debug("Volatility regimes identified.")
         return df
 
-
-
-
+    def regime_model_path_for(self, instrument=None):
+        # One file per instrument next to the configured path, e.g. volatility_regimes_NIFTY.npz
+        if not self.regime_model_path or instrument is None:
+            return self.regime_model_path
+        root, ext = os.path.splitext(self.regime_model_path)
+        return f"{root}_{instrument}{ext or '.npz'}"
+
+    def load_regime_model(self, instrument=None, n_clusters=3, feature_cols=None):
+        # Returns the persisted model for `instrument` if it matches the requested layout, else None
+        feature_cols = list(feature_cols or DEFAULT_REGIME_FEATURES)
+        model = self.regime_models.get(instrument)
+        if model is None:
+            path = self.regime_model_path_for(instrument)
+            if not path or not os.path.exists(path):
+                return None
+            try:
+                model = VolatilityRegimeModel.load(path)
+            except Exception as e:
+                logger.error(f"Error loading volatility regime model from {path}: {e}")
+                return None
+            self.regime_models[instrument] = model
+        if model.instrument != (None if instrument is None else str(instrument)) or model.n_clusters != n_clusters or model.feature_cols != feature_cols:
+            logger.warning(f"Persisted regime model is for {model.instrument} with {model.n_clusters} regimes over "
+                           f"{model.feature_cols}, not {instrument} with {n_clusters} over {feature_cols}; refit it with fit_regime_model.")
+            return None
+        return model
+
+    def fit_regime_model(self, df, instrument=None, n_clusters=3, feature_cols=None, save=True):
+        # Fits the regime model for `instrument` on `df` and, with save=True, persists it to
+        # regime_model_path_for(instrument), replacing any previous model for that instrument
+        feature_cols = list(feature_cols or DEFAULT_REGIME_FEATURES)
+        if not set(feature_cols).issubset(df.columns):
+            df = df.copy()
+            df = self.calculate_historical_volatility(df)
+            df = self.calculate_parkinson_volatility(df)
+            df = self.calculate_garman_klass_volatility(df)
+        regime_model = VolatilityRegimeModel(n_clusters=n_clusters, feature_cols=feature_cols, instrument=instrument)
+        regime_model.fit(df.dropna(subset=feature_cols))
+        if not regime_model.is_fitted:
+            return None
+        path = self.regime_model_path_for(instrument)
+        if save and path:
+            try:
+                regime_model.save(path)
+            except Exception as e:
+                logger.error(f"Error saving volatility regime model to {path}: {e}")
+        self.regime_models[instrument] = regime_model
+        return regime_model
+
+def _rolling_std_from_cumsums(values, windows):
+    # Rolling sample std (ddof=1) for several windows at once. Values are centred before
+    # accumulating so the cumulative sums stay well conditioned over long histories; a window
+    # is only reported once it holds `window` non-NaN observations, matching pandas' rolling std.
+    values = np.asarray(values, dtype=np.float64)
+    n = len(values)
+    # Filled window-major so each window writes one contiguous row
+    result = np.full((len(windows), n), np.nan)
+    valid = ~np.isnan(values)
+    if not valid.any():
+        return result.T
+
+    centred = np.where(valid, values - values[valid].mean(), 0.0)
+    csum = np.concatenate(([0.0], np.cumsum(centred)))
+    csum_sq = np.concatenate(([0.0], np.cumsum(centred * centred)))
+    ccount = np.concatenate(([0], np.cumsum(valid)))
+    all_valid = valid.all()
+
+    for i, w in enumerate(windows):
+        if w < 2 or w > n:
+            continue
+        s1 = csum[w:] - csum[:-w]
+        var = csum_sq[w:] - csum_sq[:-w]
+        s1 *= s1
+        s1 /= w
+        var -= s1
+        np.maximum(var, 0.0, out=var)
+        var /= (w - 1)
+        np.sqrt(var, out=var)
+        if not all_valid:
+            var[(ccount[w:] - ccount[:-w]) != w] = np.nan
+        result[i, w - 1:] = var
+    return result.T
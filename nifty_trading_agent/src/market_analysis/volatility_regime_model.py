@@ -0,0 +1,142 @@
+import os
+import numpy as np
+from sklearn.cluster import MiniBatchKMeans
+from ..utils.logger import logger
+
+DEFAULT_REGIME_FEATURES = ["Historical_Volatility", "Parkinson_Volatility", "Garman_Klass_Volatility"]
+
+class VolatilityRegimeModel:
+    # Regime labels are ordered by centroid volatility level: 0 is the calmest regime and
+    # n_clusters - 1 the most volatile, so labels keep their meaning across refits and restarts.
+
+    def __init__(self, n_clusters=3, feature_cols=None, batch_size=1024, random_state=42, instrument=None):
+        self.n_clusters = n_clusters
+        self.feature_cols = list(feature_cols or DEFAULT_REGIME_FEATURES)
+        self.instrument = None if instrument is None else str(instrument) # What the model was trained on; saved with it so loaders can check
+        self.batch_size = batch_size
+        self.random_state = random_state
+        self.mean_ = None
+        self.scale_ = None
+        self.centroids_ = None # Ordered, in standardised feature space
+        self.counts_ = None
+        logger.info(f"VolatilityRegimeModel initialized with {n_clusters} regimes.")
+
+    @property
+    def is_fitted(self):
+        return self.centroids_ is not None
+
+    def _as_array(self, X):
+        if hasattr(X, "columns"):
+            X = X[self.feature_cols].to_numpy()
+        X = np.asarray(X, dtype=np.float64)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        return X[~np.isnan(X).any(axis=1)]
+
+    def _order_centroids(self):
+        # Volatility level of each centroid in original units decides its label
+        level = (self.centroids_ * self.scale_ + self.mean_).mean(axis=1)
+        order = np.argsort(level, kind="stable")
+        self.centroids_ = np.ascontiguousarray(self.centroids_[order])
+        self.counts_ = self.counts_[order]
+        # Plain-Python copies for predict_one
+        self._centroid_rows = [tuple(c) for c in self.centroids_.tolist()]
+        self._mean_list = self.mean_.tolist()
+        self._scale_list = self.scale_.tolist()
+
+    def fit(self, X):
+        X = self._as_array(X)
+        if len(X) < self.n_clusters:
+            logger.warning("Not enough samples to fit volatility regime model.")
+            return self
+
+        self.mean_ = X.mean(axis=0)
+        self.scale_ = X.std(axis=0)
+        self.scale_[self.scale_ == 0] = 1.0
+        Xs = (X - self.mean_) / self.scale_
+
+        kmeans = MiniBatchKMeans(n_clusters=self.n_clusters, batch_size=self.batch_size,
+                                 random_state=self.random_state, n_init=3)
+        labels = kmeans.fit_predict(Xs)
+        self.centroids_ = kmeans.cluster_centers_.astype(np.float64)
+        self.counts_ = np.bincount(labels, minlength=self.n_clusters).astype(np.float64)
+        self._order_centroids()
+        logger.info(f"Volatility regime model fitted on {len(X)} samples.")
+        return self
+
+    def partial_fit(self, X):
+        # Mini-batch k-means step: each centroid moves towards the mean of its newly assigned
+        # points with a per-centroid learning rate of 1 / points seen.
+        if not self.is_fitted:
+            return self.fit(X)
+        X = self._as_array(X)
+        if len(X) == 0:
+            return self
+
+        Xs = (X - self.mean_) / self.scale_
+        labels = self._nearest(Xs)
+        n_k = np.bincount(labels, minlength=self.n_clusters).astype(np.float64)
+        sums = np.zeros_like(self.centroids_)
+        np.add.at(sums, labels, Xs)
+        seen = n_k > 0
+        self.counts_ += n_k
+        self.centroids_[seen] += (sums[seen] - n_k[seen, None] * self.centroids_[seen]) / self.counts_[seen, None]
+        self._order_centroids()
+        return self
+
+    def _nearest(self, Xs):
+        distances = ((Xs[:, None, :] - self.centroids_[None, :, :]) ** 2).sum(axis=2)
+        return distances.argmin(axis=1)
+
+    def predict(self, X):
+        if not self.is_fitted:
+            raise RuntimeError("VolatilityRegimeModel is not fitted.")
+        if hasattr(X, "columns"):
+            X = X[self.feature_cols].to_numpy()
+        X = np.asarray(X, dtype=np.float64)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        labels = self._nearest((X - self.mean_) / self.scale_).astype(np.float64)
+        labels[np.isnan(X).any(axis=1)] = np.nan
+        return labels
+
+    def predict_one(self, features):
+        # Single-bar path for the live loop; plain Python over a handful of floats avoids
+        # the fixed per-call overhead of NumPy on tiny arrays.
+        if not self.is_fitted:
+            raise RuntimeError("VolatilityRegimeModel is not fitted.")
+        x = [(f - m) / s for f, m, s in zip(features, self._mean_list, self._scale_list)]
+        best_label, best_dist = 0, float("inf")
+        for label, centroid in enumerate(self._centroid_rows):
+            dist = 0.0
+            for a, b in zip(x, centroid):
+                dist += (a - b) * (a - b)
+            if dist < best_dist:
+                best_label, best_dist = label, dist
+        return best_label
+
+    def save(self, path):
+        if not self.is_fitted:
+            raise RuntimeError("Cannot save an unfitted VolatilityRegimeModel.")
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            np.savez(f, centroids=self.centroids_, counts=self.counts_, mean=self.mean_, scale=self.scale_,
+                     feature_cols=np.array(self.feature_cols), n_clusters=self.n_clusters,
+                     instrument=np.array(self.instrument or ""))
+        os.replace(tmp_path, path)
+        logger.info(f"Volatility regime model saved to {path}")
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            instrument = str(data["instrument"]) if "instrument" in data.files else ""
+            model = cls(n_clusters=int(data["n_clusters"]), feature_cols=data["feature_cols"].tolist(),
+                        instrument=instrument or None)
+            model.centroids_ = data["centroids"]
+            model.counts_ = data["counts"]
+            model.mean_ = data["mean"]
+            model.scale_ = data["scale"]
+        model._order_centroids()
+        logger.info(f"Volatility regime model loaded from {path}")
+        return model
@@ -0,0 +1,197 @@
+import hashlib
+import numpy as np
+import pandas as pd
+from scipy.special import ndtr
+from ..utils.logger import logger
+
+SECONDS_PER_YEAR = 365.0 * 24 * 3600
+MIN_TOTAL_VARIANCE = 1e-10
+
+def implied_volatility(prices, forwards, strikes, times, is_call, discount=1.0, max_iter=50, tol=1e-8):
+    # Vectorised Black-76 implied volatility: Newton steps on vega, falling back to bisection
+    # whenever a step leaves the bracket. Prices outside the no-arbitrage bounds return NaN.
+    prices, forwards, strikes, times = np.broadcast_arrays(*(np.asarray(a, dtype=np.float64) for a in (prices, forwards, strikes, times)))
+    is_call = np.broadcast_to(np.asarray(is_call, dtype=bool), prices.shape)
+    discount = np.broadcast_to(np.asarray(discount, dtype=np.float64), prices.shape)
+    undiscounted = prices / discount
+
+    intrinsic = np.where(is_call, np.maximum(forwards - strikes, 0.0), np.maximum(strikes - forwards, 0.0))
+    upper = np.where(is_call, forwards, strikes)
+    solvable = (undiscounted > intrinsic) & (undiscounted < upper) & (times > 0)
+
+    lo = np.full(prices.shape, 1e-4)
+    hi = np.full(prices.shape, 5.0)
+    sigma = np.full(prices.shape, 0.2)
+    sqrt_t = np.sqrt(np.where(times > 0, times, 1.0))
+    log_fk = np.log(forwards / strikes)
+    for _ in range(max_iter):
+        vol_t = sigma * sqrt_t
+        d1 = log_fk / vol_t + 0.5 * vol_t
+        d2 = d1 - vol_t
+        call = forwards * ndtr(d1) - strikes * ndtr(d2)
+        model = np.where(is_call, call, call - forwards + strikes)
+        diff = model - undiscounted
+        if np.all(np.abs(diff[solvable]) < tol):
+            break
+        too_high = diff > 0
+        hi = np.where(too_high, sigma, hi)
+        lo = np.where(too_high, lo, sigma)
+        vega = forwards * np.exp(-0.5 * d1 * d1) / np.sqrt(2 * np.pi) * sqrt_t
+        with np.errstate(divide="ignore", invalid="ignore"):
+            newton = sigma - diff / vega
+        inside = (newton > lo) & (newton < hi) & np.isfinite(newton)
+        sigma = np.where(inside, newton, 0.5 * (lo + hi))
+    return np.where(solvable, sigma, np.nan)
+
+class VolatilitySurface:
+    # Implied-volatility surface for one underlying. Each expiry carries a quadratic smile in
+    # implied variance v(k) = a + b*k + c*k^2 over log-moneyness k = ln(K/F) at the forward it was
+    # fitted with; total variance v*t uses the current time to expiry, so a cached smile stays valid
+    # as as_of moves. Across expiries total variance is interpolated linearly in time at fixed
+    # strike. Queries only read the cached per-expiry parameters, and refits touch only expiries
+    # whose quotes changed (for price quotes, also the spot or time to expiry, which the implied
+    # volatilities depend on).
+
+    def __init__(self, underlying, rate=0.07, min_quotes_per_expiry=3):
+        self.underlying = underlying
+        self.rate = rate
+        self.min_quotes_per_expiry = min_quotes_per_expiry
+        self.as_of = None
+        self._smiles = {} # expiry -> {"fingerprint", "forward", "params", "n_quotes"}
+        self._expiries = np.array([], dtype="datetime64[ns]")
+        self._times = np.array([])
+        self._log_forwards = np.array([])
+        self._params = np.zeros((0, 3))
+        logger.info(f"VolatilitySurface initialized for {underlying}.")
+
+    def _time_to_expiry(self, expiries, as_of=None):
+        as_of = np.datetime64(pd.Timestamp(as_of if as_of is not None else self.as_of), "ns")
+        expiries = np.asarray(pd.to_datetime(expiries), dtype="datetime64[ns]")
+        return (expiries - as_of).astype("timedelta64[ns]").astype(np.float64) / 1e9 / SECONDS_PER_YEAR
+
+    def update(self, quotes, spot, as_of=None):
+        # quotes: DataFrame with expiry, strike, option_type (CE/PE) and either iv or last_price.
+        # Expiries absent from `quotes` keep their current fit.
+        self.as_of = pd.Timestamp(as_of) if as_of is not None else pd.Timestamp.now()
+        if quotes.empty:
+            logger.warning(f"No option quotes to fit the {self.underlying} volatility surface.")
+            return []
+
+        quotes = quotes.assign(expiry=pd.to_datetime(quotes["expiry"]))
+        refitted = []
+        for expiry, group in quotes.groupby("expiry", sort=True):
+            t = float(self._time_to_expiry([expiry])[0])
+            if t <= 0:
+                self._smiles.pop(expiry, None)
+                continue
+            forward = spot * np.exp(self.rate * t)
+            fingerprint = self._fingerprint(group, forward, t)
+            cached = self._smiles.get(expiry)
+            if cached is not None and cached["fingerprint"] == fingerprint:
+                continue
+
+            params, n_quotes = self._fit_smile(group, forward, t)
+            if params is None:
+                logger.warning(f"Not enough valid quotes to fit {self.underlying} smile for {expiry.date()}.")
+                continue
+            self._smiles[expiry] = {"fingerprint": fingerprint, "forward": forward, "params": params, "n_quotes": n_quotes}
+            refitted.append(expiry)
+
+        # Drop expiries that have passed
+        for expiry in [e for e in self._smiles if e <= self.as_of]:
+            del self._smiles[expiry]
+        self._rebuild_arrays()
+        logger.info(f"VolatilitySurface for {self.underlying} refitted {len(refitted)} of {len(self._smiles)} expiries.")
+        return refitted
+
+    def _fingerprint(self, group, forward, t):
+        value_col = "iv" if "iv" in group.columns else "last_price"
+        cols = group.sort_values(["strike", "option_type"])[["strike", "option_type", value_col]]
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(pd.util.hash_pandas_object(cols, index=False).to_numpy().tobytes())
+        if value_col == "last_price":
+            # Volatilities implied from prices change with the forward and time to expiry
+            digest.update(np.array([forward, t]).tobytes())
+        return digest.hexdigest()
+
+    def _fit_smile(self, group, forward, t):
+        strikes = group["strike"].to_numpy(dtype=np.float64)
+        is_call = (group["option_type"] == "CE").to_numpy()
+        if "iv" in group.columns:
+            iv = group["iv"].to_numpy(dtype=np.float64)
+        else:
+            iv = implied_volatility(group["last_price"].to_numpy(dtype=np.float64), forward, strikes, t, is_call,
+                                    discount=np.exp(-self.rate * t))
+
+        # Prefer out-of-the-money quotes, which are the liquid side of the chain
+        otm = np.where(is_call, strikes >= forward, strikes <= forward)
+        use = otm & np.isfinite(iv) & (iv > 0)
+        if use.sum() < self.min_quotes_per_expiry:
+            use = np.isfinite(iv) & (iv > 0)
+        if use.sum() == 0:
+            return None, 0
+
+        k = np.log(strikes[use] / forward)
+        variance = iv[use] ** 2
+        if use.sum() < self.min_quotes_per_expiry:
+            # Too few points for a smile: flat implied variance
+            return np.array([variance.mean(), 0.0, 0.0]), int(use.sum())
+        design = np.column_stack([np.ones_like(k), k, k * k])
+        params, *_ = np.linalg.lstsq(design, variance, rcond=None)
+        return params, int(use.sum())
+
+    def _rebuild_arrays(self):
+        expiries = sorted(self._smiles)
+        self._expiries = np.array(expiries, dtype="datetime64[ns]")
+        self._times = self._time_to_expiry(self._expiries) if expiries else np.array([])
+        self._log_forwards = np.log([self._smiles[e]["forward"] for e in expiries]) if expiries else np.array([])
+        self._params = np.array([self._smiles[e]["params"] for e in expiries]).reshape(-1, 3)
+
+    @property
+    def expiries(self):
+        return list(pd.to_datetime(self._expiries))
+
+    def _total_variance(self, idx, log_strikes):
+        k = log_strikes - self._log_forwards[idx]
+        a, b, c = self._params[idx, 0], self._params[idx, 1], self._params[idx, 2]
+        return np.maximum((a + (b + c * k) * k) * self._times[idx], MIN_TOTAL_VARIANCE)
+
+    def iv_t(self, strikes, times):
+        # Query by time to expiry in years (relative to the surface's as_of)
+        if len(self._times) == 0:
+            raise RuntimeError(f"VolatilitySurface for {self.underlying} has no fitted expiries.")
+        strikes, times = np.broadcast_arrays(np.asarray(strikes, dtype=np.float64), np.asarray(times, dtype=np.float64))
+        log_strikes = np.log(strikes)
+        last = len(self._times) - 1
+
+        hi = np.clip(np.searchsorted(self._times, times), 0, last)
+        lo = np.clip(hi - 1, 0, last)
+        w_lo = self._total_variance(lo, log_strikes)
+        w_hi = self._total_variance(hi, log_strikes)
+        t_lo, t_hi = self._times[lo], self._times[hi]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            weight = np.where(t_hi > t_lo, (times - t_lo) / (t_hi - t_lo), 0.0)
+        w = w_lo + (w_hi - w_lo) * weight
+
+        # Outside the fitted expiries hold implied volatility flat at the nearest smile
+        # (hi is clipped to the last expiry, so w_hi is already the nearest smile on either side)
+        before = times < self._times[0]
+        after = times > self._times[last]
+        if before.any():
+            w = np.where(before, w_hi * times / self._times[0], w)
+        if after.any():
+            w = np.where(after, w_hi * times / self._times[last], w)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return np.where(times > 0, np.sqrt(np.maximum(w, MIN_TOTAL_VARIANCE) / times), np.nan)
+
+    def iv(self, strikes, expiries):
+        return self.iv_t(strikes, self._time_to_expiry(expiries))
+
+    def get_smile_params(self):
+        return pd.DataFrame({
+            "expiry": pd.to_datetime(self._expiries),
+            "time_to_expiry": self._times,
+            "forward": np.exp(self._log_forwards),
+            "a": self._params[:, 0], "b": self._params[:, 1], "c": self._params[:, 2],
+            "n_quotes": [self._smiles[e]["n_quotes"] for e in pd.to_datetime(self._expiries)]
+        })
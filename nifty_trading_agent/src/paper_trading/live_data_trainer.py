@@ -1,5 +1,6 @@
 import time
 from datetime import datetime, timedelta
+import numpy as np
 import pandas as pd
 import os
 
@@ -8,23 +9,30 @@ from nifty_trading_agent.src.data_ingestion.data_collector import DataCollector
 from nifty_trading_agent.src.preprocessing.data_cleaner import DataCleaner
 from nifty_trading_agent.src.preprocessing.feature_engineer import FeatureEngineer
 from nifty_trading_agent.src.sentiment_analysis.news_collector import NewsCollector
+from nifty_trading_agent.src.sentiment_analysis.article_deduplicator import ArticleDeduplicator
 from nifty_trading_agent.src.sentiment_analysis.social_media_collector import SocialMediaCollector
 from nifty_trading_agent.src.sentiment_analysis.sentiment_analyzer import SentimentAnalyzer
+from nifty_trading_agent.src.sentiment_analysis.sentiment_cache import SentimentCache
+from nifty_trading_agent.src.sentiment_analysis.relevance_filter import RelevanceFilter
 from nifty_trading_agent.src.market_analysis.volatility_analyzer import VolatilityAnalyzer
 from nifty_trading_agent.src.market_analysis.correlation_analyzer import CorrelationAnalyzer
 from nifty_trading_agent.src.options_pricing.black_scholes import BlackScholesModel
 from nifty_trading_agent.src.risk_management.risk_calculator import RiskCalculator
 from nifty_trading_agent.src.risk_management.position_sizer import PositionSizer
 from nifty_trading_agent.src.rl_agent.trading_environment import TradingEnvironment
+from nifty_trading_agent.src.rl_agent.vectorized_environment import VectorizedTradingEnvironment, batch_select_actions, batch_store_experiences
 from nifty_trading_agent.src.rl_agent.dqn_agent import DQNAgent
 from nifty_trading_agent.src.rl_agent.ppo_agent import PPOAgent
 from nifty_trading_agent.src.rl_agent.ensemble_agent import EnsembleAgent
+from nifty_trading_agent.src.rl_agent.checkpointer import ModelCheckpointer
+from nifty_trading_agent.src.rl_agent.replay_buffer import ReplayBuffer
 from nifty_trading_agent.src.paper_trading.paper_trading_engine import PaperTradingEngine
 from nifty_trading_agent.src.paper_trading.performance_tracker import PerformanceTracker
 from nifty_trading_agent.src.paper_trading.risk_monitor import RiskMonitor
 from nifty_trading_agent.src.utils.config_manager import config
 from nifty_trading_agent.src.utils.logger import logger
 from nifty_trading_agent.src.utils.database import db_manager
+from nifty_trading_agent.src.utils.profiler import StageProfiler
 
 class LiveDataTrainer:
     def __init__(self):
@@ -32,16 +40,19 @@ class LiveDataTrainer:
         self.data_collector = DataCollector()
         self.data_cleaner = DataCleaner()
         self.feature_engineer = FeatureEngineer()
-        self.news_collector = NewsCollector()
+        self.news_collector = NewsCollector(deduplicator=ArticleDeduplicator.from_config())
         self.social_media_collector = SocialMediaCollector()
-        self.sentiment_analyzer = SentimentAnalyzer()
+        self.sentiment_analyzer = SentimentAnalyzer(cache=SentimentCache.from_config(),
+                                                    relevance_filter=RelevanceFilter.from_config())
         self.volatility_analyzer = VolatilityAnalyzer()
         self.correlation_analyzer = CorrelationAnalyzer()
         self.black_scholes_model = BlackScholesModel()
         self.risk_calculator = RiskCalculator()
         self.position_sizer = PositionSizer()
         
-        self.dqn_agent = DQNAgent(state_dim=config.get("rl_agent.state_space_dim"), action_dim=config.get("rl_agent.action_space_dim"))
+        self.replay_buffer = ReplayBuffer.from_config()
+        self.dqn_agent = DQNAgent(state_dim=config.get("rl_agent.state_space_dim"), action_dim=config.get("rl_agent.action_space_dim"),
+                                  replay_buffer=self.replay_buffer)
         self.ppo_agent = PPOAgent(state_dim=config.get("rl_agent.state_space_dim"), action_dim=config.get("rl_agent.action_space_dim"))
         self.ensemble_agent = EnsembleAgent([self.dqn_agent, self.ppo_agent])
 
@@ -50,6 +61,7 @@ class LiveDataTrainer:
         self.risk_monitor = RiskMonitor(self.paper_trading_engine)
 
         self.model_save_path = config.get("rl_agent.model_save_path")
+        self.checkpointer = ModelCheckpointer.from_config(db=db_manager)
 
         logger.info("LiveDataTrainer initialized.")
 
@@ -73,56 +85,131 @@ class LiveDataTrainer:
 
     def run_trainer(self, historical_data_dir=None):
         logger.info("Starting LiveDataTrainer...")
+        self.profiler = StageProfiler.from_config("live_data_trainer")
+        try:
+            self._run_trainer(historical_data_dir)
+        finally:
+            # Written even when the run exits early, so partial runs still show where time went
+            self.profiler.finish()
+            self.checkpointer.wait()
+            self.replay_buffer.flush()
+
+    def _load_historical_csvs(self, historical_data_dir):
+        market_data_df = pd.DataFrame()
+        logger.info(f"Loading historical data from Kaggle directory: {historical_data_dir}")
+        all_files = []
+        for root, _, files in os.walk(historical_data_dir):
+            for file in files:
+                if file.endswith('.csv'):
+                    all_files.append(os.path.join(root, file))
+
+        if not all_files:
+            logger.warning(f"No CSV files found in {historical_data_dir}. Cannot load Kaggle data.")
+            return market_data_df
+
+        list_dfs = []
+        for f in all_files:
+            try:
+                df = pd.read_csv(f)
+                # Assuming columns like 'timestamp', 'open', 'high', 'low', 'close', 'volume', 'oi'
+                # Adjust column names if necessary based on actual Kaggle dataset
+                if 'timestamp' in df.columns:
+                    df['timestamp'] = pd.to_datetime(df['timestamp'])
+                elif 'date' in df.columns:
+                    df['timestamp'] = pd.to_datetime(df['date'])
+                else:
+                    logger.warning(f"Timestamp column not found in {f}. Skipping.")
+                    continue
+                list_dfs.append(df)
+            except Exception as e:
+                logger.error(f"Error reading {f}: {e}")
+
+        if list_dfs:
+            market_data_df = pd.concat(list_dfs, ignore_index=True)
+            market_data_df = market_data_df.sort_values('timestamp').reset_index(drop=True)
+            logger.info(f"Loaded {len(market_data_df)} rows from Kaggle dataset.")
+        else:
+            logger.warning("No data loaded from Kaggle CSVs.")
+        return market_data_df
+
+    def _save_checkpoint(self, episode):
+        accuracy = self.performance_tracker.calculate_accuracy() # Placeholder
+        logger.info(f"Episode {episode}: Current Accuracy: {accuracy:.2f}")
+
+        # Weights are copied here and written by the checkpointer's background thread
+        self.checkpointer.save({"dqn": self.dqn_agent, "ppo": self.ppo_agent},
+                               metrics={"accuracy": accuracy, "success_rate": accuracy}, # Assuming accuracy is success rate for now
+                               episode=episode)
+
+    def _train_vectorized(self, env, num_episodes):
+        # Runs env.num_envs episodes per batch in lock-step (rl_agent.num_envs > 1). Agents receive
+        # whole batches of observations and transitions; the DQN takes one gradient update per
+        # lock-step rather than one per transition.
+        profiler = self.profiler
+        episodes_done = 0
+        while episodes_done < num_episodes:
+            batch_start = time.perf_counter()
+            obs = env.reset()
+            total_rewards = np.zeros(env.num_envs)
+            steps = np.zeros(env.num_envs, dtype=np.int64)
+
+            while not env.all_done():
+                active = env.active.copy()
+                actions = batch_select_actions(self.ensemble_agent, obs)
+                next_obs, rewards, dones, info = env.step(actions)
+                batch_store_experiences(self.dqn_agent, obs, actions, rewards, next_obs, dones, mask=active)
+                self.dqn_agent.update_model()
+                if hasattr(self.ppo_agent, "update_model_batch"):
+                    self.ppo_agent.update_model_batch(obs[active], actions[active], rewards[active], next_obs[active], dones[active])
+                else:
+                    for i in np.flatnonzero(active):
+                        self.ppo_agent.update_model(obs[i], actions[i], rewards[i], next_obs[i], dones[i])
+
+                obs = next_obs
+                total_rewards += rewards
+                steps += active
+
+            elapsed = time.perf_counter() - batch_start
+            batch_size = min(env.num_envs, num_episodes - episodes_done)
+            for i in range(batch_size):
+                episodes_done += 1
+                # Lock-stepped episodes share the batch's wall time
+                profiler.record_episode(episodes_done, int(steps[i]), elapsed / env.num_envs, float(total_rewards[i]))
+                if episodes_done % 100 == 0:
+                    self._save_checkpoint(episodes_done)
+            logger.info(f"Episodes {episodes_done - batch_size + 1}-{episodes_done}/{num_episodes}, "
+                        f"Mean Reward: {total_rewards[:batch_size].mean():.4f}, Steps: {int(steps.sum())}, "
+                        f"Steps/sec: {steps.sum() / elapsed if elapsed > 0 else 0:.1f}")
+
+    def _run_trainer(self, historical_data_dir=None):
+        profiler = self.profiler
 
         # 1. Load existing models if available (from local path, e.g., Kaggle output dir)
         dqn_model_path = os.path.join(self.model_save_path, "dqn_agent.zip")
         ppo_model_path = os.path.join(self.model_save_path, "ppo_agent.zip")
-        
-        if os.path.exists(dqn_model_path):
-            self.dqn_agent.load_model(dqn_model_path)
-            logger.info(f"Loaded existing DQN model from {dqn_model_path}")
-        if os.path.exists(ppo_model_path):
-            self.ppo_agent.load_model(ppo_model_path)
-            logger.info(f"Loaded existing PPO model from {ppo_model_path}")
+
+        with profiler.stage("load_models"):
+            agents = {"dqn": self.dqn_agent, "ppo": self.ppo_agent}
+            if self.checkpointer.restore(agents, which=config.get("rl_agent.checkpoint.resume", "latest")):
+                if agents["dqn"] is not self.dqn_agent or agents["ppo"] is not self.ppo_agent:
+                    self.dqn_agent, self.ppo_agent = agents["dqn"], agents["ppo"]
+                    self.ensemble_agent = EnsembleAgent([self.dqn_agent, self.ppo_agent])
+            else:
+                # Fall back to models saved before versioned checkpoints existed
+                if os.path.exists(dqn_model_path):
+                    self.dqn_agent.load_model(dqn_model_path)
+                    logger.info(f"Loaded existing DQN model from {dqn_model_path}")
+                if os.path.exists(ppo_model_path):
+                    self.ppo_agent.load_model(ppo_model_path)
+                    logger.info(f"Loaded existing PPO model from {ppo_model_path}")
 
         # 2. Data Collection and Preprocessing
         market_data_df = pd.DataFrame()
         if historical_data_dir: # Use Kaggle data if provided
-            logger.info(f"Loading historical data from Kaggle directory: {historical_data_dir}")
-            all_files = []
-            for root, _, files in os.walk(historical_data_dir):
-                for file in files:
-                    if file.endswith('.csv'):
-                        all_files.append(os.path.join(root, file))
-            
-            if not all_files:
-                logger.warning(f"No CSV files found in {historical_data_dir}. Cannot load Kaggle data.")
-            else:
-                list_dfs = []
-                for f in all_files:
-                    try:
-                        df = pd.read_csv(f)
-                        # Assuming columns like 'timestamp', 'open', 'high', 'low', 'close', 'volume', 'oi'
-                        # Adjust column names if necessary based on actual Kaggle dataset
-                        if 'timestamp' in df.columns:
-                            df['timestamp'] = pd.to_datetime(df['timestamp'])
-                        elif 'date' in df.columns:
-                            df['timestamp'] = pd.to_datetime(df['date'])
-                        else:
-                            logger.warning(f"Timestamp column not found in {f}. Skipping.")
-                            continue
-                        list_dfs.append(df)
-                    except Exception as e:
-                        logger.error(f"Error reading {f}: {e}")
-                
-                if list_dfs:
-                    market_data_df = pd.concat(list_dfs, ignore_index=True)
-                    market_data_df = market_data_df.sort_values('timestamp').reset_index(drop=True)
-                    logger.info(f"Loaded {len(market_data_df)} rows from Kaggle dataset.")
-                else:
-                    logger.warning("No data loaded from Kaggle CSVs.")
+            with profiler.stage("load_csv") as stage:
+                market_data_df = self._load_historical_csvs(historical_data_dir)
+                stage["rows_out"] = len(market_data_df)
 
-        
         if market_data_df.empty:
             logger.info("No Kaggle historical data loaded or available. Attempting to fetch from Zerodha.")
             if not self._get_zerodha_access_token():
@@ -135,80 +222,95 @@ class LiveDataTrainer:
             nifty_instrument_token = 738561 # Example Nifty 50 instrument token
             to_date = datetime.now().date()
             from_date = to_date - timedelta(days=365) # Last 1 year data
-            market_data_df = self.data_collector.collect_historical_data(nifty_instrument_token, from_date, to_date, "day")
+            with profiler.stage("load_zerodha") as stage:
+                market_data_df = self.data_collector.collect_historical_data(nifty_instrument_token, from_date, to_date, "day")
+                stage["rows_out"] = len(market_data_df)
 
         if market_data_df.empty:
             logger.error("No historical data available for training. Exiting trainer.")
             return
 
-        market_data_df = self.data_cleaner.clean_market_data(market_data_df)
-        market_data_df = self.feature_engineer.add_technical_indicators(market_data_df)
-        market_data_df = self.feature_engineer.add_volatility_features(market_data_df)
+        with profiler.stage("clean", rows_in=len(market_data_df)) as stage:
+            market_data_df = self.data_cleaner.clean_market_data(market_data_df)
+            stage["rows_out"] = len(market_data_df)
+        with profiler.stage("technical_indicators", rows_in=len(market_data_df)) as stage:
+            market_data_df = self.feature_engineer.add_technical_indicators(market_data_df)
+            stage["rows_out"] = len(market_data_df)
+        with profiler.stage("volatility_features", rows_in=len(market_data_df)) as stage:
+            market_data_df = self.feature_engineer.add_volatility_features(market_data_df)
+            stage["rows_out"] = len(market_data_df)
         # Placeholder for options and sentiment features (these would be merged based on timestamp)
-        market_data_df = self.feature_engineer.add_options_features(market_data_df)
-        market_data_df = self.feature_engineer.add_sentiment_features(market_data_df)
+        with profiler.stage("options_features", rows_in=len(market_data_df)) as stage:
+            market_data_df = self.feature_engineer.add_options_features(market_data_df)
+            stage["rows_out"] = len(market_data_df)
+        with profiler.stage("sentiment_features", rows_in=len(market_data_df)) as stage:
+            market_data_df = self.feature_engineer.add_sentiment_features(market_data_df)
+            stage["rows_out"] = len(market_data_df)
         
         # Drop any rows with NaN values after feature engineering
-        market_data_df.dropna(inplace=True)
+        with profiler.stage("dropna", rows_in=len(market_data_df)) as stage:
+            market_data_df.dropna(inplace=True)
+            stage["rows_out"] = len(market_data_df)
 
         if market_data_df.empty:
             logger.error("Market data is empty after feature engineering. Exiting trainer.")
             return
 
-        # Prepare RL environment
-        state_space_df = self.feature_engineer.create_rl_state_space(market_data_df)
-        env = TradingEnvironment(market_data_df, state_space_df, self.paper_trading_engine, self.risk_calculator, self.position_sizer)
+        # Prepare RL environment. TradingEnvironment is the default; the vectorised environment is
+        # opt-in for fast pre-training since it skips the paper-trading engine and risk checks
+        num_envs = config.get("rl_agent.num_envs", 1)
+        with profiler.stage("state_space", rows_in=len(market_data_df)) as stage:
+            state_space_df = self.feature_engineer.create_rl_state_space(market_data_df)
+            if num_envs > 1:
+                env = VectorizedTradingEnvironment.from_config(market_data_df, state_space_df)
+            else:
+                env = TradingEnvironment(market_data_df, state_space_df, self.paper_trading_engine, self.risk_calculator, self.position_sizer)
+            stage["rows_out"] = len(state_space_df)
 
         # 3. RL Agent Training Loop
         num_episodes = config.get("rl_agent.training_episodes")
-        for episode in range(num_episodes):
-            obs = env.reset()
-            done = False
-            total_reward = 0
-            step = 0
-
-            while not done:
-                # Get action from ensemble agent
-                action = self.ensemble_agent.select_action(obs)
-                
-                # Execute action in environment
-                next_obs, reward, done, info = env.step(action)
-                
-                # Store experience (for DQN)
-                self.dqn_agent.store_experience(obs, action, reward, next_obs, done)
-                
-                # Update agents
-                self.dqn_agent.update_model()
-                self.ppo_agent.update_model(obs, action, reward, next_obs, done) # PPO updates differently
+        with profiler.stage("training") as training_stage:
+            if num_envs > 1:
+                self._train_vectorized(env, num_episodes)
+            else:
+                for episode in range(num_episodes):
+                    episode_start = time.perf_counter()
+                    obs = env.reset()
+                    done = False
+                    total_reward = 0
+                    step = 0
 
-                obs = next_obs
-                total_reward += reward
-                step += 1
+                    while not done:
+                        # Get action from ensemble agent
+                        action = self.ensemble_agent.select_action(obs)
+                        
+                        # Execute action in environment
+                        next_obs, reward, done, info = env.step(action)
+                        
+                        # Store experience (for DQN)
+                        self.dqn_agent.store_experience(obs, action, reward, next_obs, done)
+                        
+                        # Update agents
+                        self.dqn_agent.update_model()
+                        self.ppo_agent.update_model(obs, action, reward, next_obs, done) # PPO updates differently
 
-                # In a real live trainer, you'd fetch live data here and update the environment
-                # For now, we're iterating through the historical data.
-                # To simulate live data, you'd fetch new data points and append to market_data_df
-                # and then update the environment's internal state.
+                        obs = next_obs
+                        total_reward += reward
+                        step += 1
 
-            logger.info(f"Episode {episode + 1}/{num_episodes}, Total Reward: {total_reward}, Steps: {step}")
-            
-            # Evaluate and save models periodically
-            if (episode + 1) % 100 == 0:
-                accuracy = self.performance_tracker.calculate_accuracy() # Placeholder
-                logger.info(f"Episode {episode + 1}: Current Accuracy: {accuracy:.2f}")
-                
-                # Ensure model_save_path exists
-                os.makedirs(self.model_save_path, exist_ok=True)
-
-                self.dqn_agent.save_model(dqn_model_path)
-                self.ppo_agent.save_model(ppo_model_path)
-                
-                db_manager.add_model_checkpoint({
-                    "model_name": "ensemble_agent",
-                    "model_path": self.model_save_path, # Store local path
-                    "accuracy": accuracy,
-                    "success_rate": accuracy # Assuming accuracy is success rate for now
-                })
+                        # In a real live trainer, you'd fetch live data here and update the environment
+                        # For now, we're iterating through the historical data.
+                        # To simulate live data, you'd fetch new data points and append to market_data_df
+                        # and then update the environment's internal state.
+
+                    steps_per_sec = profiler.record_episode(episode + 1, step, time.perf_counter() - episode_start, total_reward)
+                    logger.info(f"Episode {episode + 1}/{num_episodes}, Total Reward: {total_reward}, Steps: {step}, "
+                                f"Steps/sec: {steps_per_sec or 0:.1f}")
+                    
+                    # Evaluate and save models periodically
+                    if (episode + 1) % 100 == 0:
+                        self._save_checkpoint(episode + 1)
+            training_stage["rows_out"] = sum(e["steps"] for e in profiler.episodes)
 
         logger.info("LiveDataTrainer finished.")
 
@@ -2,13 +2,15 @@ import pandas as pd
 import numpy as np
 import talib
 from ..utils.logger import logger
+from ..utils.tracing import traced
 
 class FeatureEngineer:
     def __init__(self):
         logger.info("FeatureEngineer initialized.")
 
+    @traced("features.technical")
     def add_technical_indicators(self, df):
-        logger.info("Adding technical indicators...")
+        logger.debug("Adding technical indicators...")
         # Ensure columns are in correct format for TA-Lib
         if not all(col in df.columns for col in ["open", "high", "low", "close", "volume"]):
             logger.warning("Missing OHLCV data for technical indicator calculation.")
@@ -44,42 +46,46 @@ class FeatureEngineer:
         # ADX
         df["ADX"] = talib.ADX(df["high"], df["low"], df["close"], timeperiod=14)
 
-        logger.info("Technical indicators added.")
+        logger.debug("Technical indicators added.")
         return df
 
+    @traced("features.volatility")
     def add_volatility_features(self, df):
-        logger.info("Adding volatility features...")
+        logger.debug("Adding volatility features...")
         if "close" not in df.columns:
             logger.warning("Missing close price for volatility calculation.")
             return df
 
         df["Log_Return"] = np.log(df["close"] / df["close"].shift(1))
         df["Daily_Volatility"] = df["Log_Return"].rolling(window=10).std() * np.sqrt(252) # Annualized
-        logger.info("Volatility features added.")
+        logger.debug("Volatility features added.")
         return df
 
+    @traced("features.options")
     def add_options_features(self, df, option_chain_data=None):
-        logger.info("Adding options features...")
+        logger.debug("Adding options features...")
         # This is a placeholder. Real options features would come from option chain data
         # and involve Greeks (Delta, Gamma, Theta, Vega, Rho), implied volatility, etc.
         # These would typically be calculated by the BlackScholesModel and integrated here.
         df["Option_Implied_Volatility"] = np.random.rand(len(df)) * 0.3 + 0.1 # Placeholder
         df["Option_Delta"] = np.random.rand(len(df)) * 2 - 1 # Placeholder (-1 to 1)
         df["Option_Theta"] = np.random.rand(len(df)) * -0.1 # Placeholder (negative)
-        logger.info("Options features added.")
+        logger.debug("Options features added.")
         return df
 
+    @traced("features.sentiment")
     def add_sentiment_features(self, df, sentiment_data=None):
-        logger.info("Adding sentiment features...")
+        logger.debug("Adding sentiment features...")
         # This is a placeholder. Real sentiment features would be merged based on timestamp
         # from the sentiment analysis module.
         df["Sentiment_Score"] = np.random.rand(len(df)) * 2 - 1 # Placeholder (-1 to 1)
         df["Sentiment_Magnitude"] = np.random.rand(len(df)) # Placeholder (0 to 1)
-        logger.info("Sentiment features added.")
+        logger.debug("Sentiment features added.")
         return df
 
+    @traced("state_space")
     def create_rl_state_space(self, df):
-        logger.info("Creating RL state space...")
+        logger.debug("Creating RL state space...")
         # Select and normalize features for the RL agent
         features = [
             "open", "high", "low", "close", "volume", "oi",
@@ -102,7 +108,7 @@ class FeatureEngineer:
         state_space_df = (state_space_df - state_space_df.mean()) / state_space_df.std()
         state_space_df = state_space_df.fillna(0) # Handle cases where std is 0
 
-        logger.info(f"RL state space created with {len(features)} features.")
+        logger.debug("RL state space created with {} features.", len(features))
         return state_space_df
 
 
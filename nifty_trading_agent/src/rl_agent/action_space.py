@@ -0,0 +1,199 @@
+from datetime import date, datetime
+import numpy as np
+import pandas as pd
+from ..utils.config_manager import config
+from ..utils.logger import logger
+
+# One row per discrete action. Index layout (row-major over the catalogue axes):
+#   underlying x expiry x strike offset x option type (CE, PE) x side (BUY, SELL) x lot multiple
+ACTION_DTYPE = np.dtype([
+    ("underlying", "U16"),
+    ("expiry", "datetime64[D]"),
+    ("strike_offset", np.int8),
+    ("strike", np.float64),
+    ("option_type", "U2"),
+    ("side", np.int8), # +1 BUY, -1 SELL
+    ("lot_multiple", np.int16),
+    ("lot_size", np.int32),
+    ("instrument_token", np.int64),
+    ("tradingsymbol", "U32"),
+    ("available", np.bool_), # False when the live chain has no such contract
+])
+
+OPTION_TYPES = ("CE", "PE")
+SIDES = (1, -1)
+DEFAULT_STRIKE_STEPS = {"NIFTY": 50, "BANKNIFTY": 100}
+
+def _to_day(value):
+    if isinstance(value, (datetime, pd.Timestamp)):
+        return value.date()
+    if isinstance(value, str):
+        return pd.Timestamp(value).date()
+    return value
+
+class ActionCatalogue:
+    # Built once per session from the live option chain. `table` is a structured array indexed by
+    # action id, so decode() is a single row lookup and encode() is index arithmetic. valid_mask()
+    # evaluates margin, position and risk-limit rules for every action at once.
+
+    def __init__(self, table, shape, sell_margin_percent=0.12, max_position_per_instrument_percent=0.20,
+                 max_concentration_per_underlying_percent=0.30, daily_loss_limit_percent=0.05):
+        self.table = table
+        self.shape = shape # (underlyings, expiries, strike offsets, option types, sides, lot multiples)
+        self.sell_margin_percent = sell_margin_percent
+        self.max_position_per_instrument_percent = max_position_per_instrument_percent
+        self.max_concentration_per_underlying_percent = max_concentration_per_underlying_percent
+        self.daily_loss_limit_percent = daily_loss_limit_percent
+
+        self.signed_lots = (table["side"] * table["lot_multiple"]).astype(np.float64)
+        self.quantity = table["lot_multiple"].astype(np.int64) * table["lot_size"]
+        # Each action touches one instrument; positions and prices are held per instrument
+        self.instrument_tokens, self.instrument_index = np.unique(table["instrument_token"], return_inverse=True)
+        self.underlyings, self.underlying_index = np.unique(table["underlying"], return_inverse=True)
+        self.instrument_lot_size = np.zeros(len(self.instrument_tokens), dtype=np.int64)
+        self.instrument_lot_size[self.instrument_index] = table["lot_size"]
+        self.instrument_underlying = np.zeros(len(self.instrument_tokens), dtype=np.int64)
+        self.instrument_underlying[self.instrument_index] = self.underlying_index
+        logger.info(f"ActionCatalogue initialized with {len(table)} actions ({int(table['available'].sum())} available).")
+
+    def __len__(self):
+        return len(self.table)
+
+    @classmethod
+    def build(cls, option_chain, spot_prices, underlyings=("NIFTY", "BANKNIFTY"), n_expiries=2,
+              strike_offsets=range(-5, 5), lot_multiples=(1, 2, 3, 4, 5), strike_steps=None, lot_sizes=None,
+              as_of=None, **limits):
+        # option_chain: Kite instrument dicts (or a DataFrame) with name, expiry, strike,
+        # instrument_type, lot_size, instrument_token and tradingsymbol
+        strike_steps = {**DEFAULT_STRIKE_STEPS, **(strike_steps or {})}
+        lot_sizes = lot_sizes or {}
+        as_of = _to_day(as_of) or date.today()
+        chain = pd.DataFrame(option_chain)
+        if not chain.empty:
+            chain = chain[chain["instrument_type"].isin(OPTION_TYPES)].copy()
+            chain["expiry"] = chain["expiry"].map(_to_day)
+        contracts = {(row.name, row.expiry, float(row.strike), row.instrument_type): row
+                     for row in chain.itertuples(index=False)} if not chain.empty else {}
+
+        strike_offsets, lot_multiples = list(strike_offsets), list(lot_multiples)
+        shape = (len(underlyings), n_expiries, len(strike_offsets), len(OPTION_TYPES), len(SIDES), len(lot_multiples))
+        table = np.zeros(int(np.prod(shape)), dtype=ACTION_DTYPE)
+        rows = table.reshape(shape)
+        # Placeholder tokens for missing contracts stay unique so they never share a position slot
+        missing_token = -1
+
+        for u, underlying in enumerate(underlyings):
+            step = strike_steps.get(underlying, 50)
+            atm = round(spot_prices[underlying] / step) * step
+            names = chain["name"] == underlying if not chain.empty else None
+            expiries = sorted(e for e in chain.loc[names, "expiry"].unique() if e >= as_of)[:n_expiries] if names is not None else []
+            for e in range(n_expiries):
+                expiry = expiries[e] if e < len(expiries) else None
+                for s, offset in enumerate(strike_offsets):
+                    strike = float(atm + offset * step)
+                    for o, option_type in enumerate(OPTION_TYPES):
+                        contract = contracts.get((underlying, expiry, strike, option_type)) if expiry else None
+                        if contract is None:
+                            token, symbol, lot_size = missing_token, "", lot_sizes.get(underlying, 1)
+                            missing_token -= 1
+                        else:
+                            token, symbol, lot_size = int(contract.instrument_token), contract.tradingsymbol, int(contract.lot_size)
+                        block = rows[u, e, s, o]
+                        block["underlying"] = underlying
+                        block["expiry"] = np.datetime64(expiry, "D") if expiry else np.datetime64("NaT")
+                        block["strike_offset"] = offset
+                        block["strike"] = strike
+                        block["option_type"] = option_type
+                        block["side"] = np.array(SIDES)[:, None]
+                        block["lot_multiple"] = np.array(lot_multiples)[None, :]
+                        block["lot_size"] = lot_size
+                        block["instrument_token"] = token
+                        block["tradingsymbol"] = symbol
+                        block["available"] = contract is not None
+        return cls(table, shape, **limits)
+
+    @classmethod
+    def from_config(cls, option_chain, spot_prices, as_of=None):
+        catalogue = cls.build(option_chain, spot_prices,
+                              underlyings=tuple(config.get("rl_agent.action_space.underlyings", ["NIFTY", "BANKNIFTY"])),
+                              n_expiries=config.get("rl_agent.action_space.expiries", 2),
+                              strike_offsets=range(*config.get("rl_agent.action_space.strike_offset_range", [-5, 5])),
+                              lot_multiples=tuple(config.get("rl_agent.action_space.lot_multiples", [1, 2, 3, 4, 5])),
+                              strike_steps=config.get("rl_agent.action_space.strike_steps"),
+                              lot_sizes=config.get("trading.lot_sizes"),
+                              as_of=as_of,
+                              sell_margin_percent=config.get("trading.sell_margin_percent", 0.12),
+                              max_position_per_instrument_percent=config.get("trading.max_position_per_instrument_percent", 0.20),
+                              max_concentration_per_underlying_percent=config.get("trading.max_concentration_per_underlying_percent", 0.30),
+                              daily_loss_limit_percent=config.get("trading.daily_loss_limit_percent", 0.05))
+        expected = config.get("rl_agent.action_space_dim")
+        if expected and expected != len(catalogue):
+            logger.warning(f"Action catalogue has {len(catalogue)} actions but rl_agent.action_space_dim is {expected}.")
+        return catalogue
+
+    @classmethod
+    def from_collector(cls, data_collector, spot_prices, exchange="NFO", as_of=None):
+        chain = []
+        for underlying in config.get("rl_agent.action_space.underlyings", ["NIFTY", "BANKNIFTY"]):
+            chain.extend(data_collector.get_option_chain_data(exchange, underlying))
+        return cls.from_config(chain, spot_prices, as_of=as_of)
+
+    def encode(self, underlying_idx, expiry_idx, offset_idx, option_type_idx, side_idx, lot_idx):
+        return int(np.ravel_multi_index((underlying_idx, expiry_idx, offset_idx, option_type_idx, side_idx, lot_idx), self.shape))
+
+    def decode(self, action):
+        return self.table[action]
+
+    def _instrument_vector(self, values, default=0.0):
+        # Accepts a per-instrument array or a {instrument_token: value} dict
+        if isinstance(values, dict):
+            return np.array([values.get(int(token), default) for token in self.instrument_tokens], dtype=np.float64)
+        return np.asarray(values, dtype=np.float64)
+
+    def exposure(self, lots, prices, spot_by_instrument):
+        # Long options risk their premium; short options are sized by the margin they block
+        long_exposure = np.maximum(lots, 0) * self.instrument_lot_size * prices
+        short_exposure = np.maximum(-lots, 0) * self.instrument_lot_size * spot_by_instrument * self.sell_margin_percent
+        return long_exposure + short_exposure
+
+    def valid_mask(self, prices, positions, available_margin, capital, spot_prices, daily_pnl=0.0):
+        # prices/positions: per instrument (array aligned with instrument_tokens, or dicts keyed by
+        # token); positions are signed lots. Returns a bool array over all actions.
+        prices = self._instrument_vector(prices, np.nan)
+        positions = self._instrument_vector(positions)
+        spot_by_underlying = np.array([spot_prices[name] for name in self.underlyings], dtype=np.float64)
+        spot_by_instrument = spot_by_underlying[self.instrument_underlying]
+
+        inst = self.instrument_index
+        price = prices[inst]
+        before = positions[inst]
+        after = before + self.signed_lots
+        reduces = np.abs(after) < np.abs(before)
+
+        # Margin: buying pays premium; selling blocks margin only on the part that opens a short
+        premium = price * self.quantity
+        opened_short = np.maximum(-after, 0) - np.maximum(-before, 0)
+        short_margin = np.maximum(opened_short, 0) * self.table["lot_size"] * spot_by_instrument[inst] * self.sell_margin_percent
+        margin_needed = np.where(self.table["side"] > 0, premium, short_margin)
+        margin_ok = margin_needed <= available_margin
+
+        # Per-instrument and per-underlying exposure limits on the position after the action
+        exposure_before = self.exposure(positions, prices, spot_by_instrument)
+        lot_sizes = self.table["lot_size"]
+        exposure_after = (np.maximum(after, 0) * lot_sizes * price
+                          + np.maximum(-after, 0) * lot_sizes * spot_by_instrument[inst] * self.sell_margin_percent)
+        instrument_ok = exposure_after <= self.max_position_per_instrument_percent * capital
+        underlying_exposure = np.bincount(self.instrument_underlying, weights=np.nan_to_num(exposure_before),
+                                          minlength=len(self.underlyings))
+        concentration_after = underlying_exposure[self.underlying_index] - np.nan_to_num(exposure_before[inst]) + exposure_after
+        concentration_ok = concentration_after <= self.max_concentration_per_underlying_percent * capital
+
+        # Past the daily loss limit only position-reducing actions remain
+        loss_limit_hit = daily_pnl <= -self.daily_loss_limit_percent * capital
+
+        opening_ok = margin_ok & instrument_ok & concentration_ok & (not loss_limit_hit)
+        return self.table["available"] & np.isfinite(price) & (price > 0) & (reduces | opening_ok)
+
+def masked_argmax(values, mask):
+    # Greedy action per row of `values` (actions on the last axis) among the allowed ones
+    return np.argmax(np.where(mask, values, -np.inf), axis=-1)
@@ -0,0 +1,218 @@
+import copy
+import json
+import os
+import pickle
+import queue
+import shutil
+import threading
+from datetime import datetime
+from ..utils.config_manager import config
+from ..utils.logger import logger
+from .replay_buffer import ReplayBuffer
+
+MANIFEST_NAME = "manifest.json"
+
+def snapshot_agent(agent):
+    # In-memory copy of an agent's weights, taken on the training thread so training can carry on
+    # mutating the live model while the copy is serialised in the background
+    if hasattr(agent, "get_parameters"): # stable-baselines3
+        return {"kind": "parameters", "state": copy.deepcopy(agent.get_parameters())}
+    if hasattr(agent, "state_dict"): # torch modules
+        state = {key: value.detach().cpu().clone() if hasattr(value, "detach") else copy.deepcopy(value)
+                 for key, value in agent.state_dict().items()}
+        return {"kind": "state_dict", "state": state}
+    # Plain objects are deep-copied without their replay buffer, which can hold hundreds of
+    # thousands of transitions (or a whole memmap) and is persisted on its own by flush()
+    detached = [name for name, value in vars(agent).items() if isinstance(value, ReplayBuffer)] if hasattr(agent, "__dict__") else []
+    memo = {id(getattr(agent, name)): None for name in detached}
+    return {"kind": "object", "state": copy.deepcopy(agent, memo), "detached": detached}
+
+def restore_agent(agent, snapshot):
+    # Loads a snapshot back into `agent`; "object" snapshots are returned for the caller to swap in
+    if snapshot["kind"] == "parameters":
+        agent.set_parameters(snapshot["state"])
+        return agent
+    if snapshot["kind"] == "state_dict":
+        agent.load_state_dict(snapshot["state"])
+        return agent
+    restored = snapshot["state"]
+    for name in snapshot.get("detached", []):
+        # Re-attach the live agent's replay buffer, which the snapshot left out
+        setattr(restored, name, getattr(agent, name, None))
+    return restored
+
+def _atomic_write_json(path, payload):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(payload, f, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+class ModelCheckpointer:
+    # Versioned, asynchronous checkpoints under <directory>/<model_name>/:
+    #   v000012/<agent>.pkl   one file per agent, written into v000012.tmp/ and renamed into place
+    #   manifest.json         every retained version with its metrics and exact file paths
+    # Retention keeps the `keep_best` versions by `metric` plus the `keep_last` most recent ones, and
+    # always the newest version, which `latest` points at (even with keep_last=0).
+    # A single writer thread serialises snapshots; save() only blocks when `max_pending` snapshots
+    # are already queued.
+
+    def __init__(self, directory, model_name="ensemble_agent", keep_best=3, keep_last=2, metric="accuracy",
+                 higher_is_better=True, max_pending=2, db=None):
+        self.directory = os.path.join(directory, model_name)
+        self.model_name = model_name
+        self.keep_best = keep_best
+        self.keep_last = keep_last
+        self.metric = metric
+        self.higher_is_better = higher_is_better
+        self.db = db
+        os.makedirs(self.directory, exist_ok=True)
+        self.manifest_path = os.path.join(self.directory, MANIFEST_NAME)
+        self.manifest = self._load_manifest()
+        # Pruned versions are gone from "versions", so "latest" is needed to never reuse a number
+        self._next_version = max(max((entry["version"] for entry in self.manifest["versions"]), default=0),
+                                 self.manifest.get("latest") or 0) + 1
+        self._lock = threading.Lock()
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._worker = threading.Thread(target=self._run, name="checkpointer", daemon=True)
+        self._worker.start()
+        logger.info(f"ModelCheckpointer initialized at {self.directory} ({len(self.manifest['versions'])} versions).")
+
+    @classmethod
+    def from_config(cls, db=None):
+        return cls(config.get("rl_agent.model_save_path"),
+                   model_name=config.get("rl_agent.checkpoint.model_name", "ensemble_agent"),
+                   keep_best=config.get("rl_agent.checkpoint.keep_best", 3),
+                   keep_last=config.get("rl_agent.checkpoint.keep_last", 2),
+                   metric=config.get("rl_agent.checkpoint.metric", "accuracy"),
+                   higher_is_better=config.get("rl_agent.checkpoint.higher_is_better", True),
+                   max_pending=config.get("rl_agent.checkpoint.max_pending", 2),
+                   db=db)
+
+    def _load_manifest(self):
+        if os.path.exists(self.manifest_path):
+            try:
+                with open(self.manifest_path) as f:
+                    return json.load(f)
+            except Exception as e:
+                logger.error(f"Error reading checkpoint manifest {self.manifest_path}: {e}")
+        return {"model_name": self.model_name, "versions": []}
+
+    def save(self, agents, metrics=None, episode=None):
+        # agents: {"dqn": dqn_agent, "ppo": ppo_agent}; returns the version number assigned
+        snapshots = {name: snapshot_agent(agent) for name, agent in agents.items()}
+        with self._lock:
+            version = self._next_version
+            self._next_version += 1
+        self._queue.put((version, snapshots, dict(metrics or {}), episode))
+        return version
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            try:
+                if item is None:
+                    return
+                self._write(*item)
+            except Exception as e:
+                logger.error(f"Error writing checkpoint version {item[0]}: {e}")
+            finally:
+                self._queue.task_done()
+
+    def _write(self, version, snapshots, metrics, episode):
+        final_dir = os.path.join(self.directory, f"v{version:06d}")
+        tmp_dir = f"{final_dir}.tmp"
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        os.makedirs(tmp_dir)
+        for name, snapshot in snapshots.items():
+            with open(os.path.join(tmp_dir, f"{name}.pkl"), "wb") as f:
+                pickle.dump(snapshot, f, protocol=pickle.HIGHEST_PROTOCOL)
+                f.flush()
+                os.fsync(f.fileno())
+        os.replace(tmp_dir, final_dir)
+
+        paths = {name: os.path.join(final_dir, f"{name}.pkl") for name in snapshots}
+        entry = {"version": version, "episode": episode, "timestamp": datetime.now().isoformat(),
+                 "metrics": metrics, "paths": paths}
+        with self._lock:
+            self.manifest["versions"].append(entry)
+            removed = self._apply_retention()
+            self.manifest["latest"] = version
+            best = self._best_entry()
+            self.manifest["best"] = best["version"] if best else None
+            _atomic_write_json(self.manifest_path, self.manifest)
+        if self.db is not None:
+            for name, path in paths.items():
+                self.db.add_model_checkpoint({"model_name": f"{self.model_name}.{name}", "model_path": path,
+                                              "accuracy": metrics.get("accuracy"),
+                                              "success_rate": metrics.get("success_rate")})
+        for old in removed:
+            shutil.rmtree(os.path.dirname(next(iter(old["paths"].values()))), ignore_errors=True)
+        if self.db is not None and removed:
+            # Rows of pruned versions would otherwise point at deleted files
+            self.db.delete_model_checkpoints([path for old in removed for path in old["paths"].values()])
+        logger.info(f"Checkpoint v{version:06d} written to {final_dir}")
+
+    def _metric_key(self, entry):
+        value = entry["metrics"].get(self.metric)
+        if value is None:
+            return float("-inf")
+        return value if self.higher_is_better else -value
+
+    def _best_entry(self):
+        scored = [entry for entry in self.manifest["versions"] if entry["metrics"].get(self.metric) is not None]
+        return max(scored, key=self._metric_key) if scored else None
+
+    def _apply_retention(self):
+        versions = self.manifest["versions"]
+        by_version = sorted(versions, key=lambda e: e["version"])
+        keep = {entry["version"] for entry in by_version[-max(self.keep_last, 1):]}
+        keep |= {entry["version"] for entry in sorted(versions, key=self._metric_key, reverse=True)[:self.keep_best]}
+        removed = [entry for entry in versions if entry["version"] not in keep]
+        self.manifest["versions"] = [entry for entry in versions if entry["version"] in keep]
+        return removed
+
+    def wait(self):
+        # Blocks until every queued snapshot is on disk
+        self._queue.join()
+
+    def close(self):
+        self._queue.put(None)
+        self._worker.join()
+
+    def _entry(self, version):
+        with self._lock:
+            return next((entry for entry in self.manifest["versions"] if entry["version"] == version), None)
+
+    def load(self, version):
+        entry = self._entry(version)
+        if entry is None:
+            logger.warning(f"Checkpoint version {version} not found in {self.manifest_path}")
+            return None
+        snapshots = {}
+        for name, path in entry["paths"].items():
+            with open(path, "rb") as f:
+                snapshots[name] = pickle.load(f)
+        return {"version": version, "episode": entry["episode"], "metrics": entry["metrics"], "snapshots": snapshots}
+
+    def load_latest(self):
+        latest = self.manifest.get("latest")
+        return self.load(latest) if latest is not None else None
+
+    def load_best(self):
+        best = self.manifest.get("best")
+        return self.load(best) if best is not None else None
+
+    def restore(self, agents, which="latest"):
+        # Restores `agents` in place from the best or latest checkpoint; returns the loaded entry
+        checkpoint = self.load_best() if which == "best" else self.load_latest()
+        if checkpoint is None:
+            return None
+        for name, agent in agents.items():
+            if name in checkpoint["snapshots"]:
+                restored = restore_agent(agent, checkpoint["snapshots"][name])
+                if restored is not agent:
+                    agents[name] = restored
+        logger.info(f"Restored {', '.join(checkpoint['snapshots'])} from checkpoint v{checkpoint['version']:06d}")
+        return checkpoint
@@ -0,0 +1,198 @@
+import json
+import os
+import numpy as np
+from ..utils.config_manager import config
+from ..utils.logger import logger
+
+class SumTree:
+    # Binary tree of priorities stored in one flat array (node i has children 2i and 2i+1, leaves
+    # start at `leaf_offset`). Updates and prefix-sum searches are vectorised over whole batches.
+
+    def __init__(self, capacity):
+        self.leaf_offset = 1 << max(int(capacity - 1).bit_length(), 0)
+        self.tree = np.zeros(2 * self.leaf_offset)
+
+    @property
+    def total(self):
+        return self.tree[1]
+
+    def leaves(self, count):
+        return self.tree[self.leaf_offset:self.leaf_offset + count]
+
+    def update(self, indices, priorities):
+        nodes = np.asarray(indices, dtype=np.int64) + self.leaf_offset
+        self.tree[nodes] = priorities # Duplicate indices: the last write wins, as with a single update
+        # Recomputing a parent from its children is idempotent, so duplicate parents need no dedup
+        nodes = nodes >> 1
+        while nodes[0] >= 1:
+            self.tree[nodes] = self.tree[2 * nodes] + self.tree[2 * nodes + 1]
+            nodes = nodes >> 1
+
+    def rebuild(self, priorities):
+        self.tree[:] = 0.0
+        self.tree[self.leaf_offset:self.leaf_offset + len(priorities)] = priorities
+        level = self.leaf_offset >> 1
+        while level >= 1:
+            nodes = np.arange(level, 2 * level)
+            self.tree[nodes] = self.tree[2 * nodes] + self.tree[2 * nodes + 1]
+            level >>= 1
+
+    def find(self, values):
+        # Leaf index whose cumulative priority range contains each value, descending all at once
+        values = np.array(values, dtype=np.float64)
+        nodes = np.ones(len(values), dtype=np.int64)
+        while nodes[0] < self.leaf_offset:
+            left = 2 * nodes
+            left_sum = self.tree[left]
+            go_right = values > left_sum
+            values -= np.where(go_right, left_sum, 0.0)
+            nodes = left + go_right
+        return nodes - self.leaf_offset
+
+class ReplayBuffer:
+    # Transitions live in preallocated arrays used as a ring: float32 observations, int64 actions,
+    # float32 rewards and bool done flags. With prioritized=True sampling is proportional to
+    # priority ** alpha through a SumTree and returns importance-sampling weights; new transitions
+    # get the current maximum priority so each is sampled at least once with high probability.
+    # With `path` set, the arrays are .npy memmaps in that directory and flush() persists the ring
+    # position, so the buffer survives restarts and can be opened read-only by other processes.
+
+    FIELDS = ("obs", "actions", "rewards", "next_obs", "dones", "priorities")
+
+    def __init__(self, capacity, state_dim, prioritized=False, alpha=0.6, beta=0.4, epsilon=1e-6, path=None, seed=None):
+        self.capacity = int(capacity)
+        self.state_dim = int(state_dim)
+        self.prioritized = prioritized
+        self.alpha = alpha
+        self.beta = beta
+        self.epsilon = epsilon
+        self.path = path
+        self.rng = np.random.default_rng(seed)
+        self.pos = 0
+        self.size = 0
+        self.max_priority = 1.0
+
+        shapes = {
+            "obs": ((self.capacity, self.state_dim), np.float32),
+            "actions": ((self.capacity,), np.int64),
+            "rewards": ((self.capacity,), np.float32),
+            "next_obs": ((self.capacity, self.state_dim), np.float32),
+            "dones": ((self.capacity,), np.bool_),
+            "priorities": ((self.capacity,), np.float64),
+        }
+        if path:
+            os.makedirs(path, exist_ok=True)
+            self._load_meta()
+        for name, (shape, dtype) in shapes.items():
+            setattr(self, name, self._allocate(name, shape, dtype))
+
+        self.tree = SumTree(self.capacity) if prioritized else None
+        if self.tree is not None and self.size:
+            self.tree.rebuild(self.priorities[:self.size] ** self.alpha)
+        logger.info(f"ReplayBuffer initialized with capacity {self.capacity} ({self.size} stored, prioritized={prioritized}).")
+
+    @classmethod
+    def from_config(cls, state_dim=None, seed=None):
+        return cls(config.get("rl_agent.replay_buffer.capacity", 100000),
+                   state_dim or config.get("rl_agent.state_space_dim"),
+                   prioritized=config.get("rl_agent.replay_buffer.prioritized", False),
+                   alpha=config.get("rl_agent.replay_buffer.alpha", 0.6),
+                   beta=config.get("rl_agent.replay_buffer.beta", 0.4),
+                   path=config.get("rl_agent.replay_buffer.path"),
+                   seed=seed)
+
+    def _allocate(self, name, shape, dtype):
+        if not self.path:
+            return np.zeros(shape, dtype=dtype)
+        file_path = os.path.join(self.path, f"{name}.npy")
+        if os.path.exists(file_path):
+            array = np.lib.format.open_memmap(file_path, mode="r+")
+            if array.shape == shape and array.dtype == dtype:
+                return array
+            logger.warning(f"Replay buffer file {file_path} has shape {array.shape}, expected {shape}; recreating.")
+            del array
+            self.pos = self.size = 0
+        return np.lib.format.open_memmap(file_path, mode="w+", dtype=dtype, shape=shape)
+
+    def _meta_path(self):
+        return os.path.join(self.path, "meta.json")
+
+    def _load_meta(self):
+        if os.path.exists(self._meta_path()):
+            with open(self._meta_path()) as f:
+                meta = json.load(f)
+            if meta.get("capacity") == self.capacity and meta.get("state_dim") == self.state_dim:
+                self.pos, self.size, self.max_priority = meta["pos"], meta["size"], meta["max_priority"]
+
+    def flush(self):
+        if not self.path:
+            return
+        for name in self.FIELDS:
+            getattr(self, name).flush()
+        tmp_path = f"{self._meta_path()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"capacity": self.capacity, "state_dim": self.state_dim, "pos": self.pos,
+                       "size": self.size, "max_priority": self.max_priority}, f)
+        os.replace(tmp_path, self._meta_path())
+
+    def __len__(self):
+        return self.size
+
+    def add(self, obs, action, reward, next_obs, done):
+        self.add_batch(np.asarray(obs)[None], [action], [reward], np.asarray(next_obs)[None], [done])
+
+    def add_batch(self, obs, actions, rewards, next_obs, dones):
+        n = len(actions)
+        if n == 0:
+            return
+        if n > self.capacity:
+            # Only the newest `capacity` transitions would survive the wrap anyway
+            obs, actions, rewards, next_obs, dones = (x[-self.capacity:] for x in (obs, actions, rewards, next_obs, dones))
+            n = self.capacity
+        indices = (self.pos + np.arange(n)) % self.capacity
+        self.obs[indices] = obs
+        self.actions[indices] = actions
+        self.rewards[indices] = rewards
+        self.next_obs[indices] = next_obs
+        self.dones[indices] = dones
+        self.priorities[indices] = self.max_priority
+        if self.tree is not None:
+            self.tree.update(indices, np.full(n, self.max_priority ** self.alpha))
+        self.pos = int((self.pos + n) % self.capacity)
+        self.size = min(self.size + n, self.capacity)
+
+    # Names used by the batched agent interface in vectorized_environment
+    store_experience = add
+    store_experiences = add_batch
+
+    def sample(self, batch_size, beta=None):
+        if self.size == 0:
+            return None
+        if self.tree is None:
+            indices = self.rng.integers(0, self.size, batch_size)
+            weights = np.ones(batch_size, dtype=np.float32)
+        else:
+            # Stratified: one uniform draw from each of batch_size equal slices of the total priority
+            total = self.tree.total
+            values = (np.arange(batch_size) + self.rng.random(batch_size)) * (total / batch_size)
+            indices = np.minimum(self.tree.find(np.minimum(values, np.nextafter(total, 0))), self.size - 1)
+            probabilities = self.tree.leaves(self.size)[indices] / total
+            weights = (self.size * probabilities) ** -(self.beta if beta is None else beta)
+            weights = (weights / weights.max()).astype(np.float32)
+        return {
+            "obs": self.obs[indices],
+            "actions": self.actions[indices],
+            "rewards": self.rewards[indices],
+            "next_obs": self.next_obs[indices],
+            "dones": self.dones[indices],
+            "indices": indices,
+            "weights": weights,
+        }
+
+    def update_priorities(self, indices, td_errors):
+        if self.tree is None:
+            return
+        priorities = np.abs(np.asarray(td_errors, dtype=np.float64)) + self.epsilon
+        self.priorities[indices] = priorities
+        self.tree.update(indices, priorities ** self.alpha)
+        self.max_priority = max(self.max_priority, float(priorities.max()))
@@ -0,0 +1,119 @@
+import numpy as np
+from ..utils.config_manager import config
+from ..utils.logger import logger
+
+def default_action_positions(action_dim, max_lots=5):
+    # Without an action catalogue, action i is a target exposure in lots spread evenly over
+    # [-max_lots, max_lots]; action 0 is the largest short and the middle index is flat
+    return np.rint(np.linspace(-max_lots, max_lots, action_dim))
+
+class VectorizedTradingEnvironment:
+    # K independent episodes advanced in lock-step over the precomputed state array. Each episode
+    # starts at its own bar (a different date of the same series) and every step is a handful of
+    # NumPy operations over K, so the per-transition Python cost is paid once per batch.
+    #
+    # An action index maps to a target position in lots through `action_positions`. On each step
+    # the position moves to the target, transaction costs are charged on the traded notional and the
+    # held position earns the next bar's price change. Episodes end after `episode_length` bars, at
+    # the end of the data, or when equity is exhausted; finished episodes stay frozen (zero reward,
+    # active=False) until reset() starts the next batch.
+    #
+    # It is opt-in (rl_agent.num_envs > 1): there is no paper-trading engine or risk calculator in
+    # the loop, and the reward is mark-to-market P&L only, unlike TradingEnvironment's.
+
+    def __init__(self, market_data_df, state_space_df, num_envs=8, episode_length=None, action_positions=None,
+                 lot_size=25, initial_capital=1000000, transaction_cost_rate=0.0005, seed=None):
+        self.states = np.ascontiguousarray(state_space_df.to_numpy(dtype=np.float32))
+        self.prices = market_data_df["close"].to_numpy(dtype=np.float64)
+        if len(self.prices) != len(self.states):
+            raise ValueError("market_data_df and state_space_df must have the same number of rows.")
+        self.num_envs = num_envs
+        self.n_bars = len(self.prices)
+        self.episode_length = min(episode_length or self.n_bars - 1, self.n_bars - 1)
+        self.action_positions = np.asarray(action_positions if action_positions is not None
+                                           else default_action_positions(3, 1), dtype=np.float64)
+        self.lot_size = lot_size
+        self.initial_capital = float(initial_capital)
+        self.transaction_cost_rate = transaction_cost_rate
+        self.rng = np.random.default_rng(seed)
+
+        self.start = np.zeros(num_envs, dtype=np.int64)
+        self.t = np.zeros(num_envs, dtype=np.int64)
+        self.end = np.zeros(num_envs, dtype=np.int64)
+        self.position = np.zeros(num_envs)
+        self.equity = np.full(num_envs, self.initial_capital)
+        self.active = np.zeros(num_envs, dtype=bool)
+        logger.info(f"VectorizedTradingEnvironment initialized with {num_envs} envs over {self.n_bars} bars.")
+
+    @classmethod
+    def from_config(cls, market_data_df, state_space_df, action_positions=None, seed=None):
+        if action_positions is None:
+            action_positions = default_action_positions(config.get("rl_agent.action_space_dim", 3),
+                                                        config.get("rl_agent.max_lots", 5))
+        return cls(market_data_df, state_space_df,
+                   num_envs=config.get("rl_agent.num_envs", 8),
+                   episode_length=config.get("rl_agent.episode_length"),
+                   action_positions=action_positions,
+                   lot_size=config.get("trading.lot_sizes.NIFTY", 25),
+                   initial_capital=config.get("trading.initial_capital", 1000000),
+                   transaction_cost_rate=config.get("rl_agent.transaction_cost_rate", 0.0005),
+                   seed=seed)
+
+    @property
+    def action_dim(self):
+        return len(self.action_positions)
+
+    def reset(self, start_indices=None):
+        if start_indices is None:
+            start_indices = self.rng.integers(0, self.n_bars - self.episode_length, self.num_envs)
+        self.start = np.asarray(start_indices, dtype=np.int64)
+        self.t = self.start.copy()
+        self.end = np.minimum(self.start + self.episode_length, self.n_bars - 1)
+        self.position[:] = 0.0
+        self.equity[:] = self.initial_capital
+        self.active[:] = True
+        return self.states[self.t]
+
+    def step(self, actions):
+        actions = np.asarray(actions, dtype=np.int64)
+        active = self.active
+        price = self.prices[self.t]
+        next_t = np.where(active, self.t + 1, self.t)
+        next_price = self.prices[next_t]
+
+        target = np.where(active, self.action_positions[actions], self.position)
+        traded_units = np.abs(target - self.position) * self.lot_size
+        costs = traded_units * price * self.transaction_cost_rate
+        pnl = np.where(active, target * self.lot_size * (next_price - price) - costs, 0.0)
+
+        self.position = target
+        self.equity = self.equity + pnl
+        self.t = next_t
+        done = active & ((next_t >= self.end) | (self.equity <= 0))
+        self.active = active & ~done
+
+        rewards = pnl / self.initial_capital
+        info = {"pnl": pnl, "costs": np.where(active, costs, 0.0), "equity": self.equity.copy(),
+                "position": self.position.copy(), "active": active}
+        return self.states[self.t], rewards, done | ~active, info
+
+    def all_done(self):
+        return not self.active.any()
+
+# Batched agent interface. Agents that implement select_actions/store_experiences get whole
+# batches; older single-transition agents are driven row by row through the same call.
+
+def batch_select_actions(agent, obs):
+    if hasattr(agent, "select_actions"):
+        return np.asarray(agent.select_actions(obs), dtype=np.int64)
+    return np.fromiter((agent.select_action(o) for o in obs), dtype=np.int64, count=len(obs))
+
+def batch_store_experiences(agent, obs, actions, rewards, next_obs, dones, mask=None):
+    # mask selects the transitions that actually happened (envs still active before the step)
+    if mask is not None:
+        obs, actions, rewards, next_obs, dones = obs[mask], actions[mask], rewards[mask], next_obs[mask], dones[mask]
+    if hasattr(agent, "store_experiences"):
+        agent.store_experiences(obs, actions, rewards, next_obs, dones)
+        return
+    for transition in zip(obs, actions, rewards, next_obs, dones):
+        agent.store_experience(*transition)
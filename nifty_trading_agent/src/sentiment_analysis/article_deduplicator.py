@@ -0,0 +1,176 @@
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+import numpy as np
+from ..utils.config_manager import config
+from ..utils.logger import logger
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+_BIT_SHIFTS = np.arange(64, dtype=np.uint64)
+NUM_BANDS = 4
+BAND_BITS = 16
+BAND_MASK = (1 << BAND_BITS) - 1
+
+def _feature_hash(feature):
+    return int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "little")
+
+def simhash(text):
+    # 64-bit SimHash over word unigrams and bigrams; near-identical texts differ in only a few bits
+    tokens = _TOKEN.findall((text or "").lower())
+    features = tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+    if not features:
+        return 0
+    hashes = np.array([_feature_hash(f) for f in features], dtype=np.uint64)
+    bits = ((hashes[:, None] >> _BIT_SHIFTS) & np.uint64(1)).astype(np.int32)
+    votes = 2 * bits.sum(axis=0) - len(features)
+    return int(np.packbits((votes > 0)[::-1].astype(np.uint8)).view(">u8")[0])
+
+def hamming_distance(a, b):
+    return bin(a ^ b).count("1")
+
+def _to_signed(fingerprint):
+    # SQLite integers are signed 64-bit
+    return fingerprint - (1 << 64) if fingerprint >= (1 << 63) else fingerprint
+
+def _bands(fingerprint):
+    return [(fingerprint >> (i * BAND_BITS)) & BAND_MASK for i in range(NUM_BANDS)]
+
+class ArticleDeduplicator:
+    # Persistent near-duplicate index for news articles. Each article's SimHash is split into
+    # four 16-bit bands; two fingerprints within 3 bits of each other must agree exactly on at
+    # least one band, so a lookup only compares against the handful of articles sharing a band.
+    # Matches join the earlier article's cluster. Entries older than max_age_hours are pruned.
+
+    def __init__(self, path=":memory:", hamming_threshold=3, max_age_hours=72):
+        if hamming_threshold >= NUM_BANDS:
+            logger.warning(f"Hamming threshold {hamming_threshold} exceeds what {NUM_BANDS} bands guarantee; some near-duplicates may be missed.")
+        self.path = path
+        self.hamming_threshold = hamming_threshold
+        self.max_age_seconds = max_age_hours * 3600 if max_age_hours else None
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS article_fingerprints ("
+            "id INTEGER PRIMARY KEY, fingerprint INTEGER NOT NULL, cluster_id INTEGER NOT NULL, "
+            "source TEXT, title TEXT, first_seen REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_article_fingerprints_first_seen ON article_fingerprints (first_seen)")
+        self._conn.commit()
+        self._lock = threading.Lock()
+        self._entries = {} # id -> (fingerprint, cluster_id, first_seen)
+        self._band_tables = [{} for _ in range(NUM_BANDS)] # band value -> set of ids
+        self.duplicates_found = 0
+        self._load()
+        logger.info(f"ArticleDeduplicator initialized with {len(self._entries)} fingerprints.")
+
+    @classmethod
+    def from_config(cls):
+        if not config.get("news.dedup.enabled", False):
+            return None
+        try:
+            return cls(config.get("news.dedup.path", ":memory:"),
+                       hamming_threshold=config.get("news.dedup.hamming_threshold", 3),
+                       max_age_hours=config.get("news.dedup.max_age_hours", 72))
+        except Exception as e:
+            logger.warning(f"Could not open article fingerprint index: {e}. Near-duplicate filtering is disabled.")
+            return None
+
+    def _load(self):
+        if self.max_age_seconds is not None:
+            self._conn.execute("DELETE FROM article_fingerprints WHERE first_seen < ?", (time.time() - self.max_age_seconds,))
+            self._conn.commit()
+        for entry_id, fingerprint, cluster_id, first_seen in self._conn.execute(
+                "SELECT id, fingerprint, cluster_id, first_seen FROM article_fingerprints"):
+            self._index(entry_id, fingerprint & ((1 << 64) - 1), cluster_id, first_seen)
+
+    def _index(self, entry_id, fingerprint, cluster_id, first_seen):
+        self._entries[entry_id] = (fingerprint, cluster_id, first_seen)
+        for table, band in zip(self._band_tables, _bands(fingerprint)):
+            table.setdefault(band, set()).add(entry_id)
+
+    def _unindex(self, entry_id):
+        fingerprint, _, _ = self._entries.pop(entry_id)
+        for table, band in zip(self._band_tables, _bands(fingerprint)):
+            ids = table.get(band)
+            if ids is not None:
+                ids.discard(entry_id)
+                if not ids:
+                    del table[band]
+
+    def find(self, fingerprint):
+        # Returns the cluster id of the closest indexed article within the threshold, or None
+        best = None
+        with self._lock:
+            for table, band in zip(self._band_tables, _bands(fingerprint)):
+                for entry_id in table.get(band, ()):
+                    candidate, cluster_id, _ = self._entries[entry_id]
+                    distance = hamming_distance(fingerprint, candidate)
+                    if distance <= self.hamming_threshold and (best is None or distance < best[0]):
+                        best = (distance, cluster_id)
+        return best[1] if best else None
+
+    def add(self, fingerprint, source=None, title=None, cluster_id=None, now=None):
+        now = now if now is not None else time.time()
+        with self._lock:
+            cursor = self._conn.execute(
+                "INSERT INTO article_fingerprints (fingerprint, cluster_id, source, title, first_seen) VALUES (?, ?, ?, ?, ?)",
+                (_to_signed(fingerprint), cluster_id if cluster_id is not None else -1, source, title, now)
+            )
+            entry_id = cursor.lastrowid
+            if cluster_id is None:
+                # A new story starts its own cluster
+                cluster_id = entry_id
+                self._conn.execute("UPDATE article_fingerprints SET cluster_id = ? WHERE id = ?", (cluster_id, entry_id))
+            self._index(entry_id, fingerprint, cluster_id, now)
+        return cluster_id
+
+    def filter_articles(self, articles):
+        # Drops articles that repeat a story indexed in an earlier run. Copies of the same story
+        # within this batch are merged into the first one, which lists the other outlets under
+        # "syndicated_sources".
+        self.prune()
+        unique = []
+        batch_clusters = {} # cluster_id -> article kept from this batch
+        for article in articles:
+            text = " ".join(filter(None, [article.get("title"), article.get("description")]))
+            fingerprint = simhash(text)
+            cluster_id = self.find(fingerprint)
+            if cluster_id is None:
+                cluster_id = self.add(fingerprint, article.get("source"), article.get("title"))
+                article["cluster_id"] = cluster_id
+                article["syndicated_sources"] = []
+                batch_clusters[cluster_id] = article
+                unique.append(article)
+                continue
+            self.duplicates_found += 1
+            kept = batch_clusters.get(cluster_id)
+            if kept is not None and article.get("source") != kept.get("source") and article.get("source") not in kept["syndicated_sources"]:
+                kept["syndicated_sources"].append(article.get("source"))
+        with self._lock:
+            self._conn.commit()
+        logger.info(f"ArticleDeduplicator kept {len(unique)} of {len(articles)} articles.")
+        return unique
+
+    def prune(self, now=None):
+        if self.max_age_seconds is None:
+            return 0
+        cutoff = (now if now is not None else time.time()) - self.max_age_seconds
+        with self._lock:
+            stale = [entry_id for entry_id, (_, _, first_seen) in self._entries.items() if first_seen < cutoff]
+            for entry_id in stale:
+                self._unindex(entry_id)
+            self._conn.execute("DELETE FROM article_fingerprints WHERE first_seen < ?", (cutoff,))
+            self._conn.commit()
+        return len(stale)
+
+    def size(self):
+        return len(self._entries)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -1,13 +1,40 @@
 from newsapi import NewsApiClient
 import requests
-from bs4 import BeautifulSoup
+from requests.adapters import HTTPAdapter
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from lxml import etree
 from datetime import datetime, timedelta
 from ..utils.config_manager import config
 from ..utils.logger import logger
 
+RSS_FIELDS = ("title", "link", "pubDate", "description")
+NEWSAPI_URL = "https://newsapi.org/"
+
+class TimeoutHTTPAdapter(HTTPAdapter):
+    # Applies a fixed timeout to every request it sends, for clients (like NewsApiClient) that
+    # issue their own requests on our session and hard-code or omit the timeout
+    def __init__(self, timeout, **kwargs):
+        self.timeout = timeout
+        super().__init__(**kwargs)
+
+    def send(self, request, **kwargs):
+        kwargs["timeout"] = self.timeout
+        return super().send(request, **kwargs)
+
 class NewsCollector:
-    def __init__(self):
-        self.newsapi_client = NewsApiClient(api_key=config.get("news_api.api_key"))
+    def __init__(self, deduplicator=None):
+        # One pooled session for every source so connections are reused across news cycles
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=8, pool_maxsize=8)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.default_timeout = config.get("news.default_timeout", 10)
+        self.timeouts = config.get("news.timeouts", {}) or {}
+        # Longest prefix wins, so NewsAPI requests get its configured timeout
+        self.session.mount(NEWSAPI_URL, TimeoutHTTPAdapter(self._timeout("NewsAPI"), pool_connections=1, pool_maxsize=2))
+
+        self.newsapi_client = NewsApiClient(api_key=config.get("news_api.api_key"), session=self.session)
         self.alpha_vantage_api_key = config.get("alphavantage.api_key")
         self.rss_feeds = {
             "Economic Times": "https://economictimes.indiatimes.com/rssfeeds/1221656.cms",
@@ -15,103 +42,141 @@ class NewsCollector:
             "NDTV Profit": "https://feeds.feedburner.com/NDTVProfit-Latest",
             "Business Standard": "https://www.business-standard.com/rss/home_page_rss.xml"
         }
+        # url -> {"etag", "last_modified", "articles"} from the last successful fetch
+        self._feed_validators = {}
+        self.deduplicator = deduplicator # Optional ArticleDeduplicator that drops syndicated copies across runs
         logger.info("NewsCollector initialized.")
 
-    def get_newsapi_articles(self, query, from_param, to_param, language=\'en\'):
+    def _timeout(self, source):
+        return self.timeouts.get(source, self.default_timeout)
+
+    def get_newsapi_articles(self, query, from_param, to_param, language='en'):
         try:
-            articles = self.newsapi_client.get_everything(q=query, from_param=from_param, to_param=to_param, language=language, sort_by=\'relevancy\')
-            logger.info(f"Fetched {len(articles.get(\'articles\', []))} articles from NewsAPI for query: {query}")
-            return articles.get(\'articles\', [])
+            articles = self.newsapi_client.get_everything(q=query, from_param=from_param, to_param=to_param, language=language, sort_by='relevancy')
+            logger.info(f"Fetched {len(articles.get('articles', []))} articles from NewsAPI for query: {query}")
+            return articles.get('articles', [])
         except Exception as e:
             logger.error(f"Error fetching NewsAPI articles: {e}")
             return []
 
-    def get_alpha_vantage_news(self, tickers=\'NIFTY\'):
+    def get_alpha_vantage_news(self, tickers='NIFTY'):
         try:
-            url = f"https://www.alphavantage.co/query?function=NEWS_SENTIMENT&tickers={tickers}&apikey={self.alpha_vantage_api_key}"
-            r = requests.get(url)
+            params = {"function": "NEWS_SENTIMENT", "tickers": tickers, "apikey": self.alpha_vantage_api_key}
+            r = self.session.get("https://www.alphavantage.co/query", params=params, timeout=self._timeout("Alpha Vantage"))
             data = r.json()
-            logger.info(f"Fetched {len(data.get(\'feed\', []))} articles from Alpha Vantage for tickers: {tickers}")
-            return data.get(\'feed\', [])
+            logger.info(f"Fetched {len(data.get('feed', []))} articles from Alpha Vantage for tickers: {tickers}")
+            return data.get('feed', [])
         except Exception as e:
             logger.error(f"Error fetching Alpha Vantage news: {e}")
             return []
 
+    def parse_rss_feed(self, content, feed_name):
+        # Streams <item> elements (in any namespace, so RSS 1.0/RDF feeds match too) with lxml.iterparse, reading each item's children in one pass
+        # and freeing parsed elements as it goes.
+        articles = []
+        for _, item in etree.iterparse(BytesIO(content), events=("end",), tag="{*}item", recover=True):
+            fields = {}
+            for child in item:
+                if not isinstance(child.tag, str):
+                    continue
+                name = etree.QName(child).localname
+                if name in RSS_FIELDS and name not in fields:
+                    fields[name] = (child.text or "").strip()
+            articles.append({
+                "source": feed_name,
+                "title": fields.get("title", "No Title"),
+                "link": fields.get("link", "No Link"),
+                "publishedAt": fields.get("pubDate", str(datetime.now())),
+                "description": fields.get("description", "No Description")
+            })
+            item.clear()
+            while item.getprevious() is not None:
+                del item.getparent()[0]
+        return articles
+
     def get_rss_feed_articles(self, feed_name, url):
         articles = []
+        cached = self._feed_validators.get(url)
+        headers = {}
+        if cached:
+            # Conditional GET: an unchanged feed answers 304 with no body
+            if cached.get("etag"):
+                headers["If-None-Match"] = cached["etag"]
+            if cached.get("last_modified"):
+                headers["If-Modified-Since"] = cached["last_modified"]
         try:
-            response = requests.get(url)
-            soup = BeautifulSoup(response.content, \'xml\')
-            items = soup.find_all(\'item\')
-            for item in items:
-                title = item.find(\'title\').text if item.find(\'title\') else \'No Title\'
-                link = item.find(\'link\').text if item.find(\'link\') else \'No Link\'
-                pub_date = item.find(\'pubDate\').text if item.find(\'pubDate\') else str(datetime.now())
-                description = item.find(\'description\').text if item.find(\'description\') else \'No Description\'
-                articles.append({
-                    "source": feed_name,
-                    "title": title,
-                    "link": link,
-                    "publishedAt": pub_date,
-                    "description": description
-                })
+            response = self.session.get(url, headers=headers, timeout=self._timeout(feed_name))
+            if response.status_code == 304 and cached:
+                logger.info(f"RSS feed {feed_name} not modified; reusing {len(cached['articles'])} articles.")
+                return list(cached["articles"])
+            response.raise_for_status()
+            articles = self.parse_rss_feed(response.content, feed_name)
+            self._feed_validators[url] = {
+                "etag": response.headers.get("ETag"),
+                "last_modified": response.headers.get("Last-Modified"),
+                "articles": articles
+            }
             logger.info(f"Fetched {len(articles)} articles from RSS feed: {feed_name}")
         except Exception as e:
             logger.error(f"Error fetching RSS feed {feed_name}: {e}")
         return articles
 
-    def collect_all_news(self, query=\'Nifty OR Bank Nifty\', days_ago=1):
+    def collect_all_news(self, query='Nifty OR Bank Nifty', days_ago=1):
         all_articles = []
-        to_date = datetime.now().strftime(\'%Y-%m-%d\')
-        from_date = (datetime.now() - timedelta(days=days_ago)).strftime(\'%Y-%m-%d\')
-
-        # NewsAPI
-        newsapi_arts = self.get_newsapi_articles(query, from_date, to_date)
-        for art in newsapi_arts:
-            all_articles.append({
-                "source": art.get(\'source\', {}).get(\'name\', \'NewsAPI\'),
-                "title": art.get(\'title\'),
-                "description": art.get(\'description\'),
-                "content": art.get(\'content\'),
-                "publishedAt": art.get(\'publishedAt\'),
-                "url": art.get(\'url\')
-            })
-        
-        # Alpha Vantage News
-        alpha_vantage_feed = self.get_alpha_vantage_news(tickers=\'NIFTY,BANKNIFTY\')
-        for item in alpha_vantage_feed:
-            all_articles.append({
-                "source": item.get(\'source\'),
-                "title": item.get(\'title\'),
-                "description": item.get(\'summary\'),
-                "content": item.get(\'content\'), # Alpha Vantage uses summary, not content
-                "publishedAt": datetime.fromtimestamp(int(item.get(\'time_published\'))).isoformat(),
-                "url": item.get(\'url\')
-            })
+        to_date = datetime.now().strftime('%Y-%m-%d')
+        from_date = (datetime.now() - timedelta(days=days_ago)).strftime('%Y-%m-%d')
+
+        # All sources are fetched concurrently, so a cycle takes as long as the slowest source
+        with ThreadPoolExecutor(max_workers=2 + len(self.rss_feeds), thread_name_prefix="news") as executor:
+            newsapi_future = executor.submit(self.get_newsapi_articles, query, from_date, to_date)
+            alpha_vantage_future = executor.submit(self.get_alpha_vantage_news, tickers='NIFTY,BANKNIFTY')
+            rss_futures = [executor.submit(self.get_rss_feed_articles, feed_name, feed_url)
+                           for feed_name, feed_url in self.rss_feeds.items()]
+
+            # NewsAPI
+            for art in newsapi_future.result():
+                all_articles.append({
+                    "source": art.get('source', {}).get('name', 'NewsAPI'),
+                    "title": art.get('title'),
+                    "description": art.get('description'),
+                    "content": art.get('content'),
+                    "publishedAt": art.get('publishedAt'),
+                    "url": art.get('url')
+                })
 
-        # RSS Feeds
-        for feed_name, feed_url in self.rss_feeds.items():
-            rss_arts = self.get_rss_feed_articles(feed_name, feed_url)
-            for art in rss_arts:
+            # Alpha Vantage News
+            for item in alpha_vantage_future.result():
                 all_articles.append({
-                    "source": art.get(\'source\'),
-                    "title": art.get(\'title\'),
-                    "description": art.get(\'description\'),
-                    "content": art.get(\'description\'), # RSS often uses description as content
-                    "publishedAt": art.get(\'publishedAt\'),
-                    "url": art.get(\'link\')
+                    "source": item.get('source'),
+                    "title": item.get('title'),
+                    "description": item.get('summary'),
+                    "content": item.get('content'), # Alpha Vantage uses summary, not content
+                    "publishedAt": datetime.fromtimestamp(int(item.get('time_published'))).isoformat(),
+                    "url": item.get('url')
                 })
-        
+
+            # RSS Feeds
+            for rss_future in rss_futures:
+                for art in rss_future.result():
+                    all_articles.append({
+                        "source": art.get('source'),
+                        "title": art.get('title'),
+                        "description": art.get('description'),
+                        "content": art.get('description'), # RSS often uses description as content
+                        "publishedAt": art.get('publishedAt'),
+                        "url": art.get('link')
+                    })
+
         # Deduplicate based on title and source
         unique_articles = {}
         for article in all_articles:
-            key = (article.get(\'title\'), article.get(\'source\'))
+            key = (article.get('title'), article.get('source'))
             if key not in unique_articles:
                 unique_articles[key] = article
-        
-        logger.info(f"Collected {len(unique_articles)} unique news articles.")
-        return list(unique_articles.values())
-
-
 
+        articles = list(unique_articles.values())
+        if self.deduplicator is not None:
+            articles = self.deduplicator.filter_articles(articles)
 
+        logger.info(f"Collected {len(articles)} unique news articles.")
+        return articles
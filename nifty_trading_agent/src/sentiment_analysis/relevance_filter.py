@@ -0,0 +1,94 @@
+import re
+from ..utils.config_manager import config
+from ..utils.logger import logger
+
+# Terms that make a text relevant to NIFTY / BANKNIFTY. Matching is case-insensitive on
+# whole words, so short tickers such as "sbi" or "tcs" do not fire inside other words.
+DEFAULT_KEYWORDS = {
+    "index": [
+        "nifty", "nifty 50", "nifty50", "bank nifty", "banknifty", "nifty bank", "finnifty", "fin nifty",
+        "midcap nifty", "sensex", "india vix", "sgx nifty", "gift nifty", "nse", "bse", "dalal street"
+    ],
+    "constituent": [
+        "hdfc bank", "icici bank", "state bank of india", "sbi", "kotak mahindra bank", "kotak bank", "axis bank",
+        "indusind bank", "bank of baroda", "punjab national bank", "pnb", "au small finance bank", "federal bank",
+        "idfc first bank", "bandhan bank", "reliance industries", "infosys", "tcs", "tata consultancy services",
+        "itc", "larsen & toubro", "larsen and toubro", "bharti airtel", "hindustan unilever", "bajaj finance",
+        "maruti suzuki", "tata motors", "tata steel", "hcl technologies", "wipro", "adani enterprises",
+        "adani ports", "sun pharma", "asian paints", "ultratech cement", "mahindra & mahindra", "ntpc",
+        "power grid", "ongc", "coal india", "jsw steel", "titan", "nestle india"
+    ],
+    "ticker": [
+        "hdfcbank", "icicibank", "sbin", "kotakbank", "axisbank", "indusindbk", "bankbaroda", "aubank",
+        "federalbnk", "idfcfirstb", "bandhanbnk", "reliance", "infy", "hindunilvr", "bajfinance", "maruti",
+        "tatamotors", "tatasteel", "hcltech", "bhartiartl", "adanient", "adaniports", "sunpharma",
+        "asianpaint", "ultracemco", "jswsteel", "powergrid"
+    ],
+    "macro": [
+        "rbi", "reserve bank", "repo rate", "reverse repo", "monetary policy", "mpc", "crr", "slr",
+        "inflation", "cpi", "wpi", "gdp", "iip", "fiscal deficit", "current account deficit", "union budget",
+        "fii", "fiis", "fpi", "fpis", "dii", "diis", "rupee", "crude oil", "brent", "us fed", "federal reserve",
+        "bond yield", "bond yields", "g-sec", "liquidity", "npa", "npas", "credit growth", "deposit growth",
+        "sebi", "f&o", "options expiry", "weekly expiry"
+    ],
+}
+
+def _trie_pattern(words):
+    # Compiles a word list into one regex shaped like a character trie, so alternatives sharing
+    # a prefix are tested together instead of one after another.
+    trie = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[""] = True
+
+    def build(node):
+        end = "" in node
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char != ""]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        if end:
+            return f"(?:{body})?"
+        return body
+
+    return build(trie)
+
+class RelevanceFilter:
+    # Cheap keyword prefilter that runs before model scoring. All keywords are compiled into a
+    # single trie-shaped regex, so each text is scanned once regardless of the keyword count.
+
+    def __init__(self, keywords=None, min_matches=1):
+        keywords = keywords if keywords is not None else DEFAULT_KEYWORDS
+        if isinstance(keywords, dict):
+            keywords = [word for words in keywords.values() for word in words]
+        self.keywords = sorted({" ".join(word.lower().split()) for word in keywords if word and word.strip()})
+        self.min_matches = min_matches
+        # Spaces inside keywords match any run of whitespace; the lookarounds keep matches on word boundaries
+        pattern = _trie_pattern(self.keywords).replace(r"\ ", r"\s+")
+        self._regex = re.compile(rf"(?<![a-z0-9])(?:{pattern})(?![a-z0-9])", re.IGNORECASE)
+        logger.info(f"RelevanceFilter initialized with {len(self.keywords)} keywords.")
+
+    @classmethod
+    def from_config(cls):
+        if not config.get("sentiment.relevance_filter.enabled", False):
+            return None
+        keywords = [word for words in DEFAULT_KEYWORDS.values() for word in words]
+        keywords += config.get("sentiment.relevance_filter.extra_keywords", []) or []
+        return cls(keywords, min_matches=config.get("sentiment.relevance_filter.min_matches", 1))
+
+    def match(self, text):
+        # Distinct keywords found in the text, in order of first appearance
+        found = {}
+        for m in self._regex.finditer(text or ""):
+            found.setdefault(" ".join(m.group(0).lower().split()), None)
+        return list(found)
+
+    def is_relevant(self, text):
+        return len(self.match(text)) >= self.min_matches
+
+    def filter_texts(self, texts):
+        # Returns (relevant flags, matched keywords) for each text
+        matches = [self.match(text) for text in texts]
+        return [len(m) >= self.min_matches for m in matches], matches
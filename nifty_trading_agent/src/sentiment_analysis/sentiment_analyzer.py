@@ -1,52 +1,135 @@
+import time
 from nltk.sentiment.vader import SentimentIntensityAnalyzer
 from textblob import TextBlob
 from transformers import pipeline
+import torch
 import pandas as pd
+from ..utils.config_manager import config
 from ..utils.logger import logger
 
+FINBERT_MODEL = "ProsusAI/finbert"
+QUANTIZATION_MODES = ["none", "dynamic_int8"]
+
+def quantize_dynamic_int8(model):
+    # Linear layers hold nearly all of BERT's weights and FLOPs; dynamic int8 quantisation
+    # stores them as int8 and quantises activations on the fly, which needs no calibration data.
+    return torch.ao.quantization.quantize_dynamic(model.eval(), {torch.nn.Linear}, dtype=torch.qint8)
+
 class SentimentAnalyzer:
-    def __init__(self):
+    def __init__(self, cache=None, quantization=None, relevance_filter=None):
         self.vader = SentimentIntensityAnalyzer()
+        self.cache = cache # Optional SentimentCache consulted before any model runs
+        self.relevance_filter = relevance_filter # Optional RelevanceFilter that drops off-topic texts before scoring
+        self.quantization = quantization or config.get("sentiment.finbert_quantization", "none")
+        if self.quantization not in QUANTIZATION_MODES:
+            raise ValueError(f"Unsupported FinBERT quantization mode: {self.quantization}")
+        self.batch_size = config.get("sentiment.batch_size", 32)
+        self.max_length = config.get("sentiment.max_length", 512)
+        num_threads = config.get("sentiment.num_threads", 0)
+        if num_threads:
+            torch.set_num_threads(num_threads)
+        self.last_batch_throughput = None # texts/sec of the most recent analyze_batch call
         # Initialize FinBERT (or similar pre-trained model for financial sentiment)
         # This requires downloading the model, which can be large.
         # Ensure you have internet access and sufficient memory.
         try:
-            self.finbert = pipeline("sentiment-analysis", model="ProsusAI/finbert")
-            logger.info("FinBERT model loaded successfully.")
+            self.finbert = pipeline("sentiment-analysis", model=FINBERT_MODEL)
         except Exception as e:
             self.finbert = None
             logger.warning(f"Could not load FinBERT model: {e}. Financial sentiment analysis will be limited.")
+        if self.finbert is not None and self.quantization == "dynamic_int8":
+            try:
+                self.finbert.model = quantize_dynamic_int8(self.finbert.model)
+            except Exception as e:
+                # e.g. no quantized engine on this CPU; the fp32 model still works
+                self.quantization = "none"
+                logger.warning(f"Could not quantize FinBERT to int8: {e}. Using the fp32 model.")
+        if self.finbert is not None:
+            logger.info(f"FinBERT model loaded successfully (quantization: {self.quantization}).")
+        self.model_version = self._model_version()
         logger.info("SentimentAnalyzer initialized.")
 
+    def _model_version(self):
+        # Part of the cache key, so scores from a different model set are never reused
+        finbert = f"{FINBERT_MODEL}@{self.quantization}" if self.finbert else "none"
+        return f"vader+textblob+finbert={finbert}"
+
     def analyze_vader(self, text):
         return self.vader.polarity_scores(text)["compound"]
 
     def analyze_textblob(self, text):
         return TextBlob(text).sentiment.polarity
 
+    def _finbert_result_to_score(self, result):
+        label = result["label"]
+        score = result["score"]
+        if label == "positive":
+            return score
+        elif label == "negative":
+            return -score
+        return 0.0 # Neutral
+
     def analyze_finbert(self, text):
+        return self._finbert_score(text)[0]
+
+    def _finbert_score(self, text):
+        # (score, ok): ok is False when FinBERT is loaded but failed, so the neutral fallback
+        # score is degraded and must not be cached
         if not self.finbert:
-            return 0.0 # Return neutral if FinBERT not loaded
+            return 0.0, True # Return neutral if FinBERT not loaded
         try:
             result = self.finbert(text)
             if result and len(result) > 0:
-                label = result[0]["label"]
-                score = result[0]["score"]
-                if label == "positive":
-                    return score
-                elif label == "negative":
-                    return -score
-                else:
-                    return 0.0 # Neutral
-            return 0.0
+                return self._finbert_result_to_score(result[0]), True
+            return 0.0, False
         except Exception as e:
             logger.error(f"Error analyzing with FinBERT: {e}")
-            return 0.0
+            return 0.0, False
+
+    def _token_length_order(self, texts):
+        # Indices of texts sorted by token count, so each batch pads to a similar length
+        try:
+            encoded = self.finbert.tokenizer(texts, truncation=True, max_length=self.max_length)
+            lengths = [len(ids) for ids in encoded["input_ids"]]
+        except Exception:
+            lengths = []
+        if len(lengths) != len(texts):
+            # Character count is a close enough proxy when the tokenizer is unavailable
+            lengths = [len(text) for text in texts]
+        return sorted(range(len(texts)), key=lambda i: lengths[i])
+
+    def analyze_finbert_batch(self, texts):
+        return self._finbert_batch_scores(texts)[0]
+
+    def _finbert_batch_scores(self, texts):
+        # (scores, ok) with one flag per text; buckets scored before a failure keep their results
+        scores = [0.0] * len(texts)
+        if not self.finbert or not texts:
+            return scores, [True] * len(texts)
+        ok = [False] * len(texts)
+        try:
+            order = self._token_length_order(texts)
+            with torch.inference_mode():
+                for start in range(0, len(order), self.batch_size):
+                    bucket = order[start:start + self.batch_size]
+                    results = self.finbert([texts[i] for i in bucket], batch_size=len(bucket),
+                                           truncation=True, max_length=self.max_length)
+                    for i, result in zip(bucket, results):
+                        scores[i] = self._finbert_result_to_score(result)
+                        ok[i] = True
+        except Exception as e:
+            logger.error(f"Error analyzing batch with FinBERT: {e}")
+        return scores, ok
 
     def get_overall_sentiment(self, text):
+        if self.cache is not None:
+            cached = self.cache.get(text, self.model_version)
+            if cached is not None:
+                return cached
+
         vader_score = self.analyze_vader(text)
         textblob_score = self.analyze_textblob(text)
-        finbert_score = self.analyze_finbert(text)
+        finbert_score, finbert_ok = self._finbert_score(text)
 
         # Simple aggregation: average the scores. Could be weighted.
         scores = [vader_score, textblob_score]
@@ -54,34 +137,104 @@ class SentimentAnalyzer:
             scores.append(finbert_score)
         
         overall_score = sum(scores) / len(scores)
+        # A transient FinBERT failure must not pin the fallback score for the whole cache TTL
+        if self.cache is not None and finbert_ok:
+            self.cache.put(text, overall_score, self.model_version)
         return overall_score
 
-    def analyze_batch(self, texts):
-        results = []
-        for text in texts:
-            results.append(self.get_overall_sentiment(text))
+    def analyze_batch(self, texts, filter_relevance=True):
+        # With a relevance filter configured, off-topic texts are not scored and get None;
+        # filter_relevance=False is for callers that have already filtered
+        texts = list(texts)
+        if not texts:
+            return []
+        if filter_relevance and self.relevance_filter is not None:
+            relevant, _ = self.relevance_filter.filter_texts(texts)
+            kept = [i for i, keep in enumerate(relevant) if keep]
+            results = [None] * len(texts)
+            if kept:
+                for i, score in zip(kept, self.analyze_batch([texts[i] for i in kept], filter_relevance=False)):
+                    results[i] = score
+            logger.debug("Relevance filter kept {} of {} texts.", len(kept), len(texts))
+            return results
+        start_time = time.perf_counter()
+        results = [None] * len(texts)
+        if self.cache is not None:
+            for i, score in self.cache.get_many(texts, self.model_version).items():
+                results[i] = score
+
+        # Identical texts in one batch are scored once
+        pending = {}
+        for i, text in enumerate(texts):
+            if results[i] is None:
+                pending.setdefault(text, []).append(i)
+        to_score = list(pending)
+
+        if to_score:
+            vader_scores = [self.vader.polarity_scores(text)["compound"] for text in to_score]
+            textblob_scores = [TextBlob(text).sentiment.polarity for text in to_score]
+            finbert_scores, finbert_ok = self._finbert_batch_scores(to_score)
+
+            # Same aggregation as get_overall_sentiment
+            if self.finbert:
+                scores = [(v + t + f) / 3 for v, t, f in zip(vader_scores, textblob_scores, finbert_scores)]
+            else:
+                scores = [(v + t) / 2 for v, t in zip(vader_scores, textblob_scores)]
+            for text, score in zip(to_score, scores):
+                for i in pending[text]:
+                    results[i] = score
+            if self.cache is not None:
+                cacheable = [i for i, ok in enumerate(finbert_ok) if ok]
+                if cacheable:
+                    self.cache.put_many([to_score[i] for i in cacheable], [scores[i] for i in cacheable], self.model_version)
+
+        elapsed = time.perf_counter() - start_time
+        self.last_batch_throughput = len(texts) / elapsed if elapsed > 0 else float("inf")
+        logger.info(f"Scored {len(texts)} texts ({len(to_score)} through the models) in {elapsed:.2f}s "
+                    f"({self.last_batch_throughput:.1f} texts/sec).")
         return results
 
+    def get_cache_stats(self):
+        return self.cache.stats() if self.cache is not None else None
+
     def process_articles_for_sentiment(self, articles_df):
         logger.info("Processing articles for sentiment analysis...")
         if articles_df.empty:
             logger.warning("No articles to process for sentiment.")
-            return pd.DataFrame()
+            return pd.DataFrame(columns=["full_text", "keywords", "sentiment_score", "sentiment_magnitude"])
 
         articles_df["full_text"] = articles_df["title"].fillna("") + " " + \
                                   articles_df["description"].fillna("") + " " + \
                                   articles_df["content"].fillna("")
         articles_df["full_text"] = articles_df["full_text"].apply(lambda x: x.strip())
-
-        # Apply sentiment analysis
-        articles_df["sentiment_score"] = articles_df["full_text"].apply(self.get_overall_sentiment)
-        
-        # For simplicity, magnitude can be absolute of score or a separate calculation
-        articles_df["sentiment_magnitude"] = articles_df["sentiment_score"].apply(abs)
-
+        articles_df = self._score_frame(articles_df, "articles")
         logger.info("Sentiment analysis completed for articles.")
         return articles_df
 
+    def process_posts_for_sentiment(self, posts):
+        # Social media counterpart of process_articles_for_sentiment for the dicts yielded by
+        # SocialMediaCollector (tweets carry "text"; Reddit posts a "title" and "text")
+        posts_df = pd.DataFrame(list(posts))
+        if posts_df.empty:
+            return pd.DataFrame(columns=["full_text", "keywords", "sentiment_score", "sentiment_magnitude"])
+        title = posts_df["title"].fillna("") if "title" in posts_df.columns else ""
+        posts_df["full_text"] = (title + " " + posts_df["text"].fillna("")).str.strip()
+        posts_df = self._score_frame(posts_df, "posts")
+        logger.info("Sentiment analysis completed for social media posts.")
+        return posts_df
 
+    def _score_frame(self, df, label):
+        # Drops rows the relevance filter rejects (recording the matched keywords) and scores the rest
+        if self.relevance_filter is not None:
+            relevant, keywords = self.relevance_filter.filter_texts(df["full_text"].tolist())
+            df["keywords"] = [",".join(k) for k in keywords]
+            total = len(df)
+            df = df[relevant].copy()
+            logger.info(f"Relevance filter kept {len(df)} of {total} {label}.")
 
-
+        # Apply sentiment analysis
+        df["sentiment_score"] = pd.Series(self.analyze_batch(df["full_text"].tolist(), filter_relevance=False),
+                                          index=df.index, dtype="float64")
+        # For simplicity, magnitude can be absolute of score or a separate calculation
+        df["sentiment_magnitude"] = df["sentiment_score"].abs()
+        return df
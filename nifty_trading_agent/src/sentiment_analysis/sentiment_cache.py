@@ -0,0 +1,148 @@
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+from ..utils.config_manager import config
+from ..utils.logger import logger
+
+_WHITESPACE = re.compile(r"\s+")
+_PURGE_INTERVAL_SECONDS = 60
+
+def normalize_text(text):
+    # Whitespace only: case and punctuation change VADER's scores ("SURGE!" vs "surge")
+    return _WHITESPACE.sub(" ", (text or "").strip())
+
+def content_hash(text, model_version=""):
+    return hashlib.sha256(f"{model_version}\x00{normalize_text(text)}".encode("utf-8")).hexdigest()
+
+class SentimentCache:
+    # Persistent sentiment score cache keyed by a hash of the normalised text and the model
+    # versions that produced the score. Entries expire after ttl_seconds and the least recently
+    # used ones are evicted once the cache grows past max_entries. Puts keep an upper bound on the
+    # row count, so the table is only counted once that bound passes max_entries, and expired rows
+    # are purged at most once a minute (reads already skip them).
+
+    def __init__(self, path, ttl_seconds=None, max_entries=200000):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS sentiment_cache ("
+            "key TEXT PRIMARY KEY, score REAL NOT NULL, created_at REAL NOT NULL, last_access REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_sentiment_cache_last_access ON sentiment_cache (last_access)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_sentiment_cache_created_at ON sentiment_cache (created_at)")
+        self._conn.commit()
+        self._size_bound = self._conn.execute("SELECT COUNT(*) FROM sentiment_cache").fetchone()[0]
+        self._last_purge = 0.0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        logger.info(f"SentimentCache initialized at {path}.")
+
+    @classmethod
+    def from_config(cls):
+        if not config.get("sentiment.cache.enabled", False):
+            return None
+        try:
+            ttl_hours = config.get("sentiment.cache.ttl_hours")
+            return cls(config.get("sentiment.cache.path"),
+                       ttl_seconds=ttl_hours * 3600 if ttl_hours else None,
+                       max_entries=config.get("sentiment.cache.max_entries", 200000))
+        except Exception as e:
+            logger.warning(f"Could not open sentiment cache: {e}. Scores will not be cached.")
+            return None
+
+    def get(self, text, model_version=""):
+        return self.get_many([text], model_version).get(0)
+
+    def get_many(self, texts, model_version=""):
+        # Returns {position in texts: score} for the cached texts
+        keys = [content_hash(text, model_version) for text in texts]
+        now = time.time()
+        found = {}
+        with self._lock:
+            unique_keys = list(set(keys))
+            # Stay below SQLite's bound-parameter limit
+            for start in range(0, len(unique_keys), 500):
+                chunk = unique_keys[start:start + 500]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self._conn.execute(
+                    f"SELECT key, score, created_at FROM sentiment_cache WHERE key IN ({placeholders})", chunk
+                ).fetchall()
+                for key, score, created_at in rows:
+                    if self.ttl_seconds is None or now - created_at <= self.ttl_seconds:
+                        found[key] = score
+            if found:
+                self._conn.executemany("UPDATE sentiment_cache SET last_access = ? WHERE key = ?",
+                                       [(now, key) for key in found])
+                self._conn.commit()
+
+        results = {i: found[key] for i, key in enumerate(keys) if key in found}
+        self.hits += len(results)
+        self.misses += len(texts) - len(results)
+        return results
+
+    def put(self, text, score, model_version=""):
+        self.put_many([text], [score], model_version)
+
+    def put_many(self, texts, scores, model_version=""):
+        now = time.time()
+        rows = [(content_hash(text, model_version), float(score), now, now) for text, score in zip(texts, scores)]
+        with self._lock:
+            self._conn.executemany("INSERT OR REPLACE INTO sentiment_cache (key, score, created_at, last_access) "
+                                   "VALUES (?, ?, ?, ?)", rows)
+            self._conn.commit()
+            # Replaced keys are counted too, so this only ever overestimates the row count
+            self._size_bound += len(rows)
+            self._evict(now)
+
+    def _evict(self, now):
+        changed = False
+        if self.ttl_seconds is not None and now - self._last_purge >= _PURGE_INTERVAL_SECONDS:
+            cursor = self._conn.execute("DELETE FROM sentiment_cache WHERE created_at < ?", (now - self.ttl_seconds,))
+            self._last_purge = now
+            self.evictions += cursor.rowcount
+            self._size_bound -= cursor.rowcount
+            changed = True
+        if self._size_bound > self.max_entries:
+            size = self._conn.execute("SELECT COUNT(*) FROM sentiment_cache").fetchone()[0]
+            if size > self.max_entries:
+                # Trim to 90% so eviction does not run on every insert once the cache is full
+                excess = size - int(self.max_entries * 0.9)
+                cursor = self._conn.execute(
+                    "DELETE FROM sentiment_cache WHERE key IN "
+                    "(SELECT key FROM sentiment_cache ORDER BY last_access ASC LIMIT ?)", (excess,)
+                )
+                self.evictions += cursor.rowcount
+                size -= cursor.rowcount
+                changed = True
+            self._size_bound = size
+        if changed:
+            self._conn.commit()
+
+    def size(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM sentiment_cache").fetchone()[0]
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "size": self.size()
+        }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,314 @@
+import collections
+import copy
+import itertools
+import multiprocessing as mp
+import os
+import threading
+import time
+from concurrent.futures import Future
+from multiprocessing import reduction
+from multiprocessing.connection import Connection, wait
+import torch
+from ..utils.config_manager import config
+from ..utils.logger import logger
+
+class WorkerCrashedError(RuntimeError):
+    pass
+
+def _worker_main(conn, analyzer, num_threads):
+    torch.set_num_threads(num_threads)
+    while True:
+        try:
+            batch = conn.recv()
+        except (EOFError, OSError):
+            break # The pool went away
+        if batch is None:
+            break
+        request_ids, texts = batch
+        try:
+            conn.send(("result", request_ids, analyzer.analyze_batch(texts)))
+        except Exception as e:
+            conn.send(("error", request_ids, repr(e)))
+
+def _spawner_main(control, analyzer, num_threads):
+    # Runs in a freshly spawned interpreter (never a fork of the parent, whose torch and logging
+    # threads may hold locks at fork time) that receives the analyzer once, pickled, and then only
+    # waits on `control`: it never scores or logs. Every worker, including replacements after a
+    # crash, is forked from this idle process, so workers share its copy of the weights
+    # copy-on-write. For each request it replies with the worker's pid and passes the parent's end
+    # of a fresh socket pair over `control`.
+    while True:
+        try:
+            if control.poll(0.5):
+                worker_id = control.recv()
+                if worker_id is None:
+                    break
+                parent_end, worker_end = mp.Pipe()
+                pid = os.fork()
+                if pid == 0:
+                    try:
+                        control.close()
+                        parent_end.close()
+                        _worker_main(worker_end, analyzer, num_threads)
+                    finally:
+                        os._exit(0)
+                worker_end.close()
+                control.send(pid)
+                reduction.send_handle(control, parent_end.fileno(), None)
+                parent_end.close()
+        except (EOFError, OSError):
+            break # The parent is gone
+        # Reap exited workers; the parent notices their death when their connection closes
+        try:
+            while os.waitpid(-1, os.WNOHANG)[0]:
+                pass
+        except ChildProcessError:
+            pass
+
+class SentimentWorkerPool:
+    # Scores texts on N worker processes that share one loaded SentimentAnalyzer copy-on-write.
+    # Callers get concurrent.futures.Future objects back. The parent owns all dispatch: requests
+    # wait in a backlog, and a collector thread sends each idle worker a batch (up to batch_size
+    # texts, or whatever arrived within batch_timeout_ms) over that worker's own connection, so it
+    # always knows exactly which requests each worker holds. When a worker dies its connection
+    # closes; its requests are re-submitted one at a time (so a poison text cannot take its batch
+    # neighbours down with it) until they have crashed max_retries times, after which their
+    # futures fail with WorkerCrashedError, and a replacement worker is started.
+    #
+    # The pool is opt-in: callers that want multi-core scoring build one around their analyzer and
+    # use submit_batch()/map() in place of analyzer.analyze_batch().
+
+    def __init__(self, analyzer, num_workers=None, batch_size=None, batch_timeout_ms=None, max_retries=2, num_threads=1):
+        self.analyzer = analyzer
+        self.num_workers = num_workers or config.get("sentiment.worker_pool.num_workers", 2)
+        self.batch_size = batch_size or config.get("sentiment.worker_pool.batch_size", 32)
+        batch_timeout_ms = batch_timeout_ms if batch_timeout_ms is not None else config.get("sentiment.worker_pool.batch_timeout_ms", 20)
+        self.batch_timeout = batch_timeout_ms / 1000.0
+        self.max_retries = max_retries
+
+        # The analyzer is pickled to the spawner without its cache (an SQLite connection, and the
+        # parent caches results anyway), so every pool's workers get their own copy of the models
+        worker_analyzer = copy.copy(analyzer)
+        worker_analyzer.cache = None
+        ctx = mp.get_context("spawn")
+        self._spawner_conn, spawner_end = ctx.Pipe()
+        self._spawner = ctx.Process(target=_spawner_main, args=(spawner_end, worker_analyzer, num_threads),
+                                    name="sentiment-worker-spawner", daemon=True)
+        self._spawner.start()
+        spawner_end.close()
+        self._spawn_lock = threading.Lock()
+
+        self._wakeup_r, self._wakeup_w = os.pipe()
+        os.set_blocking(self._wakeup_w, False)
+        self._ids = itertools.count()
+        self._lock = threading.Lock()
+        self._pending = {} # request_id -> [future, text, crashes]
+        self._backlog = collections.deque() # (request_id, enqueued_at)
+        self._retries = collections.deque() # request ids re-submitted after a crash, dispatched alone
+        self._workers = {} # worker_id -> {"conn", "pid", "batch"}; only the collector thread touches it
+        self._running = True
+        self._stopping = False
+        self.restarts = 0
+
+        for worker_id in range(self.num_workers):
+            self._start_worker(worker_id)
+
+        self._collector = threading.Thread(target=self._run, name="sentiment-pool-collector", daemon=True)
+        self._collector.start()
+        logger.info(f"SentimentWorkerPool started with {self.num_workers} workers, batch size {self.batch_size}.")
+
+    def _start_worker(self, worker_id):
+        with self._spawn_lock:
+            self._spawner_conn.send(worker_id)
+            pid = self._spawner_conn.recv()
+            fd = reduction.recv_handle(self._spawner_conn)
+        self._workers[worker_id] = {"conn": Connection(fd), "pid": pid, "batch": None}
+
+    def _wake(self):
+        try:
+            os.write(self._wakeup_w, b"\0")
+        except BlockingIOError:
+            pass # Already signalled
+
+    def submit(self, text):
+        return self.submit_batch([text])[0]
+
+    def submit_batch(self, texts):
+        if not self._running:
+            raise RuntimeError("SentimentWorkerPool has been shut down.")
+        texts = list(texts)
+        futures = [Future() for _ in texts]
+        cache = self.analyzer.cache
+        cached = cache.get_many(texts, self.analyzer.model_version) if cache is not None else {}
+        now = time.monotonic()
+        with self._lock:
+            for i, (text, future) in enumerate(zip(texts, futures)):
+                if i in cached:
+                    future.set_result(cached[i])
+                    continue
+                request_id = next(self._ids)
+                self._pending[request_id] = [future, text, 0]
+                self._backlog.append((request_id, now))
+        self._wake()
+        return futures
+
+    def map(self, texts, timeout=None):
+        return [future.result(timeout=timeout) for future in self.submit_batch(texts)]
+
+    def _next_batches(self):
+        # Pops a batch for every idle worker that should get one now; returns the batches and how
+        # long to wait before the batching window of the oldest backlog request closes
+        batches, timeout = [], None
+        with self._lock:
+            idle = [worker_id for worker_id, worker in self._workers.items() if worker["batch"] is None]
+            for worker_id in idle:
+                if self._retries:
+                    request_ids = [self._retries.popleft()]
+                elif self._backlog:
+                    age = time.monotonic() - self._backlog[0][1]
+                    if len(self._backlog) < self.batch_size and age < self.batch_timeout and not self._stopping:
+                        timeout = self.batch_timeout - age
+                        break
+                    request_ids = [self._backlog.popleft()[0] for _ in range(min(self.batch_size, len(self._backlog)))]
+                else:
+                    break
+                # Requests cancelled by the caller before dispatch are dropped
+                request_ids = [request_id for request_id in request_ids if self._claim(request_id)]
+                if request_ids:
+                    batch = (request_ids, [self._pending[request_id][1] for request_id in request_ids])
+                    self._workers[worker_id]["batch"] = request_ids
+                    batches.append((worker_id, batch))
+        return batches, timeout
+
+    def _claim(self, request_id):
+        future = self._pending[request_id][0]
+        if future.running() or future.set_running_or_notify_cancel():
+            return True
+        del self._pending[request_id]
+        return False
+
+    def _idle(self):
+        with self._lock:
+            return not self._backlog and not self._retries and all(w["batch"] is None for w in self._workers.values())
+
+    def _run(self):
+        while True:
+            batches, timeout = self._next_batches()
+            for worker_id, batch in batches:
+                try:
+                    self._workers[worker_id]["conn"].send(batch)
+                except OSError:
+                    self._handle_crash(worker_id)
+            if self._stopping and (not self._running or self._idle()):
+                break
+            if batches:
+                continue # Idle workers may remain for what is left of the backlog
+
+            conns = {worker["conn"]: worker_id for worker_id, worker in self._workers.items()}
+            for ready in wait([self._wakeup_r, *conns], timeout):
+                if ready == self._wakeup_r:
+                    os.read(self._wakeup_r, 4096)
+                    continue
+                worker_id = conns[ready]
+                try:
+                    message = ready.recv()
+                except (EOFError, OSError):
+                    self._handle_crash(worker_id)
+                    continue
+                self._handle_message(worker_id, message)
+
+        for worker in self._workers.values():
+            try:
+                worker["conn"].send(None)
+            except OSError:
+                pass
+            worker["conn"].close()
+
+    def _handle_message(self, worker_id, message):
+        kind, request_ids, payload = message
+        with self._lock:
+            self._workers[worker_id]["batch"] = None
+            resolved = [self._pending.pop(request_id, None) for request_id in request_ids]
+
+        if kind == "result":
+            for entry, score in zip(resolved, payload):
+                if entry is not None:
+                    entry[0].set_result(score)
+            cache = self.analyzer.cache
+            if cache is not None:
+                # None is the score of a text the analyzer's relevance filter rejected
+                done = [(entry[1], score) for entry, score in zip(resolved, payload) if entry is not None and score is not None]
+                if done:
+                    cache.put_many([text for text, _ in done], [score for _, score in done], self.analyzer.model_version)
+        else:
+            for entry in resolved:
+                if entry is not None:
+                    entry[0].set_exception(RuntimeError(f"Sentiment worker {worker_id} failed: {payload}"))
+
+    def _handle_crash(self, worker_id):
+        worker = self._workers.pop(worker_id)
+        worker["conn"].close()
+        failed = []
+        with self._lock:
+            for request_id in worker["batch"] or []:
+                entry = self._pending.get(request_id)
+                if entry is None:
+                    continue
+                entry[2] += 1
+                if entry[2] > self.max_retries:
+                    del self._pending[request_id]
+                    failed.append((entry[0], entry[2]))
+                else:
+                    self._retries.append(request_id)
+        for future, crashes in failed:
+            future.set_exception(WorkerCrashedError(f"Sentiment worker crashed {crashes} times scoring this text."))
+        if not self._running:
+            return
+
+        logger.warning(f"Sentiment worker {worker_id} (pid {worker['pid']}) died. Restarting.")
+        try:
+            self._start_worker(worker_id)
+            self.restarts += 1
+        except Exception as e:
+            logger.error(f"Could not restart sentiment worker {worker_id}: {e}")
+            if not self._workers:
+                self._fail_all(WorkerCrashedError("No sentiment workers left to score this text."))
+
+    def _fail_all(self, error):
+        with self._lock:
+            entries = list(self._pending.values())
+            self._pending.clear()
+            self._backlog.clear()
+            self._retries.clear()
+        for future, _, _ in entries:
+            if not future.cancel() and not future.done():
+                future.set_exception(error)
+
+    def shutdown(self, wait=True, timeout=10):
+        # wait=True scores everything already submitted first; wait=False abandons it
+        if not self._running:
+            return
+        self._stopping = True
+        if not wait:
+            self._running = False
+        self._wake()
+        self._collector.join(timeout)
+        self._running = False
+        self._fail_all(RuntimeError("SentimentWorkerPool has been shut down."))
+        try:
+            self._spawner_conn.send(None)
+        except OSError:
+            pass
+        self._spawner.join(timeout)
+        if self._spawner.is_alive():
+            self._spawner.terminate()
+        self._spawner_conn.close()
+        os.close(self._wakeup_r)
+        os.close(self._wakeup_w)
+        logger.info(f"SentimentWorkerPool shut down ({self.restarts} worker restarts).")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.shutdown()
@@ -1,5 +1,10 @@
 import tweepy
 import praw
+import json
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime, timedelta
 from ..utils.config_manager import config
 from ..utils.logger import logger
@@ -11,6 +16,15 @@ class SocialMediaCollector:
 
         # Reddit API
         self.reddit_client = self._init_reddit_client()
+
+        self.subreddits = config.get("social_media.subreddits", ["indiainvestments", "IndianStockMarket", "StockMarket"])
+        self.cursor_path = config.get("social_media.cursor_path")
+        # "<source>|<query>" -> newest tweet id / newest submission timestamp and ids already collected
+        self._cursors = self._load_cursors()
+        self._cursor_lock = threading.Lock()
+        # (source, id) of recently streamed posts, oldest first; a refetched gap never reaches the scorer twice
+        self._seen_posts = OrderedDict()
+        self.max_seen_posts = config.get("social_media.max_seen_posts", 50000)
         logger.info("SocialMediaCollector initialized.")
 
     def _init_twitter_client(self):
@@ -50,13 +64,51 @@ class SocialMediaCollector:
             logger.error(f"Error initializing Reddit client: {e}")
             return None
 
-    def get_tweets(self, query, count=100):
+    def _load_cursors(self):
+        if not self.cursor_path or not os.path.exists(self.cursor_path):
+            return {}
+        try:
+            with open(self.cursor_path) as f:
+                return json.load(f)
+        except Exception as e:
+            logger.warning(f"Could not read social media cursors from {self.cursor_path}: {e}. Starting from scratch.")
+            return {}
+
+    def _save_cursors(self):
+        if not self.cursor_path:
+            return
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(self.cursor_path)), exist_ok=True)
+            tmp_path = f"{self.cursor_path}.tmp"
+            with self._cursor_lock:
+                with open(tmp_path, "w") as f:
+                    json.dump(self._cursors, f, indent=2)
+                os.replace(tmp_path, self.cursor_path)
+        except Exception as e:
+            logger.error(f"Error saving social media cursors: {e}")
+
+    def get_cursor(self, source, query):
+        return self._cursors.get(f"{source}|{query}")
+
+    def _advance_cursor(self, source, query, value):
+        # Tweet cursors are ids; Reddit cursors are {"created_utc", "ids"} (the ids already seen at
+        # that second). A cursor never moves backwards.
+        key = f"{source}|{query}"
+        position = lambda cursor: cursor["created_utc"] if isinstance(cursor, dict) else cursor
+        with self._cursor_lock:
+            current = self._cursors.get(key)
+            if current is None or position(value) >= position(current):
+                self._cursors[key] = value
+
+    def _search_tweets(self, query, count, since_id=None):
+        # (tweets, complete): complete is False when the search failed part-way or stopped at
+        # `count`, in which case tweets between since_id and the oldest one returned were not seen
         tweets_data = []
         if not self.twitter_client:
             logger.warning("Twitter client not initialized. Cannot fetch tweets.")
-            return tweets_data
+            return tweets_data, False
         try:
-            for tweet in tweepy.Cursor(self.twitter_client.search_tweets, q=query, lang="en", tweet_mode=\"extended\").items(count):
+            for tweet in tweepy.Cursor(self.twitter_client.search_tweets, q=query, lang="en", tweet_mode="extended", since_id=since_id).items(count):
                 tweets_data.append({
                     "source": "Twitter",
                     "id": tweet.id_str,
@@ -69,16 +121,34 @@ class SocialMediaCollector:
             logger.info(f"Fetched {len(tweets_data)} tweets for query: {query}")
         except Exception as e:
             logger.error(f"Error fetching tweets: {e}")
-        return tweets_data
+            return tweets_data, False
+        return tweets_data, len(tweets_data) < count
 
-    def get_reddit_posts(self, subreddit_name, query, limit=100):
+    def get_tweets(self, query, count=100, since_id=None):
+        return self._search_tweets(query, count, since_id)[0]
+
+    def _search_reddit_posts(self, subreddit_name, query, limit, after=None):
+        # (posts, complete) like _search_tweets; `after` is a Reddit cursor. Posts created in the
+        # cursor's second are kept unless their id was already seen.
         reddit_data = []
         if not self.reddit_client:
             logger.warning("Reddit client not initialized. Cannot fetch Reddit posts.")
-            return reddit_data
+            return reddit_data, False
+        after_utc = after["created_utc"] if after else None
+        seen_ids = set(after.get("ids", [])) if after else set()
+        reached_cursor = False
+        scanned = 0
         try:
             subreddit = self.reddit_client.subreddit(subreddit_name)
-            for submission in subreddit.search(query, limit=limit):
+            # Newest first, so everything past the cursor has been collected before
+            for submission in subreddit.search(query, sort="new", limit=limit):
+                scanned += 1
+                if after_utc is not None:
+                    if submission.created_utc < after_utc:
+                        reached_cursor = True
+                        break
+                    if submission.created_utc == after_utc and submission.id in seen_ids:
+                        continue
                 reddit_data.append({
                     "source": "Reddit",
                     "id": submission.id,
@@ -87,27 +157,95 @@ class SocialMediaCollector:
                     "created_at": datetime.fromtimestamp(submission.created_utc),
                     "author": submission.author.name if submission.author else "[deleted]",
                     "score": submission.score,
-                    "num_comments": submission.num_comments
+                    "num_comments": submission.num_comments,
+                    "created_utc": submission.created_utc
                 })
             logger.info(f"Fetched {len(reddit_data)} Reddit posts from r/{subreddit_name} for query: {query}")
         except Exception as e:
             logger.error(f"Error fetching Reddit posts: {e}")
-        return reddit_data
-
-    def collect_all_social_media(self, query=\"Nifty OR Bank Nifty\"):
-        all_posts = []
-        
-        # Collect Tweets
-        all_posts.extend(self.get_tweets(query))
-
-        # Collect Reddit posts from relevant subreddits
-        all_posts.extend(self.get_reddit_posts("indiainvestments", query))
-        all_posts.extend(self.get_reddit_posts("IndianStockMarket", query))
-        all_posts.extend(self.get_reddit_posts("StockMarket", query))
-
-        logger.info(f"Collected a total of {len(all_posts)} social media posts.")
-        return all_posts
-
-
-
-
+            return reddit_data, False
+        return reddit_data, reached_cursor or limit is None or scanned < limit
+
+    def get_reddit_posts(self, subreddit_name, query, limit=100, after_utc=None):
+        after = {"created_utc": after_utc, "ids": []} if after_utc is not None else None
+        return self._search_reddit_posts(subreddit_name, query, limit, after)[0]
+
+    def _fetch_tweets_since_cursor(self, query, count, max_backfill):
+        # Returns (cursor key, tweets, new cursor or None). Without a previous cursor the newest
+        # `count` tweets become the baseline. With one, the search pages backwards (tweepy.Cursor
+        # follows max_id) until it reaches since_id, up to `max_backfill` tweets; if even that
+        # does not reach it, the cursor still moves to the newest tweet and the skipped gap is
+        # logged, so later fetches do not keep returning the same newest tweets. A failed fetch
+        # keeps the cursor and the retried gap is deduplicated by stream_all_social_media.
+        cursor_key = "Twitter"
+        since_id = self.get_cursor(cursor_key, query)
+        tweets, complete = self._search_tweets(query, count if since_id is None else max_backfill, since_id=since_id)
+        new_cursor = None
+        if tweets and (complete or since_id is None):
+            new_cursor = max(int(t["id"]) for t in tweets)
+        elif tweets and len(tweets) >= max_backfill:
+            new_cursor = max(int(t["id"]) for t in tweets)
+            logger.warning(f"Twitter fetch for {query} hit {max_backfill} tweets before reaching the cursor; "
+                           f"skipped tweets with ids {since_id} to {min(int(t['id']) for t in tweets)}.")
+        return cursor_key, tweets, new_cursor
+
+    def _fetch_reddit_since_cursor(self, subreddit_name, query, limit, max_backfill):
+        # Same policy as _fetch_tweets_since_cursor, with `limit` for the first fetch
+        cursor_key = f"Reddit/{subreddit_name}"
+        after = self.get_cursor(cursor_key, query)
+        if after is not None and not isinstance(after, dict):
+            after = {"created_utc": after, "ids": []} # Cursor files written before ids were tracked
+        posts, complete = self._search_reddit_posts(subreddit_name, query, limit if after is None else max_backfill, after=after)
+        new_cursor = None
+        truncated = after is not None and not complete and len(posts) >= max_backfill
+        if posts and (complete or after is None or truncated):
+            newest = max(p["created_utc"] for p in posts)
+            ids = {p["id"] for p in posts if p["created_utc"] == newest}
+            if after is not None and after["created_utc"] == newest:
+                ids |= set(after["ids"])
+            new_cursor = {"created_utc": newest, "ids": sorted(ids)}
+        if truncated:
+            logger.warning(f"Reddit fetch from r/{subreddit_name} for {query} hit {max_backfill} posts before reaching the cursor; "
+                           f"skipped posts created between {after['created_utc']} and {min(p['created_utc'] for p in posts)}.")
+        return cursor_key, posts, new_cursor
+
+    def _first_sighting(self, post):
+        key = (post["source"], post["id"])
+        if key in self._seen_posts:
+            self._seen_posts.move_to_end(key)
+            return False
+        self._seen_posts[key] = None
+        if len(self._seen_posts) > self.max_seen_posts:
+            self._seen_posts.popitem(last=False)
+        return True
+
+    def stream_all_social_media(self, query="Nifty OR Bank Nifty", count=None, limit=None, max_backfill=None):
+        # Fetches Twitter and every subreddit concurrently and yields posts as each source
+        # finishes. Only posts newer than the stored per-source, per-query cursors are fetched,
+        # and posts already streamed by this collector (a retried gap) are skipped.
+        # A source's cursor only moves once the consumer has taken all of its posts, and the
+        # cursors are saved when the stream ends, even if the consumer stops early.
+        count = count or config.get("social_media.max_posts_per_fetch", 1000)
+        limit = limit or config.get("social_media.max_posts_per_fetch", 1000)
+        max_backfill = max_backfill or config.get("social_media.max_backfill_posts", 10000)
+        total = 0
+        try:
+            with ThreadPoolExecutor(max_workers=1 + len(self.subreddits), thread_name_prefix="social") as executor:
+                futures = [executor.submit(self._fetch_tweets_since_cursor, query, count, max_backfill)]
+                futures += [executor.submit(self._fetch_reddit_since_cursor, subreddit_name, query, limit, max_backfill)
+                            for subreddit_name in self.subreddits]
+                for future in as_completed(futures):
+                    cursor_key, posts, new_cursor = future.result()
+                    for post in posts:
+                        if not self._first_sighting(post):
+                            continue
+                        total += 1
+                        yield post
+                    if new_cursor is not None:
+                        self._advance_cursor(cursor_key, query, new_cursor)
+        finally:
+            self._save_cursors()
+        logger.info(f"Collected a total of {total} new social media posts.")
+
+    def collect_all_social_media(self, query="Nifty OR Bank Nifty"):
+        return list(self.stream_all_social_media(query))
@@ -1,7 +1,10 @@
-from sqlalchemy import create_engine, Column, Integer, String, Float, DateTime, Boolean, Text
+from sqlalchemy import create_engine, Column, Integer, String, Float, DateTime, Boolean, Text, UniqueConstraint, text
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from datetime import datetime
+import re
+import time
+import pandas as pd
 from ..utils.config_manager import config
 from ..utils.logger import logger
 
@@ -30,6 +33,59 @@ class SentimentData(Base):
     sentiment_magnitude = Column(Float)
     keywords = Column(Text) # Comma separated keywords
 
+class SentimentIndex(Base):
+    # Per-minute sentiment aggregates per source, plus an ALL_SOURCES row per minute.
+    # Maintained incrementally by add_sentiment_data, so queries never touch raw SentimentData rows.
+    __tablename__ = 'sentiment_index'
+    __table_args__ = (UniqueConstraint('source', 'bucket', name='uq_sentiment_index_source_bucket'),)
+    id = Column(Integer, primary_key=True)
+    source = Column(String(50), nullable=False)
+    bucket = Column(DateTime, nullable=False, index=True) # Start of the minute
+    count = Column(Integer, nullable=False, default=0)
+    score_sum = Column(Float, nullable=False, default=0.0)
+    magnitude_sum = Column(Float, nullable=False, default=0.0)
+    mean_score = Column(Float)
+    mean_magnitude = Column(Float)
+    # Exponentially decayed sums of scores and counts up to the end of this bucket
+    decayed_sum = Column(Float, nullable=False, default=0.0)
+    decayed_weight = Column(Float, nullable=False, default=0.0)
+    decayed_score = Column(Float)
+
+ALL_SOURCES = "__all__"
+
+# Full-text index over sentiment_data.text, kept in sync by triggers (SQLite) or a generated column (PostgreSQL)
+SQLITE_FTS_STATEMENTS = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS sentiment_fts USING fts5(text, content='sentiment_data', content_rowid='id', tokenize='porter unicode61')",
+    "CREATE TRIGGER IF NOT EXISTS sentiment_fts_insert AFTER INSERT ON sentiment_data BEGIN "
+    "INSERT INTO sentiment_fts(rowid, text) VALUES (new.id, new.text); END",
+    "CREATE TRIGGER IF NOT EXISTS sentiment_fts_delete AFTER DELETE ON sentiment_data BEGIN "
+    "INSERT INTO sentiment_fts(sentiment_fts, rowid, text) VALUES ('delete', old.id, old.text); END",
+    "CREATE TRIGGER IF NOT EXISTS sentiment_fts_update AFTER UPDATE OF text ON sentiment_data BEGIN "
+    "INSERT INTO sentiment_fts(sentiment_fts, rowid, text) VALUES ('delete', old.id, old.text); "
+    "INSERT INTO sentiment_fts(rowid, text) VALUES (new.id, new.text); END",
+]
+POSTGRES_FTS_STATEMENTS = [
+    "ALTER TABLE sentiment_data ADD COLUMN IF NOT EXISTS text_tsv tsvector "
+    "GENERATED ALWAYS AS (to_tsvector('english', text)) STORED",
+    "CREATE INDEX IF NOT EXISTS idx_sentiment_data_text_tsv ON sentiment_data USING GIN (text_tsv)",
+]
+_FTS_OPERATORS = {"OR", "AND", "NOT"}
+_FTS_TOKEN = re.compile(r"[\w&.'-]+", re.UNICODE)
+
+def _to_fts5_query(query):
+    # Quote every term so punctuation such as "M&M" or "Q3-FY24" cannot break FTS5 syntax;
+    # bare OR/AND/NOT (any case) stay operators, and adjacent terms are ANDed.
+    terms = []
+    for token in _FTS_TOKEN.findall(query):
+        if token.upper() in _FTS_OPERATORS:
+            if terms and terms[-1] not in _FTS_OPERATORS: # "a OR OR b" keeps one operator
+                terms.append(token.upper())
+        else:
+            terms.append('"' + token.replace('"', "") + '"')
+    while terms and terms[-1] in _FTS_OPERATORS:
+        terms.pop()
+    return " ".join(terms)
+
 class TradeLog(Base):
     __tablename__ = 'trade_log'
     id = Column(Integer, primary_key=True)
@@ -85,46 +141,244 @@ class DatabaseManager:
         else:
             raise ValueError(f"Unsupported database type: {db_type}")
 
+        self.db_type = db_type
         Base.metadata.create_all(self.engine)
         self.Session = sessionmaker(bind=self.engine)
+        self.sentiment_half_life_minutes = config.get("sentiment.index.half_life_minutes", 60)
+        self.full_text_search = self._setup_full_text_search()
         logger.info(f"DatabaseManager initialized with {db_type} at {db_path}")
 
     def get_session(self):
         return self.Session()
 
+    def _setup_full_text_search(self):
+        try:
+            with self.engine.begin() as conn:
+                if self.db_type == "sqlite":
+                    created = conn.execute(text("SELECT 1 FROM sqlite_master WHERE name = 'sentiment_fts'")).first() is None
+                    for statement in SQLITE_FTS_STATEMENTS:
+                        conn.execute(text(statement))
+                    if created:
+                        # Index rows written before the FTS table existed
+                        conn.execute(text("INSERT INTO sentiment_fts(sentiment_fts) VALUES ('rebuild')"))
+                else:
+                    for statement in POSTGRES_FTS_STATEMENTS:
+                        conn.execute(text(statement))
+            return True
+        except Exception as e:
+            logger.warning(f"Full-text search unavailable ({e}); search_sentiment will fall back to LIKE scans.")
+            return False
+
     def add_market_data(self, data):
         session = self.get_session()
         try:
             market_data = MarketData(**data)
             session.add(market_data)
             session.commit()
-            logger.debug(f"Added market data for {data.get("tradingsymbol")}")
+            logger.debug("Added market data for {}", data.get("tradingsymbol"))
         except Exception as e:
             session.rollback()
             logger.error(f"Error adding market data: {e}")
         finally:
             session.close()
 
+    def get_market_data(self, instrument_token, start=None, end=None):
+        # Bars for one instrument, oldest first, read straight into a DataFrame (no ORM objects)
+        try:
+            table = MarketData.__table__
+            query = table.select().where(table.c.instrument_token == instrument_token)
+            if start is not None:
+                query = query.where(table.c.timestamp >= pd.Timestamp(start).to_pydatetime())
+            if end is not None:
+                query = query.where(table.c.timestamp <= pd.Timestamp(end).to_pydatetime())
+            with self.engine.connect() as conn:
+                df = pd.read_sql(query.order_by(table.c.timestamp), conn, parse_dates=["timestamp"])
+            return df.drop(columns=["id"])
+        except Exception as e:
+            logger.error(f"Error reading market data for {instrument_token}: {e}")
+            return pd.DataFrame()
+
     def add_sentiment_data(self, data):
+        self.add_sentiment_data_many([data])
+
+    def add_sentiment_data_many(self, rows):
+        # Writes the raw rows and folds them into the sentiment index in the same transaction
         session = self.get_session()
         try:
-            sentiment_data = SentimentData(**data)
-            session.add(sentiment_data)
+            records = []
+            for data in rows:
+                data = dict(data)
+                data["timestamp"] = pd.Timestamp(data.get("timestamp") or datetime.now()).to_pydatetime()
+                records.append(SentimentData(**data))
+            session.add_all(records)
+            self._update_sentiment_index(session, records)
             session.commit()
-            logger.debug(f"Added sentiment data from {data.get("source")}")
+            logger.debug("Added {} sentiment rows", len(records))
         except Exception as e:
             session.rollback()
             logger.error(f"Error adding sentiment data: {e}")
         finally:
             session.close()
 
+    def _decay(self, minutes):
+        return 0.5 ** (minutes / self.sentiment_half_life_minutes)
+
+    def _update_sentiment_index(self, session, records):
+        deltas = {} # (source, bucket) -> [count, score_sum, magnitude_sum]
+        for record in records:
+            bucket = record.timestamp.replace(second=0, microsecond=0)
+            magnitude = record.sentiment_magnitude if record.sentiment_magnitude is not None else abs(record.sentiment_score)
+            for source in (record.source, ALL_SOURCES):
+                delta = deltas.setdefault((source, bucket), [0, 0.0, 0.0])
+                delta[0] += 1
+                delta[1] += record.sentiment_score
+                delta[2] += magnitude
+
+        by_source = {}
+        for (source, bucket), delta in deltas.items():
+            by_source.setdefault(source, {})[bucket] = delta
+
+        for source, source_deltas in by_source.items():
+            first_bucket = min(source_deltas)
+            # Load the affected buckets once: the one before the earliest new row and everything after it.
+            # Rows normally arrive in order, so this is just the latest bucket or two.
+            previous = session.query(SentimentIndex).filter(SentimentIndex.source == source, SentimentIndex.bucket < first_bucket) \
+                .order_by(SentimentIndex.bucket.desc()).first()
+            rows = {row.bucket: row for row in session.query(SentimentIndex)
+                    .filter(SentimentIndex.source == source, SentimentIndex.bucket >= first_bucket)}
+            for bucket, (count, score_sum, magnitude_sum) in source_deltas.items():
+                row = rows.get(bucket)
+                if row is None:
+                    row = SentimentIndex(source=source, bucket=bucket, count=0, score_sum=0.0, magnitude_sum=0.0,
+                                         decayed_sum=0.0, decayed_weight=0.0)
+                    session.add(row)
+                    rows[bucket] = row
+                row.count += count
+                row.score_sum += score_sum
+                row.magnitude_sum += magnitude_sum
+                row.mean_score = row.score_sum / row.count
+                row.mean_magnitude = row.magnitude_sum / row.count
+
+            # Carry the decayed state forward from the previous bucket, so late rows also reach later buckets
+            decayed_sum = previous.decayed_sum if previous is not None else 0.0
+            decayed_weight = previous.decayed_weight if previous is not None else 0.0
+            last_bucket = previous.bucket if previous is not None else None
+            for bucket in sorted(rows):
+                row = rows[bucket]
+                factor = self._decay((bucket - last_bucket).total_seconds() / 60) if last_bucket is not None else 0.0
+                decayed_sum = decayed_sum * factor + row.score_sum
+                decayed_weight = decayed_weight * factor + row.count
+                row.decayed_sum = decayed_sum
+                row.decayed_weight = decayed_weight
+                row.decayed_score = decayed_sum / decayed_weight
+                last_bucket = bucket
+
+    def get_sentiment_index(self, start=None, end=None, source=ALL_SOURCES):
+        # Minute buckets in [start, end]; the timestamp/sentiment_score columns match raw SentimentData frames
+        session = self.get_session()
+        try:
+            query = session.query(SentimentIndex).filter(SentimentIndex.source == source)
+            if start is not None:
+                query = query.filter(SentimentIndex.bucket >= pd.Timestamp(start).to_pydatetime())
+            if end is not None:
+                query = query.filter(SentimentIndex.bucket <= pd.Timestamp(end).to_pydatetime())
+            rows = query.order_by(SentimentIndex.bucket).all()
+            return pd.DataFrame({
+                "timestamp": [row.bucket for row in rows],
+                "source": [row.source for row in rows],
+                "count": [row.count for row in rows],
+                "score_sum": [row.score_sum for row in rows],
+                "sentiment_score": [row.mean_score for row in rows],
+                "sentiment_magnitude": [row.mean_magnitude for row in rows],
+                "decayed_score": [row.decayed_score for row in rows],
+            })
+        except Exception as e:
+            logger.error(f"Error reading sentiment index: {e}")
+            return pd.DataFrame()
+        finally:
+            session.close()
+
+    def get_sentiment_at(self, timestamp, source=ALL_SOURCES):
+        # Sentiment as known at `timestamp`: the latest bucket at or before it, with the decayed
+        # weight aged to `timestamp` (a small weight means the score rests on stale items)
+        session = self.get_session()
+        try:
+            as_of = pd.Timestamp(timestamp).to_pydatetime()
+            row = session.query(SentimentIndex).filter(SentimentIndex.source == source, SentimentIndex.bucket <= as_of) \
+                .order_by(SentimentIndex.bucket.desc()).first()
+            if row is None:
+                return None
+            age_minutes = max((as_of - row.bucket).total_seconds() / 60 - 1, 0.0)
+            return {
+                "timestamp": as_of,
+                "bucket": row.bucket,
+                "count": row.count,
+                "mean_score": row.mean_score,
+                "mean_magnitude": row.mean_magnitude,
+                "decayed_score": row.decayed_score,
+                "decayed_weight": row.decayed_weight * self._decay(age_minutes),
+            }
+        except Exception as e:
+            logger.error(f"Error reading sentiment at {timestamp}: {e}")
+            return None
+        finally:
+            session.close()
+
+    def search_sentiment(self, query, start=None, end=None, source=None, limit=100):
+        # Ranked full-text search over sentiment texts; higher rank is a better match.
+        # Terms are ANDed by default and OR/NOT are supported, e.g. "HDFC OR RBI".
+        started = time.perf_counter()
+        params = {"limit": limit}
+        filters = []
+        if start is not None:
+            filters.append("d.timestamp >= :start")
+            params["start"] = pd.Timestamp(start).to_pydatetime()
+        if end is not None:
+            filters.append("d.timestamp <= :end")
+            params["end"] = pd.Timestamp(end).to_pydatetime()
+        if source is not None:
+            filters.append("d.source = :source")
+            params["source"] = source
+        columns = "d.id, d.timestamp, d.source, d.text, d.sentiment_score, d.sentiment_magnitude, d.keywords"
+
+        if not self.full_text_search:
+            where = " AND ".join(["d.text LIKE :pattern"] + filters)
+            params["pattern"] = f"%{query}%"
+            sql = f"SELECT {columns}, 0.0 AS rank FROM sentiment_data d WHERE {where} ORDER BY d.timestamp DESC LIMIT :limit"
+        elif self.db_type == "sqlite":
+            params["query"] = _to_fts5_query(query)
+            if not params["query"]:
+                return pd.DataFrame()
+            where = " AND ".join(["sentiment_fts MATCH :query"] + filters)
+            # bm25() is lower for better matches
+            sql = (f"SELECT {columns}, -bm25(sentiment_fts) AS rank FROM sentiment_fts "
+                   f"JOIN sentiment_data d ON d.id = sentiment_fts.rowid WHERE {where} ORDER BY rank DESC LIMIT :limit")
+        else:
+            params["query"] = query
+            where = " AND ".join(["d.text_tsv @@ websearch_to_tsquery('english', :query)"] + filters)
+            sql = (f"SELECT {columns}, ts_rank(d.text_tsv, websearch_to_tsquery('english', :query)) AS rank "
+                   f"FROM sentiment_data d WHERE {where} ORDER BY rank DESC LIMIT :limit")
+
+        try:
+            with self.engine.connect() as conn:
+                result = conn.execute(text(sql), params)
+                results = pd.DataFrame(result.fetchall(), columns=list(result.keys()))
+            if not results.empty:
+                # Raw SQL returns SQLite timestamps as text, with or without fractional seconds
+                results["timestamp"] = pd.to_datetime(results["timestamp"], format="ISO8601")
+            logger.debug("search_sentiment({!r}) returned {} rows in {:.1f} ms", query, len(results), (time.perf_counter() - started) * 1000)
+            return results
+        except Exception as e:
+            logger.error(f"Error searching sentiment data: {e}")
+            return pd.DataFrame()
+
     def add_trade_log(self, data):
         session = self.get_session()
         try:
             trade_log = TradeLog(**data)
             session.add(trade_log)
             session.commit()
-            logger.debug(f"Added trade log for {data.get("tradingsymbol")}")
+            logger.debug("Added trade log for {}", data.get("tradingsymbol"))
         except Exception as e:
             session.rollback()
             logger.error(f"Error adding trade log: {e}")
@@ -137,7 +391,7 @@ class DatabaseManager:
             metric = PerformanceMetric(**data)
             session.add(metric)
             session.commit()
-            logger.debug(f"Added performance metric {data.get("metric_name")}")
+            logger.debug("Added performance metric {}", data.get("metric_name"))
         except Exception as e:
             session.rollback()
             logger.error(f"Error adding performance metric: {e}")
@@ -150,7 +404,7 @@ class DatabaseManager:
             metric = RiskMetric(**data)
             session.add(metric)
             session.commit()
-            logger.debug(f"Added risk metric {data.get("metric_name")}")
+            logger.debug("Added risk metric {}", data.get("metric_name"))
         except Exception as e:
             session.rollback()
             logger.error(f"Error adding risk metric: {e}")
@@ -163,13 +417,30 @@ class DatabaseManager:
             checkpoint = ModelCheckpoint(**data)
             session.add(checkpoint)
             session.commit()
-            logger.debug(f"Added model checkpoint for {data.get("model_name")}")
+            logger.debug("Added model checkpoint for {}", data.get("model_name"))
         except Exception as e:
             session.rollback()
             logger.error(f"Error adding model checkpoint: {e}")
         finally:
             session.close()
 
+    def delete_model_checkpoints(self, model_paths):
+        # Drops the rows of checkpoint files that retention has deleted from disk
+        if not model_paths:
+            return 0
+        session = self.get_session()
+        try:
+            deleted = session.query(ModelCheckpoint).filter(ModelCheckpoint.model_path.in_(list(model_paths))).delete(synchronize_session=False)
+            session.commit()
+            logger.debug("Deleted {} model checkpoint rows", deleted)
+            return deleted
+        except Exception as e:
+            session.rollback()
+            logger.error(f"Error deleting model checkpoints: {e}")
+            return 0
+        finally:
+            session.close()
+
     def get_latest_model_checkpoint(self, model_name):
         session = self.get_session()
         try:
@@ -1,6 +1,76 @@
+import sys
+import threading
+import time
 from loguru import logger
 from .config_manager import config
 
-logger.add(config.get("logging.file"), rotation="500 MB")
+LOG_LEVEL = config.get("logging.level", "INFO")
 
+# Replace loguru's default DEBUG stderr sink so the configured level applies everywhere.
+# enqueue=True hands records to a background writer, so callers never block on console or disk I/O.
+logger.remove()
+logger.add(sys.stderr, level=LOG_LEVEL, enqueue=True)
+if config.get("logging.file"):
+    logger.add(config.get("logging.file"), level=LOG_LEVEL, rotation="500 MB", enqueue=True)
 
+_MIN_LEVEL_NO = logger.level(LOG_LEVEL).no
+_level_cache = {}
+
+def is_enabled(level):
+    # Cheap guard for call sites that must do real work just to build a log message
+    enabled = _level_cache.get(level)
+    if enabled is None:
+        enabled = _level_cache[level] = logger.level(level).no >= _MIN_LEVEL_NO
+    return enabled
+
+class _CallSiteLimiter:
+    # Per-key state for rate-limited and sampled logging. Counts of dropped records are added to
+    # the next record that gets through, so nothing disappears silently.
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._last_emit = {}
+        self._calls = {}
+        self._suppressed = {}
+
+    def allow_interval(self, key, interval_seconds):
+        now = time.monotonic()
+        with self._lock:
+            last = self._last_emit.get(key)
+            if last is not None and now - last < interval_seconds:
+                self._suppressed[key] = self._suppressed.get(key, 0) + 1
+                return None
+            self._last_emit[key] = now
+            return self._suppressed.pop(key, 0)
+
+    def allow_every(self, key, every_n):
+        with self._lock:
+            calls = self._calls.get(key, 0)
+            self._calls[key] = calls + 1
+            if calls % every_n:
+                self._suppressed[key] = self._suppressed.get(key, 0) + 1
+                return None
+            return self._suppressed.pop(key, 0)
+
+_limiter = _CallSiteLimiter()
+
+def _emit(level, message, suppressed, args, kwargs):
+    if suppressed:
+        message = f"{message} [{suppressed} similar suppressed]"
+    logger.opt(depth=2).log(level, message, *args, **kwargs)
+
+def log_every(key, interval_seconds, level, message, *args, **kwargs):
+    # At most one record per `interval_seconds` for call site `key`; formatting is lazy ({} placeholders)
+    if not is_enabled(level):
+        return
+    suppressed = _limiter.allow_interval(key, interval_seconds)
+    if suppressed is not None:
+        _emit(level, message, suppressed, args, kwargs)
+
+def log_sampled(key, every_n, level, message, *args, **kwargs):
+    # One record out of every `every_n` calls for call site `key`
+    if not is_enabled(level):
+        return
+    suppressed = _limiter.allow_every(key, every_n)
+    if suppressed is not None:
+        _emit(level, message, suppressed, args, kwargs)
@@ -0,0 +1,168 @@
+import cProfile
+import io
+import json
+import os
+import pstats
+import resource
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from datetime import datetime
+from .config_manager import config
+from .logger import logger
+
+def current_rss_mb():
+    # Resident set size from /proc (Linux); falls back to the lifetime peak elsewhere
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1024 ** 2
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+class _RssSampler:
+    # Polls RSS on a daemon thread so a stage's peak is caught even if memory is freed before it ends
+    def __init__(self, interval=0.05):
+        self.interval = interval
+        self.peak_mb = current_rss_mb()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="rss-sampler", daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.peak_mb = max(self.peak_mb, current_rss_mb())
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self._stop.set()
+        self._thread.join()
+        self.peak_mb = max(self.peak_mb, current_rss_mb())
+
+class StageProfiler:
+    # Records wall/CPU time, rows in/out, rows/sec and peak RSS for each named stage of a run,
+    # plus per-episode step throughput. Stages listed in cprofile_stages (or "*") also run under
+    # cProfile; stage_hook(name) may return any other context manager, e.g. a sampling profiler.
+
+    def __init__(self, run_name, report_dir=None, cprofile_stages=None, stage_hook=None, persist_metrics=True):
+        self.run_name = run_name
+        self.run_id = datetime.now().strftime("%Y%m%dT%H%M%S")
+        self.report_dir = report_dir
+        self.cprofile_stages = set(cprofile_stages or [])
+        self.stage_hook = stage_hook
+        self.persist_metrics = persist_metrics
+        self.stages = []
+        self.episodes = []
+        self._started = time.perf_counter()
+        logger.info(f"StageProfiler initialized for {run_name} (run {self.run_id}).")
+
+    @classmethod
+    def from_config(cls, run_name, stage_hook=None):
+        return cls(run_name,
+                   report_dir=config.get("profiling.report_dir"),
+                   cprofile_stages=config.get("profiling.cprofile_stages", []),
+                   stage_hook=stage_hook,
+                   persist_metrics=config.get("profiling.persist_metrics", True))
+
+    @contextmanager
+    def stage(self, name, rows_in=None):
+        # The yielded dict is the stage record; set record["rows_out"] inside the block
+        record = {"stage": name, "rows_in": rows_in, "rows_out": None}
+        profile = cProfile.Profile() if name in self.cprofile_stages or "*" in self.cprofile_stages else None
+        hook = self.stage_hook(name) if self.stage_hook else nullcontext()
+        rss_before = current_rss_mb()
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        try:
+            with _RssSampler() as sampler, hook:
+                if profile:
+                    profile.enable()
+                try:
+                    yield record
+                finally:
+                    if profile:
+                        profile.disable()
+        finally:
+            record["wall_s"] = time.perf_counter() - wall_start
+            record["cpu_s"] = time.process_time() - cpu_start
+            record["rss_before_mb"] = round(rss_before, 1)
+            record["peak_rss_mb"] = round(sampler.peak_mb, 1)
+            record["rss_after_mb"] = round(current_rss_mb(), 1)
+            rows = record["rows_out"] if record["rows_out"] is not None else record["rows_in"]
+            record["rows_per_sec"] = rows / record["wall_s"] if rows and record["wall_s"] > 0 else None
+            if profile:
+                record["profile"] = self._save_profile(name, profile)
+            self.stages.append(record)
+            logger.info(f"Stage {name}: {record['wall_s']:.2f}s wall, {record['cpu_s']:.2f}s CPU, "
+                        f"rows {record['rows_in']} -> {record['rows_out']}, peak RSS {record['peak_rss_mb']} MB")
+
+    def _save_profile(self, name, profile):
+        stream = io.StringIO()
+        pstats.Stats(profile, stream=stream).sort_stats("cumulative").print_stats(25)
+        result = {"top_cumulative": stream.getvalue()}
+        if self.report_dir:
+            os.makedirs(self.report_dir, exist_ok=True)
+            path = os.path.join(self.report_dir, f"{self.run_name}_{self.run_id}_{name}.prof")
+            profile.dump_stats(path)
+            result["path"] = path
+        return result
+
+    def record_episode(self, episode, steps, wall_s, total_reward=None):
+        steps_per_sec = steps / wall_s if wall_s > 0 else None
+        self.episodes.append({"episode": episode, "steps": steps, "wall_s": wall_s,
+                              "steps_per_sec": steps_per_sec, "total_reward": total_reward})
+        return steps_per_sec
+
+    def summary(self):
+        episode_steps = sum(e["steps"] for e in self.episodes)
+        episode_time = sum(e["wall_s"] for e in self.episodes)
+        return {
+            "run_name": self.run_name,
+            "run_id": self.run_id,
+            "total_wall_s": time.perf_counter() - self._started,
+            "stages": self.stages,
+            "episodes": {
+                "count": len(self.episodes),
+                "total_steps": episode_steps,
+                "mean_steps_per_sec": episode_steps / episode_time if episode_time > 0 else None,
+                "per_episode": self.episodes,
+            },
+        }
+
+    def write_report(self, path=None):
+        path = path or (os.path.join(self.report_dir, f"{self.run_name}_{self.run_id}.json") if self.report_dir else None)
+        if not path:
+            return None
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            with open(path, "w") as f:
+                json.dump(self.summary(), f, indent=2, default=str)
+            logger.info(f"Run report written to {path}")
+            return path
+        except Exception as e:
+            logger.error(f"Error writing run report: {e}")
+            return None
+
+    def persist(self):
+        # Imported here so profiling does not require a reachable database
+        from .database import db_manager
+        period = self.run_id
+        for record in self.stages:
+            for key in ("wall_s", "cpu_s", "peak_rss_mb", "rows_per_sec"):
+                if record.get(key) is not None:
+                    db_manager.add_performance_metric({"metric_name": f"{record['stage']}.{key}"[:50],
+                                                       "metric_value": float(record[key]), "period": period})
+        summary = self.summary()["episodes"]
+        if summary["mean_steps_per_sec"] is not None:
+            db_manager.add_performance_metric({"metric_name": "training.steps_per_sec",
+                                               "metric_value": float(summary["mean_steps_per_sec"]), "period": period})
+
+    def finish(self):
+        report_path = self.write_report()
+        if self.persist_metrics:
+            try:
+                self.persist()
+            except Exception as e:
+                logger.error(f"Error persisting stage metrics: {e}")
+        return report_path
@@ -0,0 +1,383 @@
+import contextvars
+import functools
+import json
+import os
+import queue
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from time import perf_counter_ns
+import numpy as np
+import requests
+from .config_manager import config
+from .logger import logger, log_every
+
+# Latency tracing for the live path (quote -> normalisation -> features -> state -> action -> order).
+# Spans use the monotonic perf_counter_ns clock and feed per-stage log-linear histograms; spans that
+# run while a market event is open on the current thread/task are also attached to that event.
+
+_SIGNIFICANT_BITS = 5 # 16 sub-buckets per power of two, i.e. at most ~3% relative error
+_FOLD_THRESHOLD = 8192 # pending samples that wake the background thread early to fold
+_FOLD_INTERVAL_SECONDS = 0.5
+
+class LatencyHistogram:
+    # record() only appends to `pending`; samples are bucketed in numpy batches by fold(), which
+    # the tracer runs on its background thread (and summaries run before reading), so the per-span
+    # cost stays a list append. `pending` is never
+    # replaced: fold() and take() remove the first n samples in place, so samples appended by other
+    # threads meanwhile stay queued for the next fold instead of being lost.
+    def __init__(self):
+        self.pending = []
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self.counts = {}
+        self.count = 0
+        self.total_ns = 0
+        self.min_ns = None
+        self.max_ns = 0
+
+    def record(self, ns):
+        self.pending.append(ns)
+
+    def _drain_pending(self):
+        pending = self.pending
+        n = len(pending)
+        batch = pending[:n]
+        del pending[:n]
+        return batch
+
+    def fold(self):
+        with self._lock:
+            self._fold(self._drain_pending())
+
+    def _fold(self, samples):
+        if not samples:
+            return
+        values = np.maximum(np.asarray(samples, dtype=np.int64), 1)
+        shift = np.maximum(np.frexp(values.astype(np.float64))[1] - _SIGNIFICANT_BITS, 0)
+        keys, counts = np.unique((shift << _SIGNIFICANT_BITS) | (values >> shift), return_counts=True)
+        for key, n in zip(keys.tolist(), counts.tolist()):
+            self.counts[key] = self.counts.get(key, 0) + n
+        self.count += len(values)
+        self.total_ns += int(values.sum())
+        self.max_ns = max(self.max_ns, int(values.max()))
+        low = int(values.min())
+        self.min_ns = low if self.min_ns is None else min(self.min_ns, low)
+
+    def take(self):
+        # Moves everything recorded so far into a new histogram and resets this one in place;
+        # cheap enough for the hot path since the bucketing is left to whoever summarises the copy
+        taken = LatencyHistogram()
+        with self._lock:
+            taken.pending = self._drain_pending()
+            taken.counts, taken.count, taken.total_ns = self.counts, self.count, self.total_ns
+            taken.min_ns, taken.max_ns = self.min_ns, self.max_ns
+            self._reset()
+        return taken
+
+    def percentile(self, q):
+        self.fold()
+        if not self.count:
+            return None
+        target = q / 100.0 * self.count
+        seen = 0
+        for key in sorted(self.counts):
+            seen += self.counts[key]
+            if seen >= target:
+                shift, mantissa = key >> _SIGNIFICANT_BITS, key & ((1 << _SIGNIFICANT_BITS) - 1)
+                # Midpoint of the bucket, clamped to the exact extremes
+                value = ((mantissa << shift) + (((mantissa + 1) << shift) - 1)) / 2
+                return min(max(value, self.min_ns), self.max_ns)
+        return self.max_ns
+
+    def summary(self):
+        self.fold()
+        if not self.count:
+            return {"count": 0}
+        to_us = lambda ns: round(ns / 1000.0, 3)
+        return {
+            "count": self.count,
+            "mean_us": to_us(self.total_ns / self.count),
+            "min_us": to_us(self.min_ns),
+            "p50_us": to_us(self.percentile(50)),
+            "p99_us": to_us(self.percentile(99)),
+            "p99_9_us": to_us(self.percentile(99.9)),
+            "max_us": to_us(self.max_ns),
+        }
+
+class EventTrace:
+    __slots__ = ("key", "start_ns", "spans")
+
+    def __init__(self, key, start_ns):
+        self.key = key
+        self.start_ns = start_ns
+        self.spans = []
+
+    def to_dict(self):
+        return {"key": str(self.key),
+                "spans": [{"stage": stage, "offset_us": (start - self.start_ns) / 1000.0, "duration_us": duration / 1000.0}
+                          for stage, start, duration in self.spans]}
+
+def _span_class(name, histogram, current, wake):
+    # One span class per stage, built once, with everything __exit__ needs bound as closure
+    # variables: opening a span is a plain slot allocation and closing it is two clock reads, a
+    # list append and a context variable read, with no attribute or dict lookups. Folding never
+    # happens here: a full pending list only wakes the tracer's background thread.
+    pending = histogram.pending
+    current_event = current.get
+    clock = perf_counter_ns
+
+    class _Span:
+        __slots__ = ("start",)
+
+        def __enter__(self):
+            self.start = clock()
+            return self
+
+        def __exit__(self, exc_type, exc_value, traceback):
+            start = self.start
+            duration = clock() - start
+            pending.append(duration)
+            if len(pending) >= _FOLD_THRESHOLD:
+                wake()
+            event = current_event()
+            if event is not None:
+                event.spans.append((name, start, duration))
+            return False
+
+    return _Span
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+_NOOP_SPAN = _NoopSpan()
+
+class Tracer:
+    # A background thread folds pending samples into the histograms (every 0.5s, or sooner when a
+    # stage has _FOLD_THRESHOLD samples waiting) and writes periodic exports: end_event() only
+    # detaches the interval's histograms and queues them (dropping the interval if
+    # `export_queue_size` are already waiting), so neither bucketing nor file writes and HTTP posts
+    # delay the order path.
+    #
+    # Market events are keyed, typically by instrument: begin_event(key) opens (or restarts) the
+    # event for that key and end_event(key) closes that same event, so an order is measured from
+    # the tick of its own instrument rather than from whichever quote arrived last.
+
+    def __init__(self, enabled=True, export_path=None, export_url=None, export_interval_seconds=60, max_events=1000,
+                 export_queue_size=4):
+        self.enabled = enabled
+        self.export_path = export_path
+        self.export_url = export_url
+        self.export_interval_seconds = export_interval_seconds
+        self._lock = threading.Lock()
+        self._histograms = {}
+        self._span_classes = {}
+        self._events = deque(maxlen=max_events)
+        self._open_events = {} # key -> EventTrace not yet ended
+        self._current = contextvars.ContextVar("market_event_trace", default=None)
+        self._last_export = time.monotonic()
+        self._export_queue = queue.Queue(maxsize=export_queue_size)
+        self._wake = threading.Event()
+        self._exporter = None
+        self._closed = False
+        self.dropped_exports = 0
+        logger.info("Tracer initialized.")
+
+    @classmethod
+    def from_config(cls):
+        return cls(enabled=config.get("tracing.enabled", True),
+                   export_path=config.get("tracing.export_path"),
+                   export_url=config.get("tracing.export_url"),
+                   export_interval_seconds=config.get("tracing.export_interval_seconds", 60),
+                   max_events=config.get("tracing.max_events", 1000),
+                   export_queue_size=config.get("tracing.export_queue_size", 4))
+
+    def span(self, stage):
+        # `with tracer.span("features"):` times the block
+        if not self.enabled:
+            return _NOOP_SPAN
+        try:
+            return self._span_classes[stage]()
+        except KeyError:
+            return self._new_span_class(stage)()
+
+    def _new_span_class(self, stage):
+        histogram = self._histogram(stage)
+        with self._lock:
+            span_class = self._span_classes.get(stage)
+            if span_class is None:
+                span_class = self._span_classes[stage] = _span_class(stage, histogram, self._current, self._wake.set)
+        return span_class
+
+    def _histogram(self, stage):
+        histogram = self._histograms.get(stage)
+        if histogram is None:
+            with self._lock:
+                histogram = self._histograms.setdefault(stage, LatencyHistogram())
+            self._start_background()
+        return histogram
+
+    def record(self, stage, start_ns, duration_ns):
+        self._histogram(stage).record(duration_ns)
+        event = self._current.get()
+        if event is not None:
+            event.spans.append((stage, start_ns, duration_ns))
+
+    def begin_event(self, key=None, attach=True):
+        # Marks the arrival of a market event for `key`, replacing an event for the same key that
+        # never reached end_event(). With attach, spans in this thread/task are attached to it.
+        if not self.enabled:
+            return None
+        event = EventTrace(key, perf_counter_ns())
+        self._open_events[key] = event
+        if attach:
+            self._current.set(event)
+        return event
+
+    def end_event(self, key=None, stage="tick_to_order"):
+        # Records the end-to-end latency of the open event for `key` under `stage`
+        event = self._open_events.pop(key, None) if self.enabled else None
+        if event is None:
+            return None
+        now = perf_counter_ns()
+        if self._current.get() is event:
+            self._current.set(None)
+        self.record(stage, event.start_ns, now - event.start_ns)
+        self._events.append(event)
+        if self.export_interval_seconds and time.monotonic() - self._last_export >= self.export_interval_seconds:
+            self._queue_export()
+        return event
+
+    def current_event(self):
+        return self._current.get()
+
+    def open_event(self, key=None):
+        return self._open_events.get(key)
+
+    def _take(self, reset):
+        # Histograms and events of the interval. With reset the live histograms are drained in place
+        # rather than replaced, so spans still open keep recording and land in the next interval.
+        with self._lock:
+            histograms = dict(self._histograms)
+        if not reset:
+            return histograms, list(self._events)
+        events = []
+        while True:
+            try:
+                events.append(self._events.popleft())
+            except IndexError:
+                break
+        return {stage: histogram.take() for stage, histogram in histograms.items()}, events
+
+    def _report(self, histograms, events):
+        return {
+            "timestamp": datetime.now().isoformat(),
+            "stages": {stage: histogram.summary() for stage, histogram in histograms.items() if histogram.count or histogram.pending},
+            "events": [event.to_dict() for event in events],
+        }
+
+    def snapshot(self, reset=False):
+        return self._report(*self._take(reset))
+
+    def _queue_export(self):
+        self._last_export = time.monotonic()
+        try:
+            self._export_queue.put_nowait(self._take(reset=True))
+        except queue.Full:
+            self.dropped_exports += 1
+            log_every("tracing.export_dropped", 60, "WARNING", "Latency trace exporter is behind; dropped {} intervals so far.",
+                      self.dropped_exports)
+        self._start_background()
+        self._wake.set()
+
+    def _start_background(self):
+        if self._exporter is None:
+            with self._lock:
+                if self._exporter is None and not self._closed:
+                    self._exporter = threading.Thread(target=self._background_loop, name="trace-exporter", daemon=True)
+                    self._exporter.start()
+
+    def _fold_all(self):
+        with self._lock:
+            histograms = list(self._histograms.values())
+        for histogram in histograms:
+            histogram.fold()
+
+    def _background_loop(self):
+        while True:
+            self._wake.wait(_FOLD_INTERVAL_SECONDS)
+            self._wake.clear()
+            try:
+                self._fold_all()
+            except Exception as e:
+                logger.error(f"Error folding latency samples: {e}")
+            while True:
+                try:
+                    item = self._export_queue.get_nowait()
+                except queue.Empty:
+                    break
+                try:
+                    if item is None:
+                        return
+                    self._write(self._report(*item))
+                except Exception as e:
+                    logger.error(f"Error exporting latency traces: {e}")
+                finally:
+                    self._export_queue.task_done()
+
+    def flush(self):
+        # Blocks until every queued interval has been written
+        self._wake.set()
+        self._export_queue.join()
+
+    def close(self):
+        with self._lock:
+            exporter, self._exporter, self._closed = self._exporter, None, True
+        if exporter is not None:
+            self._export_queue.put(None)
+            self._wake.set()
+            exporter.join()
+
+    def export(self, path=None, reset=True):
+        # Synchronous export of the current interval, for shutdown and manual calls
+        self._last_export = time.monotonic()
+        report = self.snapshot(reset=reset)
+        self._write(report, path)
+        return report
+
+    def _write(self, report, path=None):
+        # Appends one JSON line per interval to the export file and/or POSTs it to the endpoint
+        path = path or self.export_path
+        if path:
+            try:
+                os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+                with open(path, "a") as f:
+                    f.write(json.dumps(report) + "\n")
+            except Exception as e:
+                logger.error(f"Error exporting latency traces to {path}: {e}")
+        if self.export_url:
+            try:
+                requests.post(self.export_url, json=report, timeout=5)
+            except Exception as e:
+                logger.error(f"Error exporting latency traces to {self.export_url}: {e}")
+
+tracer = Tracer.from_config()
+
+def traced(stage):
+    # Decorator form of tracer.span for whole functions
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with tracer.span(stage):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,89 @@
+import numpy as np
+import pandas as pd
+import pytest
+from nifty_trading_agent.src.backtesting.backtest_engine import (
+    BacktestEngine, TRADE_LOG_COLUMNS, monthly_expiries, sma_crossover_signal, walk_forward_splits
+)
+
+def _bars(closes, start="2024-01-29 15:27"):
+    # Gapless bars: each opens at the previous close
+    closes = np.asarray(closes, dtype=np.float64)
+    return pd.DataFrame({"timestamp": pd.date_range(start, periods=len(closes), freq="min"),
+                         "open": np.concatenate([closes[:1], closes[:-1]]), "close": closes})
+
+def _frictionless(**kwargs):
+    params = dict(lot_size=10, initial_capital=100000, slippage_bps=0.0, brokerage_per_order=0.0, stt_sell_rate=0.0,
+                  exchange_txn_rate=0.0, gst_rate=0.0, stamp_duty_buy_rate=0.0)
+    params.update(kwargs)
+    return BacktestEngine(**params)
+
+def test_signal_fills_next_bar_and_pnl_follows_position():
+    bars = _bars([100, 100, 102, 105, 103, 103])
+    result = _frictionless().run(bars, [1, 1, 1, -1, 0, 0], expiries=["2024-02-29"])
+    np.testing.assert_array_equal(result["bars"]["position"], [0, 1, 1, 1, -1, 0])
+    # Long from 100 to 105, then short from 105 to 103
+    np.testing.assert_allclose(result["bars"]["net_pnl"], [0, 0, 20, 30, 20, 0])
+    assert result["stats"]["total_pnl"] == pytest.approx(70)
+
+    trades = result["trades"]
+    assert list(trades.columns) == TRADE_LOG_COLUMNS
+    assert list(trades["transaction_type"]) == ["BUY", "SELL", "BUY"]
+    assert list(trades["quantity"]) == [10, 20, 10]
+    assert trades["pnl"].sum() == pytest.approx(70)
+    assert set(trades["tradingsymbol"]) == {"NIFTY24FEBFUT"}
+
+def test_trade_records_reconcile_when_the_position_is_open_at_the_end():
+    bars = _bars([100, 100, 101, 103, 102, 104, 106, 105, 107, 108])
+    result = _frictionless(slippage_bps=1.0, brokerage_per_order=20.0).run(bars, [1] * 10, expiries=["2024-02-29"])
+    trades = result["trades"]
+    assert list(trades["status"]) == ["BACKTEST", "BACKTEST_MARK"]
+    assert list(trades["transaction_type"]) == ["BUY", "SELL"]
+    assert trades["price"].iloc[-1] == 108
+    # The mark carries everything accrued after the opening fill
+    assert trades["pnl"].iloc[-1] == pytest.approx(result["bars"]["net_pnl"].iloc[2:].sum())
+    assert trades["pnl"].sum() == pytest.approx(result["stats"]["total_pnl"])
+
+def test_costs_and_expiry_roll():
+    # 2024-01-25 is January's monthly expiry; bars span it, so the long position is rolled once
+    bars = _bars([100.0] * 4, start="2024-01-25 15:28")
+    bars["timestamp"] = pd.to_datetime(["2024-01-25 15:28", "2024-01-25 15:29", "2024-01-29 09:15", "2024-01-29 09:16"])
+    engine = _frictionless(stt_sell_rate=0.001, brokerage_per_order=20.0, brokerage_rate=1.0)
+    result = engine.run(bars, [1, 1, 1, 1])
+    assert result["stats"]["n_rolls"] == 1
+    trades = result["trades"]
+    # The position is still open at the end, so a mark closes it in the February contract
+    assert list(trades["status"]) == ["BACKTEST", "BACKTEST_ROLL", "BACKTEST_ROLL", "BACKTEST_MARK"]
+    assert list(trades["tradingsymbol"]) == ["NIFTY24JANFUT", "NIFTY24JANFUT", "NIFTY24FEBFUT", "NIFTY24FEBFUT"]
+    assert trades["pnl"].sum() == pytest.approx(result["stats"]["total_pnl"])
+    # Opening buy: one order; roll: two orders plus STT on the 1,000 sold
+    np.testing.assert_allclose(result["bars"]["costs"], [0, 20 + 40 + 1.0, 0, 0])
+
+def test_walk_forward_and_expiry_calendar():
+    splits = walk_forward_splits(100, 40, 20)
+    assert [(train[0], train[-1], test[0], test[-1]) for train, test in splits] == [(0, 39, 40, 59), (20, 59, 60, 79), (40, 79, 80, 99)]
+    assert walk_forward_splits(100, 40, 20, expanding=True)[-1][0][0] == 0
+    assert list(monthly_expiries("2024-01-05", "2024-02-10").strftime("%Y-%m-%d")) == ["2024-01-25", "2024-02-29", "2024-03-28"]
+
+    rng = np.random.default_rng(0)
+    bars = _bars(20000 + np.cumsum(rng.normal(0, 5, 3000)), start="2024-01-01 09:15")
+    report = _frictionless().walk_forward(bars, sma_crossover_signal, {"fast": [5, 10], "slow": [50]}, train_size=1000, test_size=500)
+    assert len(report) == 4
+    assert set(report.columns) >= {"params", "train_sharpe", "test_total_pnl", "test_n_trades"}
+    # The pooled scoring picks what scoring the first train window serially would
+    train = bars.iloc[:1000].reset_index(drop=True)
+    serial = {fast: _frictionless().run(train, sma_crossover_signal(train, fast, 50), with_trades=False)["stats"]["sharpe"]
+              for fast in [5, 10]}
+    assert report["params"].iloc[0]["fast"] == max(serial, key=serial.get)
+    assert report["train_sharpe"].iloc[0] == pytest.approx(max(serial.values()))
+
+def test_grid_search_matches_serial_runs():
+    rng = np.random.default_rng(1)
+    bars = _bars(20000 + np.cumsum(rng.normal(0, 5, 1500)), start="2024-01-01 09:15")
+    engine = _frictionless()
+    grid = {"fast": [5, 10], "slow": [50, 100]}
+    report = engine.grid_search(bars, sma_crossover_signal, grid, max_workers=2)
+    assert list(report[["fast", "slow"]].itertuples(index=False, name=None)) == [(5, 50), (5, 100), (10, 50), (10, 100)]
+    for row in report.itertuples():
+        serial = engine.run(bars, sma_crossover_signal(bars, row.fast, row.slow), with_trades=False)["stats"]
+        assert row.total_pnl == pytest.approx(serial["total_pnl"])
+        assert row.n_trades == serial["n_trades"]
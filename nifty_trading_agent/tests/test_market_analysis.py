@@ -0,0 +1,249 @@
+import os
+import pytest
+import numpy as np
+import pandas as pd
+from scipy.stats import norm
+from nifty_trading_agent.src.market_analysis.volatility_analyzer import VolatilityAnalyzer
+from nifty_trading_agent.src.market_analysis.volatility_regime_model import VolatilityRegimeModel
+from nifty_trading_agent.src.market_analysis.realized_volatility import StreamingVolatilityEstimator, periods_per_year
+from nifty_trading_agent.src.market_analysis.correlation_analyzer import CorrelationAnalyzer
+from nifty_trading_agent.src.market_analysis.rolling_covariance import RollingCovarianceMatrix
+from nifty_trading_agent.src.market_analysis.volatility_surface import VolatilitySurface, implied_volatility
+
+@pytest.fixture
+def volatility_analyzer(tmp_path):
+    return VolatilityAnalyzer(regime_model_path=str(tmp_path / "volatility_regimes.npz"))
+
+@pytest.fixture
+def market_df():
+    rng = np.random.default_rng(42)
+    n = 400
+    close = 18000 * np.exp(np.cumsum(rng.normal(0, 0.01, n)))
+    open_ = close * np.exp(rng.normal(0, 0.002, n))
+    high = np.maximum(open_, close) * (1 + rng.uniform(0, 0.005, n))
+    low = np.minimum(open_, close) * (1 - rng.uniform(0, 0.005, n))
+    return pd.DataFrame({
+        "timestamp": pd.date_range("2023-01-02", periods=n, freq="D"),
+        "open": open_, "high": high, "low": low, "close": close,
+        "volume": rng.integers(1000, 5000, n)
+    })
+
+def test_volatility_cones_match_rolling_std(volatility_analyzer, market_df):
+    periods = [20, 60, 120]
+    cones = volatility_analyzer.calculate_volatility_cones(market_df, periods=periods)
+    log_returns = np.log(market_df["close"] / market_df["close"].shift(1))
+    for p in periods:
+        expected = log_returns.rolling(window=p).std() * np.sqrt(252)
+        pd.testing.assert_series_equal(cones[f"Vol_{p}"], expected, check_names=False, rtol=1e-9)
+
+def test_volatility_cone_bands(volatility_analyzer, market_df):
+    bands = volatility_analyzer.calculate_volatility_cone_bands(market_df, periods=[20, 60, 500], percentiles=[25, 50, 75])
+    assert list(bands.columns) == ["Min", "P25", "P50", "P75", "Max", "Current"]
+    assert (bands.loc[20, "Min"] <= bands.loc[20, "P25"] <= bands.loc[20, "P50"] <= bands.loc[20, "P75"] <= bands.loc[20, "Max"])
+    assert bands.loc[60, "Min"] <= bands.loc[60, "Current"] <= bands.loc[60, "Max"]
+    # Window longer than the history has no cone
+    assert bands.loc[500].isna().all()
+
+def test_volatility_regime_model_ordered_and_persisted(volatility_analyzer, market_df, tmp_path):
+    df = volatility_analyzer.identify_volatility_regimes(market_df)
+    features = df.dropna(subset=["Historical_Volatility", "Parkinson_Volatility", "Garman_Klass_Volatility"])
+    model = VolatilityRegimeModel(n_clusters=3).fit(features)
+    levels = (model.centroids_ * model.scale_ + model.mean_).mean(axis=1)
+    assert np.all(np.diff(levels) >= 0)
+
+    path = str(tmp_path / "regimes.npz")
+    model.save(path)
+    loaded = VolatilityRegimeModel.load(path)
+    batch = loaded.predict(features)
+    np.testing.assert_array_equal(batch, model.predict(features))
+    row = features[loaded.feature_cols].iloc[-1].tolist()
+    assert loaded.predict_one(row) == batch[-1]
+
+    loaded.partial_fit(features.tail(50))
+    assert loaded.counts_.sum() == model.counts_.sum() + 50
+
+def test_identify_volatility_regimes_reuses_persisted_model(volatility_analyzer, market_df, monkeypatch):
+    # Analysis alone never writes a model file
+    volatility_analyzer.identify_volatility_regimes(market_df, instrument="NIFTY")
+    assert not os.path.exists(volatility_analyzer.regime_model_path_for("NIFTY"))
+
+    model = volatility_analyzer.fit_regime_model(market_df, instrument="NIFTY")
+    path = volatility_analyzer.regime_model_path_for("NIFTY")
+    assert path.endswith("volatility_regimes_NIFTY.npz") and os.path.exists(path)
+    first = volatility_analyzer.identify_volatility_regimes(market_df, instrument="NIFTY")
+
+    # Later calls, including from a fresh analyzer on the same path, never refit
+    def fail_fit(self, X):
+        raise AssertionError("regime model refitted")
+    monkeypatch.setattr(VolatilityRegimeModel, "fit", fail_fit)
+    again = volatility_analyzer.identify_volatility_regimes(market_df, instrument="NIFTY")
+    restarted = VolatilityAnalyzer(regime_model_path=volatility_analyzer.regime_model_path).identify_volatility_regimes(market_df, instrument="NIFTY")
+    pd.testing.assert_series_equal(again["Volatility_Regime"], first["Volatility_Regime"])
+    pd.testing.assert_series_equal(restarted["Volatility_Regime"], first["Volatility_Regime"])
+    assert VolatilityRegimeModel.load(path).instrument == "NIFTY" and model.instrument == "NIFTY"
+
+def test_identify_volatility_regimes_refits_when_persisted_layout_differs(volatility_analyzer, market_df, monkeypatch):
+    volatility_analyzer.fit_regime_model(market_df, instrument="NIFTY", n_clusters=3)
+    fitted = []
+    original_fit = VolatilityRegimeModel.fit
+    def recording_fit(self, X):
+        fitted.append((self.n_clusters, list(self.feature_cols)))
+        return original_fit(self, X)
+    monkeypatch.setattr(VolatilityRegimeModel, "fit", recording_fit)
+
+    df = volatility_analyzer.identify_volatility_regimes(market_df, n_clusters=2, instrument="NIFTY")
+    assert fitted == [(2, ["Historical_Volatility", "Parkinson_Volatility", "Garman_Klass_Volatility"])]
+    assert set(df["Volatility_Regime"].dropna()) <= {0.0, 1.0}
+    volatility_analyzer.identify_volatility_regimes(market_df, feature_cols=["Historical_Volatility"], instrument="NIFTY")
+    assert fitted[-1] == (3, ["Historical_Volatility"])
+    # Another instrument does not borrow NIFTY's model
+    volatility_analyzer.identify_volatility_regimes(market_df, instrument="BANKNIFTY")
+    assert len(fitted) == 3
+    assert VolatilityRegimeModel.load(volatility_analyzer.regime_model_path_for("NIFTY")).n_clusters == 3
+
+def test_streaming_volatility_matches_batch_window(market_df):
+    estimator = StreamingVolatilityEstimator(["NIFTY", "BANKNIFTY"], window=20, interval="day")
+    for row in market_df.itertuples():
+        estimator.update_many(["NIFTY", "BANKNIFTY"], [row.open] * 2, [row.high] * 2, [row.low] * 2, [row.close] * 2)
+
+    log_returns = np.log(market_df["close"] / market_df["close"].shift(1))
+    expected_cc = log_returns.tail(20).std() * np.sqrt(252)
+    assert estimator.get_volatility("NIFTY", "close_to_close") == pytest.approx(expected_cc, rel=1e-9)
+    expected_park = np.sqrt((np.log(market_df["high"] / market_df["low"]) ** 2).tail(20).mean() / (4 * np.log(2)))
+    assert estimator.get_volatility("BANKNIFTY", "parkinson", annualize=False) == pytest.approx(expected_park, rel=1e-9)
+    assert not estimator.snapshot().isna().any().any()
+
+def test_streaming_volatility_intraday_scaling():
+    assert periods_per_year("day") == 252
+    assert periods_per_year("5minute") == 252 * 75
+    estimator = StreamingVolatilityEstimator(["NIFTY"], window=5, interval="minute")
+    for price in [100.0, 100.2, 99.9, 100.4]:
+        estimator.on_tick("NIFTY", price)
+    estimator.close_bar()
+    # A single bar only seeds the previous close
+    assert np.isnan(estimator.get_volatility("NIFTY"))
+
+def test_correlation_scan_matches_single_lag_calls(market_df):
+    correlation_analyzer = CorrelationAnalyzer()
+    rng = np.random.default_rng(7)
+    sentiment_df = pd.DataFrame({
+        "timestamp": market_df["timestamp"],
+        "sentiment_score": rng.normal(0, 1, len(market_df))
+    })
+    scan = correlation_analyzer.scan_price_sentiment_correlation(market_df, sentiment_df, lags=[0, 1, 3], windows=[None, 30])
+    assert len(scan) == 6
+    assert list(scan.columns) == ["lag", "window", "n_obs", "correlation", "p_value", "mean_rolling_correlation"]
+
+    for lag in [0, 1, 3]:
+        full = correlation_analyzer.calculate_price_sentiment_correlation(market_df, sentiment_df, lag=lag)
+        rolling = correlation_analyzer.calculate_price_sentiment_correlation(market_df, sentiment_df, window=30, lag=lag)
+        full_row = scan[(scan["lag"] == lag) & scan["window"].isna()].iloc[0]
+        rolling_row = scan[(scan["lag"] == lag) & (scan["window"] == 30)].iloc[0]
+        assert full_row["correlation"] == pytest.approx(full.iloc[-1], abs=1e-9)
+        assert rolling_row["correlation"] == pytest.approx(rolling.iloc[-1], abs=1e-9)
+        assert rolling_row["mean_rolling_correlation"] == pytest.approx(rolling.mean(), abs=1e-9)
+        assert 0.0 <= full_row["p_value"] <= 1.0
+
+def test_correlation_uses_sentiment_index_bucket_counts(market_df):
+    correlation_analyzer = CorrelationAnalyzer()
+    rng = np.random.default_rng(11)
+    # Three raw items per day vs. the same items pre-aggregated into minute buckets of 1 and 2 items
+    times = np.repeat(pd.to_datetime(market_df["timestamp"]).to_numpy(), 3)
+    scores = rng.normal(0, 1, len(times))
+    raw_df = pd.DataFrame({"timestamp": times, "sentiment_score": scores})
+    index_df = pd.DataFrame({
+        "timestamp": pd.to_datetime(market_df["timestamp"]).repeat(2).to_numpy() + np.tile([np.timedelta64(0, "m"), np.timedelta64(1, "m")], len(market_df)),
+        "count": np.tile([1, 2], len(market_df)),
+        "score_sum": np.column_stack([scores[0::3], scores[1::3] + scores[2::3]]).ravel(),
+    })
+    index_df["sentiment_score"] = index_df["score_sum"] / index_df["count"]
+    from_raw = correlation_analyzer.calculate_price_sentiment_correlation(market_df, raw_df)
+    from_index = correlation_analyzer.calculate_price_sentiment_correlation(market_df, index_df)
+    assert from_index.iloc[-1] == pytest.approx(from_raw.iloc[-1], abs=1e-12)
+
+def test_rolling_covariance_matrix_matches_pandas():
+    rng = np.random.default_rng(3)
+    names = ["NIFTY", "BANKNIFTY", "INDIAVIX", "SENTIMENT"]
+    data = pd.DataFrame(rng.normal(0, 1, (150, 4)), columns=names)
+    data["BANKNIFTY"] += 0.8 * data["NIFTY"]
+
+    engine = RollingCovarianceMatrix(names, window=40)
+    for row in data.to_numpy():
+        engine.update(row)
+
+    expected = data.tail(40)
+    np.testing.assert_allclose(engine.covariance(), expected.cov().to_numpy(), atol=1e-10)
+    np.testing.assert_allclose(engine.correlation(), expected.corr().to_numpy(), atol=1e-10)
+    cov, corr = engine.get_pair("NIFTY", "BANKNIFTY")
+    assert corr == pytest.approx(expected["NIFTY"].corr(expected["BANKNIFTY"]), abs=1e-10)
+
+    # Missing values carry the previous observation forward
+    engine.update({"NIFTY": 0.5})
+    assert engine._last[1] == data["BANKNIFTY"].iloc[-1]
+
+def test_volatility_surface_recovers_smile_and_refits_incrementally():
+    as_of = pd.Timestamp("2024-01-01 10:00")
+    spot, rate = 21000.0, 0.07
+    rows = []
+    for days in [7, 28, 56]:
+        t = days / 365
+        forward = spot * np.exp(rate * t)
+        for strike in np.arange(20000, 22100, 100):
+            k = np.log(strike / forward)
+            vol = np.sqrt(0.15 ** 2 + 0.1 * k * k)
+            vol_t = vol * np.sqrt(t)
+            d1 = np.log(forward / strike) / vol_t + 0.5 * vol_t
+            call = np.exp(-rate * t) * (forward * norm.cdf(d1) - strike * norm.cdf(d1 - vol_t))
+            put = call - np.exp(-rate * t) * (forward - strike)
+            expiry = as_of + pd.Timedelta(days=days)
+            rows.append({"expiry": expiry, "strike": strike, "option_type": "CE", "last_price": call, "true_iv": vol})
+            rows.append({"expiry": expiry, "strike": strike, "option_type": "PE", "last_price": put, "true_iv": vol})
+    quotes = pd.DataFrame(rows)
+
+    surface = VolatilitySurface("NIFTY", rate=rate)
+    assert len(surface.update(quotes.drop(columns="true_iv"), spot, as_of)) == 3
+    calls = quotes[quotes["option_type"] == "CE"]
+    np.testing.assert_allclose(surface.iv(calls["strike"], calls["expiry"]), calls["true_iv"], atol=1e-6)
+
+    # Unchanged quotes are not refitted; a change in one expiry refits only that expiry
+    assert surface.update(quotes.drop(columns="true_iv"), spot, as_of) == []
+    changed = quotes.copy()
+    first_expiry = changed["expiry"].min()
+    changed.loc[changed["expiry"] == first_expiry, "last_price"] *= 1.01
+    assert surface.update(changed.drop(columns="true_iv"), spot, as_of) == [first_expiry]
+
+def test_volatility_surface_reused_smile_follows_a_later_as_of():
+    expiry = pd.Timestamp("2024-01-25 15:30")
+    quotes = pd.DataFrame({"expiry": expiry, "strike": [21000.0, 21500.0, 22000.0, 22500.0, 23000.0] * 2,
+                           "option_type": ["PE"] * 5 + ["CE"] * 5, "iv": 0.2})
+    surface = VolatilitySurface("NIFTY")
+    assert surface.update(quotes, 22000.0, as_of="2024-01-15 10:00") == [expiry]
+    # Unchanged IV quotes nine days later reuse the smile, which must still read 20%
+    assert surface.update(quotes, 22000.0, as_of="2024-01-24 10:00") == []
+    np.testing.assert_allclose(surface.iv([22000.0], [expiry]), [0.2], rtol=1e-9)
+
+    # Price quotes imply different volatilities at a different time to expiry, so they are refitted
+    t = float(surface._time_to_expiry([expiry], "2024-01-15 10:00")[0])
+    forward = 22000.0 * np.exp(surface.rate * t)
+    priced = quotes.drop(columns="iv").assign(last_price=[
+        black_76(forward, strike, t, 0.2, option_type == "CE") * np.exp(-surface.rate * t)
+        for strike, option_type in zip(quotes["strike"], quotes["option_type"])])
+    surface = VolatilitySurface("NIFTY")
+    assert surface.update(priced, 22000.0, as_of="2024-01-15 10:00") == [expiry]
+    assert surface.update(priced, 22000.0, as_of="2024-01-15 10:00") == []
+    assert surface.update(priced, 22000.0, as_of="2024-01-24 10:00") == [expiry]
+
+def black_76(forward, strike, t, vol, is_call):
+    vol_t = vol * np.sqrt(t)
+    d1 = np.log(forward / strike) / vol_t + 0.5 * vol_t
+    call = forward * norm.cdf(d1) - strike * norm.cdf(d1 - vol_t)
+    return call if is_call else call - forward + strike
+
+    # Between expiries the query interpolates, beyond them it stays finite
+    iv = surface.iv_t([21000, 21000, 21000], [14 / 365, 28 / 365, 1.0])
+    assert np.all(np.isfinite(iv)) and np.all(iv > 0)
+
+def test_implied_volatility_rejects_prices_outside_bounds():
+    iv = implied_volatility([150.0, -1.0, 10.0], 100.0, 100.0, 0.5, [True, True, True])
+    assert np.isnan(iv[:2]).all()
+    assert iv[2] == pytest.approx(0.3554, abs=1e-3)
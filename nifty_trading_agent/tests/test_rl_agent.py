@@ -0,0 +1,246 @@
+import json
+import os
+from datetime import date
+import numpy as np
+import pandas as pd
+import pytest
+from nifty_trading_agent.src.rl_agent.action_space import ActionCatalogue, masked_argmax
+from nifty_trading_agent.src.rl_agent.checkpointer import ModelCheckpointer
+from nifty_trading_agent.src.rl_agent.replay_buffer import ReplayBuffer
+from nifty_trading_agent.src.rl_agent.vectorized_environment import (
+    VectorizedTradingEnvironment, batch_select_actions, batch_store_experiences
+)
+
+@pytest.fixture
+def price_frames():
+    prices = np.array([100.0, 101.0, 103.0, 102.0, 104.0, 107.0, 106.0, 108.0])
+    market = pd.DataFrame({"close": prices})
+    states = pd.DataFrame({"close_z": (prices - prices.mean()) / prices.std(), "bar": np.arange(len(prices), dtype=float)})
+    return market, states
+
+def test_vectorized_env_matches_scalar_pnl(price_frames):
+    market, states = price_frames
+    env = VectorizedTradingEnvironment(market, states, num_envs=3, episode_length=3, action_positions=[0.0, 1.0, -1.0],
+                                       lot_size=10, initial_capital=10000, transaction_cost_rate=0.001)
+    obs = env.reset(start_indices=[0, 2, 4])
+    assert obs.shape == (3, 2) and obs.dtype == np.float32
+    np.testing.assert_array_equal(obs[:, 1], [0, 2, 4])
+
+    # Long, short and flat
+    obs, rewards, dones, info = env.step([1, 2, 0])
+    expected_pnl = np.array([10 * (101 - 100) - 10 * 100 * 0.001, -10 * (102 - 103) - 10 * 103 * 0.001, 0.0])
+    np.testing.assert_allclose(info["pnl"], expected_pnl)
+    np.testing.assert_allclose(rewards, expected_pnl / 10000)
+    np.testing.assert_array_equal(info["position"], [1, -1, 0])
+    np.testing.assert_array_equal(obs[:, 1], [1, 3, 5])
+    assert not dones.any()
+
+    # Holding the position costs nothing; episodes finish together after episode_length bars
+    env.step([1, 2, 0])
+    obs, rewards, dones, info = env.step([1, 2, 0])
+    assert dones.all() and env.all_done()
+    np.testing.assert_allclose(info["equity"][0], 10000 + 10 * (102 - 100) - 1.0)
+
+    # Finished episodes stay frozen
+    obs_after, rewards, dones, info = env.step([2, 1, 1])
+    np.testing.assert_array_equal(obs_after, obs)
+    assert (rewards == 0).all() and dones.all()
+
+def test_batch_agent_interface_falls_back_to_single_transition_calls(price_frames):
+    class SingleAgent:
+        def __init__(self):
+            self.stored = []
+
+        def select_action(self, obs):
+            return int(obs[1]) % 3
+
+        def store_experience(self, *transition):
+            self.stored.append(transition)
+
+    market, states = price_frames
+    env = VectorizedTradingEnvironment(market, states, num_envs=2, episode_length=2)
+    agent = SingleAgent()
+    obs = env.reset(start_indices=[0, 1])
+    actions = batch_select_actions(agent, obs)
+    np.testing.assert_array_equal(actions, [0, 1])
+
+    active = env.active.copy()
+    active[1] = False
+    next_obs, rewards, dones, _ = env.step(actions)
+    batch_store_experiences(agent, obs, actions, rewards, next_obs, dones, mask=active)
+    assert len(agent.stored) == 1 and agent.stored[0][1] == 0
+
+class _WeightsAgent:
+    def __init__(self, value):
+        self.weights = np.full(4, value, dtype=np.float32)
+
+    def state_dict(self):
+        return {"weights": self.weights}
+
+    def load_state_dict(self, state):
+        self.weights = state["weights"].copy()
+
+def test_checkpointer_versions_retention_and_resume(tmp_path):
+    class RecordingDb:
+        def __init__(self):
+            self.rows = []
+
+        def add_model_checkpoint(self, data):
+            self.rows.append(data)
+
+        def delete_model_checkpoints(self, model_paths):
+            self.rows = [row for row in self.rows if row["model_path"] not in model_paths]
+
+    db = RecordingDb()
+    checkpointer = ModelCheckpointer(str(tmp_path), keep_best=1, keep_last=2, db=db)
+    agent = _WeightsAgent(0.0)
+    for accuracy in [0.2, 0.9, 0.4, 0.3, 0.5]:
+        checkpointer.save({"dqn": agent}, metrics={"accuracy": accuracy})
+        # The snapshot is a copy: later training steps must not leak into queued checkpoints
+        agent.weights += 1
+    checkpointer.close()
+
+    manifest = json.loads((tmp_path / "ensemble_agent" / "manifest.json").read_text())
+    assert [entry["version"] for entry in manifest["versions"]] == [2, 4, 5]
+    assert manifest["best"] == 2 and manifest["latest"] == 5
+    assert sorted(os.listdir(tmp_path / "ensemble_agent")) == ["manifest.json", "v000002", "v000004", "v000005"]
+    # Rows of pruned versions are removed along with their files
+    assert [os.path.basename(os.path.dirname(row["model_path"])) for row in db.rows] == ["v000002", "v000004", "v000005"]
+
+    resumed = ModelCheckpointer(str(tmp_path), keep_best=1, keep_last=2)
+    restored = _WeightsAgent(-1.0)
+    assert resumed.restore({"dqn": restored}, which="best")["version"] == 2
+    np.testing.assert_array_equal(restored.weights, np.full(4, 1.0))
+    assert resumed.load_latest()["metrics"] == {"accuracy": 0.5}
+    assert resumed.save({"dqn": restored}) == 6
+    resumed.close()
+
+def test_checkpointer_never_reuses_a_pruned_version(tmp_path):
+    checkpointer = ModelCheckpointer(str(tmp_path), keep_best=1, keep_last=0)
+    for accuracy in [0.9, 0.1, 0.2]:
+        checkpointer.save({"dqn": _WeightsAgent(accuracy)}, metrics={"accuracy": accuracy})
+    checkpointer.close()
+    # v2 was pruned once v3 became the latest, but it was still handed out
+    resumed = ModelCheckpointer(str(tmp_path), keep_best=1, keep_last=0)
+    assert [entry["version"] for entry in resumed.manifest["versions"]] == [1, 3]
+    assert not os.path.exists(tmp_path / "ensemble_agent" / "v000002")
+    assert resumed.save({"dqn": _WeightsAgent(0.0)}) == 4
+    resumed.close()
+
+def test_checkpointer_keeps_the_latest_version_loadable_with_keep_last_zero(tmp_path):
+    checkpointer = ModelCheckpointer(str(tmp_path), keep_best=1, keep_last=0)
+    for accuracy in [0.9, 0.1]:
+        checkpointer.save({"dqn": _WeightsAgent(accuracy)}, metrics={"accuracy": accuracy})
+    checkpointer.close()
+    resumed = ModelCheckpointer(str(tmp_path), keep_best=1, keep_last=0)
+    latest = resumed.load_latest()
+    assert latest["version"] == 2 and latest["metrics"] == {"accuracy": 0.1}
+    assert resumed.load_best()["version"] == 1
+
+class _BufferedAgent:
+    def __init__(self, replay_buffer):
+        self.replay_buffer = replay_buffer
+        self.weights = np.zeros(4)
+
+def test_checkpointer_snapshots_leave_the_replay_buffer_out(tmp_path):
+    buffer = ReplayBuffer(1000, 3)
+    agent = _BufferedAgent(buffer)
+    checkpointer = ModelCheckpointer(str(tmp_path))
+    checkpointer.save({"dqn": agent}, metrics={"accuracy": 0.5})
+    checkpointer.close()
+
+    with open(tmp_path / "ensemble_agent" / "v000001" / "dqn.pkl", "rb") as f:
+        assert os.fstat(f.fileno()).st_size < 10000 # the buffer's arrays alone are ~45KB
+    agents = {"dqn": _BufferedAgent(buffer)}
+    ModelCheckpointer(str(tmp_path)).restore(agents)
+    assert agents["dqn"] is not agent and agents["dqn"].replay_buffer is buffer
+    np.testing.assert_array_equal(agents["dqn"].weights, np.zeros(4))
+
+def _transitions(start, n, state_dim=3):
+    obs = np.arange(start, start + n, dtype=np.float32)[:, None].repeat(state_dim, axis=1)
+    return obs, np.arange(start, start + n), np.ones(n), obs + 1, np.zeros(n, dtype=bool)
+
+def test_replay_buffer_ring_wraps_and_prioritised_sampling_is_proportional():
+    buffer = ReplayBuffer(8, 3, prioritized=True, alpha=1.0, seed=0)
+    buffer.add_batch(*_transitions(0, 6))
+    buffer.add_batch(*_transitions(6, 5))
+    assert len(buffer) == 8 and buffer.pos == 3
+    np.testing.assert_array_equal(buffer.actions, [8, 9, 10, 3, 4, 5, 6, 7])
+
+    buffer.update_priorities(np.arange(8), np.arange(1, 9) - buffer.epsilon)
+    counts = np.bincount(np.concatenate([buffer.sample(64)["indices"] for _ in range(500)]), minlength=8)
+    np.testing.assert_allclose(counts / counts.sum(), np.arange(1, 9) / 36, atol=0.01)
+
+    batch = buffer.sample(16)
+    assert batch["obs"].dtype == np.float32 and batch["obs"].shape == (16, 3)
+    assert batch["weights"].max() == 1.0
+    np.testing.assert_array_equal(batch["next_obs"][:, 0], batch["obs"][:, 0] + 1)
+
+def test_replay_buffer_memmap_persists_across_reopen(tmp_path):
+    buffer = ReplayBuffer(10, 3, prioritized=True, path=str(tmp_path))
+    buffer.add_batch(*_transitions(0, 4))
+    buffer.update_priorities([1], [5.0])
+    buffer.flush()
+    del buffer
+
+    reopened = ReplayBuffer(10, 3, prioritized=True, path=str(tmp_path))
+    assert len(reopened) == 4 and reopened.pos == 4
+    np.testing.assert_array_equal(reopened.actions[:4], [0, 1, 2, 3])
+    assert reopened.tree.total == pytest.approx(3 * 1.0 ** 0.6 + (5.0 + reopened.epsilon) ** 0.6)
+
+def _option_chain():
+    chain, token = [], 1000
+    for name, atm, step, lot_size, expiries in [("NIFTY", 22000, 50, 25, [date(2024, 1, 18), date(2024, 1, 25)]),
+                                                ("BANKNIFTY", 48000, 100, 15, [date(2024, 1, 17)])]:
+        for expiry in [date(2024, 1, 11)] + expiries: # The first expiry is already past
+            for k in range(-8, 8):
+                for option_type in ("CE", "PE"):
+                    token += 1
+                    chain.append({"name": name, "expiry": expiry, "strike": float(atm + k * step), "instrument_type": option_type,
+                                  "lot_size": lot_size, "instrument_token": token,
+                                  "tradingsymbol": f"{name}{expiry:%y%b%d}{atm + k * step}{option_type}".upper()})
+    return chain
+
+def test_action_catalogue_layout_and_decode():
+    catalogue = ActionCatalogue.build(_option_chain(), {"NIFTY": 22010, "BANKNIFTY": 47990}, as_of=date(2024, 1, 15))
+    assert len(catalogue) == 800
+    action = catalogue.encode(0, 1, 7, 1, 1, 2) # NIFTY, second expiry, ATM+2, PE, SELL, 3 lots
+    row = catalogue.decode(action)
+    assert row["underlying"] == "NIFTY" and row["expiry"] == np.datetime64("2024-01-25")
+    assert row["strike"] == 22100 and row["option_type"] == "PE"
+    assert row["side"] == -1 and row["lot_multiple"] == 3 and row["lot_size"] == 25
+    assert row["tradingsymbol"].startswith("NIFTY24JAN25") and row["available"]
+    assert catalogue.signed_lots[action] == -3
+    # BANKNIFTY has a single live expiry, so its second-expiry block is unavailable
+    banknifty = catalogue.table[catalogue.table["underlying"] == "BANKNIFTY"]
+    assert banknifty["available"].sum() == 200
+
+def test_action_catalogue_valid_mask_applies_margin_position_and_loss_rules():
+    catalogue = ActionCatalogue.build(_option_chain(), {"NIFTY": 22010, "BANKNIFTY": 47990}, as_of=date(2024, 1, 15))
+    spots = {"NIFTY": 22010, "BANKNIFTY": 47990}
+    prices = np.full(len(catalogue.instrument_tokens), 100.0)
+    positions = np.zeros(len(catalogue.instrument_tokens))
+    table = catalogue.table
+
+    mask = catalogue.valid_mask(prices, positions, available_margin=10000, capital=1000000, spot_prices=spots)
+    buys, sells = table["side"] == 1, table["side"] == -1
+    # Premium 100 * 25 * lots fits 10k only up to 4 NIFTY lots; shorts need ~66k margin per NIFTY lot
+    assert mask[buys & (table["underlying"] == "NIFTY") & table["available"]].sum() == 160
+    assert not mask[buys & (table["lot_multiple"] == 5) & (table["underlying"] == "NIFTY")].any()
+    assert not mask[sells].any()
+    assert not mask[~table["available"]].any()
+
+    # Holding 2 long lots: selling 1-3 lots shrinks the absolute position and needs no margin
+    held = catalogue.encode(0, 0, 5, 0, 0, 0)
+    positions[catalogue.instrument_index[held]] = 2
+    mask = catalogue.valid_mask(prices, positions, available_margin=0, capital=1000000, spot_prices=spots)
+    same_instrument = catalogue.instrument_index == catalogue.instrument_index[held]
+    assert set(table["lot_multiple"][mask & same_instrument & sells]) == {1, 2, 3}
+    assert mask.sum() == 3
+
+    # After the daily loss limit only position-reducing actions remain
+    mask = catalogue.valid_mask(prices, positions, available_margin=1e9, capital=1000000, spot_prices=spots, daily_pnl=-60000)
+    assert set(np.flatnonzero(mask)) == set(np.flatnonzero(same_instrument & sells & (table["lot_multiple"] <= 3)))
+
+    q_values = np.random.default_rng(0).normal(size=(3, len(catalogue)))
+    assert mask[masked_argmax(q_values, mask)].all()
@@ -3,6 +3,13 @@ from unittest.mock import MagicMock, patch
 from nifty_trading_agent.src.sentiment_analysis.news_collector import NewsCollector
 from nifty_trading_agent.src.sentiment_analysis.social_media_collector import SocialMediaCollector
 from nifty_trading_agent.src.sentiment_analysis.sentiment_analyzer import SentimentAnalyzer
+from nifty_trading_agent.src.sentiment_analysis.sentiment_cache import SentimentCache
+from nifty_trading_agent.src.sentiment_analysis.sentiment_worker_pool import SentimentWorkerPool, WorkerCrashedError
+from nifty_trading_agent.src.sentiment_analysis.relevance_filter import RelevanceFilter
+from nifty_trading_agent.src.sentiment_analysis.article_deduplicator import ArticleDeduplicator, simhash, hamming_distance
+import json
+import os
+import time
 import pandas as pd
 
 @pytest.fixture
@@ -73,3 +80,319 @@ def test_sentiment_analyzer_process_articles(sentiment_analyzer):
     assert len(processed_df) == 2
 
 
+
+def _fake_finbert(inputs, **kwargs):
+    single = isinstance(inputs, str)
+    texts = [inputs] if single else inputs
+    return [{"label": "positive" if "up" in text else "negative", "score": 0.8} for text in texts]
+
+def test_sentiment_analyzer_batch_matches_single_text():
+    with patch("nifty_trading_agent.src.sentiment_analysis.sentiment_analyzer.pipeline") as mock_pipeline:
+        mock_pipeline.return_value = MagicMock(side_effect=_fake_finbert)
+        analyzer = SentimentAnalyzer()
+    analyzer.batch_size = 3
+    texts = ["Nifty is up after the RBI policy", "Bank Nifty falls", "up", "Markets crash on weak global cues"] * 2
+    batch_scores = analyzer.analyze_batch(texts)
+    assert batch_scores == pytest.approx([analyzer.get_overall_sentiment(text) for text in texts])
+    assert analyzer.last_batch_throughput > 0
+
+def test_sentiment_analyzer_uses_cache(tmp_path):
+    cache = SentimentCache(str(tmp_path / "sentiment_cache.db"), max_entries=100)
+    with patch("nifty_trading_agent.src.sentiment_analysis.sentiment_analyzer.pipeline") as mock_pipeline:
+        finbert = MagicMock(side_effect=_fake_finbert)
+        mock_pipeline.return_value = finbert
+        analyzer = SentimentAnalyzer(cache=cache)
+
+    texts = ["Nifty is up after the RBI policy", "Bank Nifty falls"]
+    first = analyzer.analyze_batch(texts)
+    calls = finbert.call_count
+    # Whitespace-normalised duplicates hit the cache and never reach the models
+    second = analyzer.analyze_batch(["  Nifty is up\nafter the  RBI policy ", "Bank Nifty falls"])
+    assert second == pytest.approx(first)
+    assert finbert.call_count == calls
+    assert analyzer.get_overall_sentiment("Bank Nifty falls") == pytest.approx(first[1])
+    stats = analyzer.get_cache_stats()
+    assert stats["hits"] == 3 and stats["size"] == 2
+
+def test_sentiment_analyzer_does_not_cache_finbert_failures(tmp_path):
+    cache = SentimentCache(str(tmp_path / "sentiment_cache.db"), max_entries=100)
+    with patch("nifty_trading_agent.src.sentiment_analysis.sentiment_analyzer.pipeline") as mock_pipeline:
+        finbert = MagicMock(side_effect=RuntimeError("CUDA error"))
+        mock_pipeline.return_value = finbert
+        analyzer = SentimentAnalyzer(cache=cache)
+
+    analyzer.get_overall_sentiment("Bank Nifty falls")
+    analyzer.analyze_batch(["Nifty is up after the RBI policy", "Bank Nifty falls"])
+    assert cache.size() == 0
+
+    # Once FinBERT recovers the real scores are computed and cached
+    finbert.side_effect = _fake_finbert
+    scores = analyzer.analyze_batch(["Nifty is up after the RBI policy", "Bank Nifty falls"])
+    assert scores[0] > scores[1] and cache.size() == 2
+
+def test_sentiment_analyzer_falls_back_to_fp32_when_quantization_fails():
+    with patch("nifty_trading_agent.src.sentiment_analysis.sentiment_analyzer.pipeline") as mock_pipeline, \
+         patch("nifty_trading_agent.src.sentiment_analysis.sentiment_analyzer.quantize_dynamic_int8",
+               side_effect=RuntimeError("Didn't find engine for operation quantized::linear_prepack")):
+        finbert = MagicMock(side_effect=_fake_finbert)
+        mock_pipeline.return_value = finbert
+        analyzer = SentimentAnalyzer(quantization="dynamic_int8")
+    assert analyzer.finbert is finbert and analyzer.quantization == "none"
+    assert analyzer.model_version.endswith("@none")
+    assert analyzer.analyze_finbert("Nifty is up after the RBI policy") != 0.0
+
+def test_sentiment_cache_evicts_least_recently_used(tmp_path):
+    cache = SentimentCache(str(tmp_path / "sentiment_cache.db"), max_entries=10)
+    cache.put_many([f"headline {i}" for i in range(12)], [0.1] * 12)
+    assert cache.size() <= 10
+    assert cache.get("headline 11") == pytest.approx(0.1)
+    assert cache.get("headline 0") is None
+
+def test_sentiment_cache_keys_are_case_sensitive(tmp_path):
+    # VADER scores "SURGE!" and "surge" differently, so they must not share an entry
+    cache = SentimentCache(str(tmp_path / "sentiment_cache.db"))
+    cache.put_many(["Nifty SURGE!", "Nifty surge"], [0.8, 0.5])
+    assert cache.get("Nifty SURGE!") == pytest.approx(0.8)
+    assert cache.get("  Nifty   surge ") == pytest.approx(0.5)
+    assert cache.size() == 2
+
+def test_sentiment_cache_counts_rows_only_near_capacity(tmp_path):
+    cache = SentimentCache(str(tmp_path / "sentiment_cache.db"), ttl_seconds=3600, max_entries=100)
+    statements = []
+    cache._conn.set_trace_callback(statements.append)
+    for i in range(50):
+        cache.put(f"headline {i}", 0.1)
+    # One TTL purge for the first put, and no full-table count while well below capacity
+    assert sum("COUNT(*)" in sql for sql in statements) == 0
+    assert sum(sql.startswith("DELETE FROM sentiment_cache WHERE created_at") for sql in statements) == 1
+    for i in range(50, 150):
+        cache.put(f"headline {i}", 0.1)
+    cache._conn.set_trace_callback(None)
+    assert cache.size() <= 100
+    assert sum("COUNT(*)" in sql for sql in statements) < 20
+
+class _FakeBatchAnalyzer:
+    cache = None
+    model_version = "fake"
+
+    def __init__(self, sign=1.0):
+        self.sign = sign
+
+    def analyze_batch(self, texts):
+        if "crash" in texts:
+            os._exit(1)
+        return [self.sign * len(text) for text in texts]
+
+def test_sentiment_worker_pool_scores_and_survives_crashes():
+    with SentimentWorkerPool(_FakeBatchAnalyzer(), num_workers=2, batch_size=4, batch_timeout_ms=5, max_retries=1) as pool:
+        texts = [f"headline {i}" for i in range(20)]
+        assert pool.map(texts, timeout=30) == [float(len(text)) for text in texts]
+
+        crashing = pool.submit("crash")
+        with pytest.raises(WorkerCrashedError):
+            crashing.result(timeout=30)
+        # Restarted workers keep serving requests
+        assert pool.submit("after restart").result(timeout=30) == float(len("after restart"))
+        assert pool.restarts >= 1
+
+def test_sentiment_worker_pool_resubmits_requests_batched_with_a_crash():
+    with SentimentWorkerPool(_FakeBatchAnalyzer(), num_workers=1, batch_size=8, batch_timeout_ms=50, max_retries=1) as pool:
+        # All three land in one batch; the worker dies holding them
+        futures = pool.submit_batch(["first", "crash", "third"])
+        assert futures[0].result(timeout=30) == 5.0 and futures[2].result(timeout=30) == 5.0
+        with pytest.raises(WorkerCrashedError):
+            futures[1].result(timeout=30)
+        assert pool.restarts == 2
+        assert pool.map(["after"] * 10, timeout=30) == [5.0] * 10
+
+def test_sentiment_worker_pools_keep_their_own_analyzer():
+    with SentimentWorkerPool(_FakeBatchAnalyzer(1.0), num_workers=1, batch_timeout_ms=1) as positive, \
+            SentimentWorkerPool(_FakeBatchAnalyzer(-1.0), num_workers=1, batch_timeout_ms=1) as negative:
+        assert positive.map(["abc"], timeout=30) == [3.0]
+        assert negative.map(["abc"], timeout=30) == [-3.0]
+
+RSS_SAMPLE = b"""<?xml version="1.0" encoding="UTF-8"?>
+<rss version="2.0"><channel><title>Markets</title>
+<item><title>Nifty closes higher</title><link>https://example.com/1</link><pubDate>Mon, 01 Jan 2024 10:00:00 +0530</pubDate><description>Banks lead gains</description></item>
+<item><title>Rupee slips</title><link>https://example.com/2</link></item>
+</channel></rss>"""
+
+def test_news_collector_rss_conditional_get(news_collector):
+    first = MagicMock(status_code=200, content=RSS_SAMPLE, headers={"ETag": '"v1"', "Last-Modified": "Mon, 01 Jan 2024 10:05:00 GMT"})
+    not_modified = MagicMock(status_code=304, content=b"", headers={})
+    with patch.object(news_collector.session, "get", side_effect=[first, not_modified]) as mock_get:
+        articles = news_collector.get_rss_feed_articles("Test Feed", "https://example.com/rss")
+        assert [a["title"] for a in articles] == ["Nifty closes higher", "Rupee slips"]
+        assert articles[0]["description"] == "Banks lead gains"
+        assert articles[1]["description"] == "No Description"
+
+        again = news_collector.get_rss_feed_articles("Test Feed", "https://example.com/rss")
+        assert again == articles
+        headers = mock_get.call_args_list[1].kwargs["headers"]
+        assert headers["If-None-Match"] == '"v1"'
+        assert headers["If-Modified-Since"] == "Mon, 01 Jan 2024 10:05:00 GMT"
+
+RDF_SAMPLE = b"""<?xml version="1.0"?>
+<rdf:RDF xmlns:rdf="http://www.w3.org/1999/02/22-rdf-syntax-ns#" xmlns="http://purl.org/rss/1.0/">
+<channel rdf:about="https://example.com/"><title>Markets</title></channel>
+<item rdf:about="https://example.com/1"><title>Sensex gains</title><link>https://example.com/1</link></item>
+</rdf:RDF>"""
+
+def test_news_collector_parses_namespaced_rdf_items(news_collector):
+    articles = news_collector.parse_rss_feed(RDF_SAMPLE, "RDF Feed")
+    assert [(a["title"], a["link"]) for a in articles] == [("Sensex gains", "https://example.com/1")]
+
+def test_news_collector_applies_newsapi_timeout(news_collector):
+    # NewsApiClient sends its own requests on our session; the mounted adapter enforces the timeout
+    with patch("requests.adapters.HTTPAdapter.send") as mock_send:
+        for url, timeout in [("https://newsapi.org/v2/everything", news_collector._timeout("NewsAPI")), ("https://example.com/rss", 7)]:
+            news_collector.session.get_adapter(url).send(MagicMock(url=url), timeout=7)
+            assert mock_send.call_args.kwargs["timeout"] == timeout
+
+def test_article_deduplicator_merges_syndicated_copies(tmp_path):
+    title = "Nifty ends at record high as banks rally"
+    body = ("HDFC Bank and ICICI Bank lifted the index, while IT stocks were mixed. Foreign investors "
+            "were net buyers for the fifth straight session, provisional exchange data showed.")
+    assert hamming_distance(simhash(f"{title} {body}"), simhash(f"{title} {body} (PTI)")) <= 3
+
+    path = str(tmp_path / "fingerprints.db")
+    dedup = ArticleDeduplicator(path, hamming_threshold=3, max_age_hours=72)
+    articles = [
+        {"source": "Economic Times", "title": title, "description": body},
+        {"source": "MoneyControl", "title": title, "description": body + " (PTI)"},
+        {"source": "Business Standard", "title": "Rupee slips to 83.4 against the dollar", "description": "Crude oil rally weighs on the currency."},
+    ]
+    kept = dedup.filter_articles(articles)
+    assert [a["source"] for a in kept] == ["Economic Times", "Business Standard"]
+    assert kept[0]["syndicated_sources"] == ["MoneyControl"]
+    dedup.close()
+
+    # The index persists, so the same story in the next run is dropped
+    reopened = ArticleDeduplicator(path, hamming_threshold=3, max_age_hours=72)
+    assert reopened.size() == 2
+    assert reopened.filter_articles([{"source": "NDTV Profit", "title": title, "description": body}]) == []
+    assert reopened.prune(now=time.time() + 73 * 3600) == 2
+    assert reopened.size() == 0
+
+def _submission(post_id, created_utc):
+    submission = MagicMock(id=post_id, title=f"Post {post_id}", selftext="", created_utc=created_utc, score=1, num_comments=0)
+    submission.author.name = "user"
+    return submission
+
+def test_social_media_stream_only_fetches_new_posts(social_media_collector, tmp_path):
+    social_media_collector.cursor_path = str(tmp_path / "cursors.json")
+    social_media_collector.twitter_client = None
+    social_media_collector.subreddits = ["IndianStockMarket"]
+    social_media_collector.reddit_client = MagicMock()
+    search = social_media_collector.reddit_client.subreddit.return_value.search
+    search.return_value = [_submission("b", 1700000200.0), _submission("a", 1700000100.0)]
+
+    first = list(social_media_collector.stream_all_social_media("nifty"))
+    assert [p["id"] for p in first] == ["b", "a"]
+    assert search.call_args.kwargs["sort"] == "new"
+
+    # The newest post is "c"; "b" and "a" were seen in the previous run
+    search.return_value = [_submission("c", 1700000300.0), _submission("b", 1700000200.0), _submission("a", 1700000100.0)]
+    assert [p["id"] for p in social_media_collector.collect_all_social_media("nifty")] == ["c"]
+    with open(social_media_collector.cursor_path) as f:
+        assert json.load(f)["Reddit/IndianStockMarket|nifty"] == {"created_utc": 1700000300.0, "ids": ["c"]}
+
+    # A post created in the cursor's second is still new; "c" is not returned again
+    search.return_value = [_submission("d", 1700000300.0), _submission("c", 1700000300.0), _submission("b", 1700000200.0)]
+    assert [p["id"] for p in social_media_collector.collect_all_social_media("nifty")] == ["d"]
+    assert social_media_collector.get_cursor("Reddit/IndianStockMarket", "nifty")["ids"] == ["c", "d"]
+
+def test_social_media_cursor_waits_for_complete_fetch_and_consumer(social_media_collector, tmp_path):
+    social_media_collector.cursor_path = str(tmp_path / "cursors.json")
+    social_media_collector.twitter_client = None
+    social_media_collector.subreddits = ["IndianStockMarket"]
+    social_media_collector.reddit_client = MagicMock()
+    search = social_media_collector.reddit_client.subreddit.return_value.search
+    search.return_value = [_submission("a", 1700000100.0)]
+    list(social_media_collector.stream_all_social_media("nifty"))
+
+    # A failed fetch keeps the cursor; the retry skips the post already streamed
+    def failing_search(*args, **kwargs):
+        yield _submission("n0", 1700000900.0)
+        raise RuntimeError("503")
+    search.side_effect = failing_search
+    assert [p["id"] for p in social_media_collector.stream_all_social_media("nifty")] == ["n0"]
+    assert social_media_collector.get_cursor("Reddit/IndianStockMarket", "nifty")["created_utc"] == 1700000100.0
+
+    # The cursor only moves once the consumer has taken every post of the source
+    search.side_effect = None
+    search.return_value = [_submission("n1", 1700000901.0), _submission("n2", 1700000899.0), _submission("a", 1700000100.0)]
+    stream = social_media_collector.stream_all_social_media("nifty")
+    assert next(stream)["id"] == "n1"
+    stream.close()
+    assert social_media_collector.get_cursor("Reddit/IndianStockMarket", "nifty")["created_utc"] == 1700000100.0
+    search.return_value = [_submission("n1", 1700000901.0), _submission("n0", 1700000900.0),
+                           _submission("n2", 1700000899.0), _submission("a", 1700000100.0)]
+    assert [p["id"] for p in social_media_collector.collect_all_social_media("nifty")] == ["n2"]
+    with open(social_media_collector.cursor_path) as f:
+        assert json.load(f)["Reddit/IndianStockMarket|nifty"]["created_utc"] == 1700000901.0
+
+def test_social_media_cursor_skips_gap_past_backfill_limit(social_media_collector, tmp_path):
+    social_media_collector.cursor_path = str(tmp_path / "cursors.json")
+    social_media_collector.reddit_client = None
+    social_media_collector.subreddits = []
+    social_media_collector.twitter_client = MagicMock()
+    tweets = lambda ids: [MagicMock(id_str=str(i), full_text=f"tweet {i}", retweet_count=0, favorite_count=0) for i in ids]
+    with patch("nifty_trading_agent.src.sentiment_analysis.social_media_collector.tweepy.Cursor") as cursor:
+        cursor.return_value.items.side_effect = lambda n: tweets([100])[:n]
+        assert [p["id"] for p in social_media_collector.stream_all_social_media("nifty", count=5)] == ["100"]
+
+        # 300 new tweets against a backfill limit of 50: the newest 50 are streamed, the cursor
+        # moves past them and the same tweets are not fetched again next cycle
+        cursor.return_value.items.side_effect = lambda n: tweets(range(400, 100, -1))[:n]
+        assert len(list(social_media_collector.stream_all_social_media("nifty", max_backfill=50))) == 50
+        assert cursor.call_args.kwargs["since_id"] == 100
+        assert social_media_collector.get_cursor("Twitter", "nifty") == 400
+        cursor.return_value.items.side_effect = lambda n: tweets(range(402, 400, -1))[:n]
+        assert [p["id"] for p in social_media_collector.stream_all_social_media("nifty", max_backfill=50)] == ["402", "401"]
+        assert cursor.call_args.kwargs["since_id"] == 400
+
+def test_relevance_filter_matches_whole_keywords():
+    relevance = RelevanceFilter()
+    assert relevance.match("Bank  Nifty slips as HDFCBANK and SBI fall after RBI policy") == ["bank nifty", "hdfcbank", "sbi", "rbi"]
+    assert relevance.match("Nifty 50 closes flat") == ["nifty 50"]
+    assert not relevance.is_relevant("Premier League: Arsenal beat Chelsea in a thriller")
+    # Short terms only match whole words
+    assert not relevance.is_relevant("Subsidiary wins new contract")
+
+def test_process_articles_drops_irrelevant_rows():
+    with patch("nifty_trading_agent.src.sentiment_analysis.sentiment_analyzer.pipeline") as mock_pipeline:
+        mock_pipeline.return_value = MagicMock(side_effect=_fake_finbert)
+        analyzer = SentimentAnalyzer(relevance_filter=RelevanceFilter())
+    articles_df = pd.DataFrame([
+        {"title": "Nifty rallies", "description": "ICICI Bank leads gains", "content": "", "source": "A"},
+        {"title": "Cricket", "description": "India win the series", "content": "", "source": "B"}
+    ])
+    processed_df = analyzer.process_articles_for_sentiment(articles_df)
+    assert processed_df["source"].tolist() == ["A"]
+    assert processed_df["keywords"].tolist() == ["nifty,icici bank"]
+    assert "sentiment_score" in processed_df.columns
+
+    # Nothing relevant: same columns as above, no rows
+    off_topic = analyzer.process_articles_for_sentiment(articles_df.iloc[[1]].copy())
+    assert off_topic.empty
+    assert {"keywords", "sentiment_score", "sentiment_magnitude"} <= set(off_topic.columns)
+
+def test_relevance_filter_applies_to_batches_and_social_posts():
+    with patch("nifty_trading_agent.src.sentiment_analysis.sentiment_analyzer.pipeline") as mock_pipeline:
+        finbert = MagicMock(side_effect=_fake_finbert)
+        mock_pipeline.return_value = finbert
+        analyzer = SentimentAnalyzer(relevance_filter=RelevanceFilter())
+
+    scores = analyzer.analyze_batch(["Bank Nifty falls", "Arsenal beat Chelsea", "Nifty is up after the RBI policy"])
+    assert scores[1] is None and scores[0] < 0 < scores[2]
+    assert all(len(call.args[0]) == 2 for call in finbert.call_args_list)
+    assert analyzer.analyze_batch(["Arsenal beat Chelsea"], filter_relevance=False)[0] is not None
+
+    posts = [{"source": "Twitter", "id": "1", "text": "Nifty hits a record high"},
+             {"source": "Reddit", "id": "2", "title": "Weekend plans", "text": "Hiking trip"},
+             {"source": "Reddit", "id": "3", "title": "HDFC Bank results", "text": None}]
+    posts_df = analyzer.process_posts_for_sentiment(posts)
+    assert posts_df["id"].tolist() == ["1", "3"]
+    assert posts_df["keywords"].tolist() == ["nifty", "hdfc bank"]
+    assert posts_df["sentiment_magnitude"].tolist() == posts_df["sentiment_score"].abs().tolist()
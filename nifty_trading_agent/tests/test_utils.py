@@ -0,0 +1,320 @@
+import json
+import os
+import sys
+import tempfile
+import threading
+from datetime import datetime, timedelta
+import pandas as pd
+import pytest
+from nifty_trading_agent.src.utils.config_manager import config
+from nifty_trading_agent.src.utils.logger import logger, log_every, log_sampled, is_enabled
+
+# database.py opens the configured database when imported; keep that default instance off the real path
+if "nifty_trading_agent.src.utils.database" not in sys.modules:
+    config.set("database.path", os.path.join(tempfile.mkdtemp(prefix="nifty_test_"), "default.db"))
+from nifty_trading_agent.src.utils import database
+from nifty_trading_agent.src.utils.database import ALL_SOURCES, DatabaseManager
+from nifty_trading_agent.src.utils.profiler import StageProfiler
+from nifty_trading_agent.src.utils.tracing import LatencyHistogram, Tracer
+
+@pytest.fixture
+def captured_logs():
+    messages = []
+    sink_id = logger.add(lambda message: messages.append(message.record["message"]), level="DEBUG")
+    yield messages
+    logger.remove(sink_id)
+
+def test_log_sampled_keeps_every_nth_call_and_counts_the_rest(captured_logs):
+    for i in range(10):
+        log_sampled("test_utils.sampled", 4, "WARNING", "tick {}", i)
+    assert captured_logs == ["tick 0", "tick 4 [3 similar suppressed]", "tick 8 [3 similar suppressed]"]
+
+def test_log_every_rate_limits_per_call_site(captured_logs):
+    for i in range(100):
+        log_every("test_utils.every", 60, "WARNING", "tick {}", i)
+    log_every("test_utils.other", 60, "WARNING", "other")
+    assert captured_logs == ["tick 0", "other"]
+
+def test_disabled_levels_are_skipped(captured_logs):
+    assert is_enabled("ERROR")
+    if not is_enabled("TRACE"):
+        log_every("test_utils.trace", 0, "TRACE", "never {}", 1)
+        assert captured_logs == []
+
+def test_stage_profiler_records_stages_episodes_and_report(tmp_path):
+    profiler = StageProfiler("test_run", report_dir=str(tmp_path), cprofile_stages=["work"], persist_metrics=False)
+    with profiler.stage("work", rows_in=1000) as stage:
+        total = sum(i * i for i in range(100000))
+        stage["rows_out"] = 500
+    assert total > 0
+    assert profiler.record_episode(1, 200, 0.5, total_reward=1.0) == 400
+
+    record = profiler.stages[0]
+    assert record["stage"] == "work" and record["rows_in"] == 1000 and record["rows_out"] == 500
+    assert record["wall_s"] > 0 and record["cpu_s"] > 0
+    assert record["peak_rss_mb"] >= record["rss_before_mb"] > 0
+    assert record["rows_per_sec"] == pytest.approx(500 / record["wall_s"])
+    assert "genexpr" in record["profile"]["top_cumulative"]
+
+    report = json.loads(open(profiler.finish()).read())
+    assert report["stages"][0]["stage"] == "work"
+    assert report["episodes"]["total_steps"] == 200
+    assert report["episodes"]["mean_steps_per_sec"] == 400
+
+def test_latency_histogram_percentiles_within_bucket_error():
+    histogram = LatencyHistogram()
+    for ns in range(1, 100001):
+        histogram.record(ns * 10)
+    summary = histogram.summary()
+    assert summary["count"] == 100000
+    assert summary["p50_us"] == pytest.approx(500, rel=0.04)
+    assert summary["p99_us"] == pytest.approx(990, rel=0.04)
+    assert summary["p99_9_us"] == pytest.approx(999, rel=0.04)
+    assert summary["max_us"] == 1000
+
+def test_tracer_attaches_spans_to_market_event_and_exports(tmp_path):
+    tracer = Tracer(export_path=str(tmp_path / "latency.jsonl"), export_interval_seconds=0)
+    with tracer.span("quote_fetch"):
+        pass
+    event = tracer.begin_event(256265)
+    with tracer.span("features"):
+        pass
+    with tracer.span("order_submit"):
+        pass
+    assert tracer.end_event(256265) is event
+    assert tracer.current_event() is None
+    assert [stage for stage, _, _ in event.spans] == ["features", "order_submit"]
+
+    report = tracer.export()
+    assert set(report["stages"]) == {"quote_fetch", "features", "order_submit", "tick_to_order"}
+    assert report["events"][0]["key"] == "256265"
+    exported = json.loads((tmp_path / "latency.jsonl").read_text().splitlines()[-1])
+    assert exported["stages"]["tick_to_order"]["count"] == 1
+    assert tracer.snapshot()["stages"] == {}
+
+def test_latency_histogram_keeps_samples_recorded_during_folds():
+    histogram = LatencyHistogram()
+    per_thread, threads = 50000, 4
+    def record():
+        for _ in range(per_thread):
+            histogram.record(1000)
+    workers = [threading.Thread(target=record) for _ in range(threads)]
+    for worker in workers:
+        worker.start()
+    taken = []
+    while any(worker.is_alive() for worker in workers):
+        histogram.fold()
+        taken.append(histogram.take())
+    for worker in workers:
+        worker.join()
+    taken.append(histogram.take())
+    assert sum(h.summary()["count"] for h in taken) == per_thread * threads
+
+def test_tracer_snapshot_reset_keeps_spans_still_open():
+    tracer = Tracer(export_interval_seconds=0)
+    span = tracer.span("order_submit")
+    span.__enter__()
+    assert tracer.snapshot(reset=True)["stages"] == {}
+    span.__exit__(None, None, None)
+    assert tracer.snapshot(reset=True)["stages"]["order_submit"]["count"] == 1
+
+def test_tracer_end_event_exports_in_the_background_and_drops_when_behind(tmp_path, monkeypatch):
+    tracer = Tracer(export_path=str(tmp_path / "latency.jsonl"), export_interval_seconds=1e-9, export_queue_size=1)
+    release = threading.Event()
+    written = []
+    def slow_write(report, path=None):
+        release.wait(5)
+        written.append(report)
+    monkeypatch.setattr(tracer, "_write", slow_write)
+
+    for key in range(5):
+        tracer.begin_event(key)
+        tracer.end_event(key)
+    # The exporter holds at most one interval and has one queued; the rest were dropped, and
+    # none of the end_event calls waited for the blocked write
+    assert not written
+    assert tracer.dropped_exports >= 3
+    release.set()
+    tracer.flush()
+    tracer.close()
+    assert 1 <= len(written) <= 2
+    assert sum(report["stages"]["tick_to_order"]["count"] for report in written) == len(written)
+
+def test_tracer_folds_on_the_background_thread(monkeypatch):
+    monkeypatch.setattr("nifty_trading_agent.src.utils.tracing._FOLD_THRESHOLD", 100)
+    tracer = Tracer(export_interval_seconds=0)
+    folded_on = []
+    fold = LatencyHistogram.fold
+    def recording_fold(histogram):
+        folded_on.append(threading.current_thread().name)
+        fold(histogram)
+    monkeypatch.setattr(LatencyHistogram, "fold", recording_fold)
+    for _ in range(250):
+        with tracer.span("features"):
+            pass
+    histogram = tracer._histograms["features"]
+    for _ in range(50):
+        if not histogram.pending:
+            break
+        threading.Event().wait(0.05)
+    tracer.close()
+    assert folded_on and set(folded_on) == {"trace-exporter"}
+    assert histogram.count + len(histogram.pending) == 250
+
+def test_tracer_events_are_keyed_by_instrument():
+    tracer = Tracer(export_interval_seconds=0)
+    nifty = tracer.begin_event("NSE:NIFTY 50")
+    bank = tracer.begin_event("NSE:NIFTY BANK")
+    # An order for the first instrument is measured from its own tick, not the latest quote
+    assert tracer.end_event("NSE:NIFTY 50") is nifty
+    assert tracer.end_event("NSE:NIFTY 50") is None
+    assert tracer.open_event("NSE:NIFTY BANK") is bank
+    assert tracer.current_event() is bank
+    assert tracer.end_event("NSE:NIFTY BANK") is bank
+    assert tracer.current_event() is None
+    assert tracer.snapshot()["stages"]["tick_to_order"]["count"] == 2
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    monkeypatch.setitem(config.config["database"], "type", "sqlite")
+    monkeypatch.setitem(config.config["database"], "path", str(tmp_path / "test.db"))
+    return DatabaseManager()
+
+def test_delete_model_checkpoints_removes_only_the_given_paths(db):
+    for version in [1, 2, 3]:
+        db.add_model_checkpoint({"model_name": "ensemble_agent.dqn", "model_path": f"/models/v{version:06d}/dqn.pkl", "accuracy": 0.5})
+    assert db.delete_model_checkpoints(["/models/v000001/dqn.pkl", "/models/v000003/dqn.pkl"]) == 2
+    assert db.delete_model_checkpoints([]) == 0
+    assert db.get_latest_model_checkpoint("ensemble_agent.dqn").model_path == "/models/v000002/dqn.pkl"
+
+T0 = datetime(2024, 1, 15, 10, 0)
+
+def _sentiment(minutes, score, source="news", text="Nifty update"):
+    return {"source": source, "timestamp": T0 + timedelta(minutes=minutes), "text": text,
+            "sentiment_score": score, "sentiment_magnitude": abs(score)}
+
+def _expected_decayed(rows, half_life):
+    # Reference: decayed mean of every row at or before each bucket, aged from its own bucket
+    buckets = sorted({row["timestamp"].replace(second=0) for row in rows})
+    expected = {}
+    for bucket in buckets:
+        weights = [(0.5 ** ((bucket - row["timestamp"].replace(second=0)).total_seconds() / 60 / half_life), row["sentiment_score"])
+                   for row in rows if row["timestamp"].replace(second=0) <= bucket]
+        expected[bucket] = sum(w * score for w, score in weights) / sum(w for w, _ in weights)
+    return expected
+
+def test_sentiment_index_incremental_buckets_and_sources(db):
+    db.add_sentiment_data_many([_sentiment(0.1, 0.5), _sentiment(0.6, -0.1, source="twitter")])
+    db.add_sentiment_data_many([_sentiment(0.8, 0.2), _sentiment(1.1, 0.4, source="twitter")])
+
+    index = db.get_sentiment_index(source=ALL_SOURCES).set_index("timestamp")
+    assert list(index["count"]) == [3, 1]
+    assert index.loc[T0, "score_sum"] == pytest.approx(0.6)
+    assert index.loc[T0, "sentiment_score"] == pytest.approx(0.2)
+    assert index.loc[T0, "sentiment_magnitude"] == pytest.approx(0.8 / 3)
+
+    # Per-source rows add up to the ALL_SOURCES row in every bucket
+    per_source = pd.concat([db.get_sentiment_index(source=source) for source in ("news", "twitter")])
+    totals = per_source.groupby("timestamp")[["count", "score_sum"]].sum()
+    pd.testing.assert_frame_equal(totals, index[["count", "score_sum"]], check_names=False)
+    assert db.get_sentiment_index(source="news")["sentiment_score"].tolist() == pytest.approx([0.35])
+
+def test_sentiment_index_late_row_redecays_later_buckets(db):
+    rows = [_sentiment(0, 0.8), _sentiment(30, -0.2), _sentiment(60, 0.1), _sentiment(90, 0.5)]
+    db.add_sentiment_data_many(rows)
+    late = _sentiment(10.5, -0.9)
+    db.add_sentiment_data_many([late])
+
+    index = db.get_sentiment_index().set_index("timestamp")
+    expected = _expected_decayed(rows + [late], db.sentiment_half_life_minutes)
+    assert list(index.index) == sorted(expected)
+    for bucket, score in expected.items():
+        assert index.loc[bucket, "decayed_score"] == pytest.approx(score)
+
+def test_get_sentiment_at_ages_weight_between_buckets(db):
+    db.add_sentiment_data_many([_sentiment(0, 0.6), _sentiment(30, -0.2)])
+    at = db.get_sentiment_at(T0 + timedelta(minutes=45))
+    assert at["bucket"] == T0 + timedelta(minutes=30)
+    assert at["decayed_score"] == pytest.approx(_expected_decayed([_sentiment(0, 0.6), _sentiment(30, -0.2)], 60)[at["bucket"]])
+    # The bucket covers up to minute 31; from there the weight has aged 14 minutes
+    weight_at_bucket = 1 + 0.5 ** (30 / 60)
+    assert at["decayed_weight"] == pytest.approx(weight_at_bucket * 0.5 ** (14 / 60))
+    assert db.get_sentiment_at(T0 - timedelta(minutes=1)) is None
+
+def test_sentiment_index_honours_half_life(tmp_path, monkeypatch):
+    monkeypatch.setitem(config.config["database"], "type", "sqlite")
+    monkeypatch.setitem(config.config["database"], "path", str(tmp_path / "half_life.db"))
+    monkeypatch.setitem(config.config["sentiment"]["index"], "half_life_minutes", 30)
+    db = DatabaseManager()
+    assert db.sentiment_half_life_minutes == 30
+    db.add_sentiment_data_many([_sentiment(0, 1.0), _sentiment(60, 0.0)])
+    last = db.get_sentiment_index().iloc[-1]
+    # One half-life every 30 minutes: the first row weighs 0.25 an hour later
+    assert last["decayed_score"] == pytest.approx(0.25 / 1.25)
+
+def test_search_sentiment_tracks_inserts_updates_and_deletes(db):
+    db.add_sentiment_data_many([_sentiment(0, 0.2, text="RBI holds repo rate"),
+                                _sentiment(1, -0.4, text="HDFC Bank shares slide")])
+    assert db.search_sentiment("repo")["text"].tolist() == ["RBI holds repo rate"]
+
+    with db.engine.begin() as conn:
+        conn.execute(database.text("UPDATE sentiment_data SET text = 'RBI cuts policy rate' WHERE text LIKE 'RBI%'"))
+    assert db.search_sentiment("repo").empty
+    assert db.search_sentiment("policy")["text"].tolist() == ["RBI cuts policy rate"]
+
+    with db.engine.begin() as conn:
+        conn.execute(database.text("DELETE FROM sentiment_data WHERE text LIKE 'HDFC%'"))
+    assert db.search_sentiment("HDFC").empty
+
+def test_search_sentiment_ranks_by_bm25_and_filters(db):
+    db.add_sentiment_data_many([
+        _sentiment(0, 0.1, source="news", text="Markets open flat while Infosys trades higher"),
+        _sentiment(5, 0.3, source="twitter", text="Infosys Infosys Infosys results beat estimates"),
+        _sentiment(10, 0.2, source="news", text="Infosys guidance raised"),
+        _sentiment(15, 0.0, source="news", text="Rupee steady"),
+    ])
+    results = db.search_sentiment("infosys")
+    assert len(results) == 3
+    assert results["rank"].is_monotonic_decreasing
+    assert results["text"].iloc[0].startswith("Infosys Infosys")
+
+    assert db.search_sentiment("infosys", source="news")["source"].unique().tolist() == ["news"]
+    window = db.search_sentiment("infosys", start=T0 + timedelta(minutes=5), end=T0 + timedelta(minutes=9))
+    assert window["text"].tolist() == ["Infosys Infosys Infosys results beat estimates"]
+    assert len(db.search_sentiment("infosys OR rupee")) == 4
+    assert db.search_sentiment("infosys NOT guidance", source="news")["text"].tolist() == ["Markets open flat while Infosys trades higher"]
+
+def test_search_sentiment_quotes_awkward_queries(db):
+    db.add_sentiment_data_many([_sentiment(0, 0.5, text="M&M rallies after strong tractor sales"),
+                                _sentiment(1, 0.1, text="Q3-FY24 earnings season begins")])
+    assert db.search_sentiment("M&M")["text"].tolist() == ["M&M rallies after strong tractor sales"]
+    assert db.search_sentiment("Q3-FY24")["text"].tolist() == ["Q3-FY24 earnings season begins"]
+    assert len(db.search_sentiment("tractor OR OR earnings")) == 2
+    # Operator-only or punctuation-only input is not a valid FTS5 query; it returns nothing instead of failing
+    for query in ["OR", "AND NOT", "()", '"']:
+        assert db.search_sentiment(query).empty
+
+def test_full_text_index_rebuilds_rows_written_before_it_existed(db):
+    db.add_sentiment_data_many([_sentiment(0, 0.5, text="Sensex hits record high")])
+    with db.engine.begin() as conn:
+        for name in ["sentiment_fts_insert", "sentiment_fts_delete", "sentiment_fts_update"]:
+            conn.execute(database.text(f"DROP TRIGGER {name}"))
+        conn.execute(database.text("DROP TABLE sentiment_fts"))
+        conn.execute(database.text("INSERT INTO sentiment_data (source, timestamp, text, sentiment_score) "
+                                   "VALUES ('news', '2024-01-15 10:05:00', 'Nifty record close', 0.4)"))
+
+    reopened = DatabaseManager()
+    assert reopened.full_text_search
+    assert len(reopened.search_sentiment("record")) == 2
+
+def test_search_sentiment_falls_back_to_like_without_fts5(tmp_path, monkeypatch):
+    monkeypatch.setitem(config.config["database"], "type", "sqlite")
+    monkeypatch.setitem(config.config["database"], "path", str(tmp_path / "no_fts.db"))
+    monkeypatch.setattr(DatabaseManager, "_setup_full_text_search", lambda self: False)
+    db = DatabaseManager()
+    db.add_sentiment_data_many([_sentiment(0, 0.1, text="Bank Nifty slips"), _sentiment(5, 0.2, text="Bank Nifty rebounds"),
+                                _sentiment(9, 0.3, source="twitter", text="Bank Nifty flat")])
+    results = db.search_sentiment("Nifty", source="news")
+    # Newest first, since LIKE has no relevance score
+    assert results["text"].tolist() == ["Bank Nifty rebounds", "Bank Nifty slips"]
+    assert (results["rank"] == 0.0).all()
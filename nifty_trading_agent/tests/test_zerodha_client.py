@@ -1,6 +1,7 @@
 import pytest
 from unittest.mock import MagicMock, patch
 from nifty_trading_agent.src.data_ingestion.zerodha_client import ZerodhaClient
+from nifty_trading_agent.src.utils.tracing import Tracer
 from kiteconnect import KiteConnect
 
 @pytest.fixture
@@ -56,6 +57,20 @@ def test_place_order(zerodha_client):
         order_id = zerodha_client.place_order("regular", "NSE", "NIFTY", "BUY", 1, "MIS", "MARKET")
         assert order_id == "order123"
 
+def test_place_order_closes_the_tick_to_order_event_only_on_success(zerodha_client, monkeypatch):
+    tracer = Tracer(export_interval_seconds=0)
+    monkeypatch.setattr("nifty_trading_agent.src.data_ingestion.zerodha_client.tracer", tracer)
+    with patch.object(zerodha_client.kite, "quote", return_value={}):
+        zerodha_client.get_quote(["NSE:NIFTY", "NSE:BANKNIFTY"])
+    with patch.object(zerodha_client.kite, "place_order", side_effect=Exception("rejected")):
+        assert zerodha_client.place_order("regular", "NSE", "NIFTY", "BUY", 1, "MIS", "MARKET") is None
+    assert "tick_to_order" not in tracer.snapshot()["stages"]
+    with patch.object(zerodha_client.kite, "place_order", return_value="order123"):
+        assert zerodha_client.place_order("regular", "NSE", "NIFTY", "BUY", 1, "MIS", "MARKET") == "order123"
+    assert tracer.snapshot()["stages"]["tick_to_order"]["count"] == 1
+    assert tracer.open_event("NSE:NIFTY") is None
+    assert tracer.open_event("NSE:BANKNIFTY") is not None
+
 def test_get_positions(zerodha_client):
     with patch.object(zerodha_client.kite, "positions") as mock_positions:
         mock_positions.return_value = {"day": [], "overnight": []}